@@ -0,0 +1,190 @@
+"""
+Columnar, in-memory snapshot of sales and expenses for dashboard analytics (requires NumPy).
+
+    snapshot = AnalyticsSnapshot()        # $CAFE_DB_URL or cafe_management.db
+    snapshot.refresh()                    # Loads only rows added since the last refresh
+    dates, revenue = snapshot.rolling_revenue(30)
+    snapshot.spend_by_category()
+    snapshot.profit_margin("month")
+
+Rows are streamed from the SQLite cursor straight into NumPy arrays, with no ORM objects
+or per-row dicts. Amounts are kept as the int64 cents stored in the database, dates as
+int32 days since 1970-01-01 and expense categories as int32 codes into `categories`;
+rollups convert their totals to currency units (floats) once, at the end. Sales and
+expenses are append-only, so refresh() just fetches the rows whose id is above the last
+one loaded. Call reload() to start over after rows were edited or deleted by other means.
+"""
+import threading
+
+import numpy as np
+
+from errors import ValidationError
+from models import get_engine
+
+EPOCH = np.datetime64("1970-01-01", "D")
+# Days since 1970-01-01, computed by SQLite from the stored YYYY-MM-DD text
+SQL_DAYS = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+
+SALES_DTYPE = np.dtype([("id", "i8"), ("day", "i4"), ("amount", "i8")])  # amount in cents
+EXPENSES_DTYPE = np.dtype([("id", "i8"), ("day", "i4"), ("amount", "i8"), ("category", "i4")])
+
+
+def to_days(value):
+    """A date (or None) as int days since 1970-01-01."""
+    return None if value is None else int((np.datetime64(value, "D") - EPOCH).astype(int))
+
+
+def to_dates(days):
+    """int days since 1970-01-01 as a datetime64[D] array."""
+    return EPOCH + np.asarray(days).astype("timedelta64[D]")
+
+
+class AnalyticsSnapshot:
+    def __init__(self, engine=None, db_url=None):
+        self.engine = engine or get_engine(db_url)
+        self.sales = np.empty(0, SALES_DTYPE)
+        self.expenses = np.empty(0, EXPENSES_DTYPE)
+        self.categories = []  # Category names; expenses["category"] indexes this list
+        self._category_codes = {}
+        self._lock = threading.Lock()
+
+    # Loading
+    def reload(self):
+        """Drop everything and load both tables from scratch."""
+        with self._lock:
+            self.sales = np.empty(0, SALES_DTYPE)
+            self.expenses = np.empty(0, EXPENSES_DTYPE)
+            self.categories = []
+            self._category_codes = {}
+        return self.refresh()
+
+    def refresh(self):
+        """Append the sales and expenses added since the last refresh. Returns (new_sales, new_expenses)."""
+        with self._lock:
+            connection = self.engine.raw_connection()
+            try:
+                cursor = connection.cursor()
+                sales_watermark = int(self.sales["id"][-1]) if len(self.sales) else 0
+                cursor.execute(
+                    f"SELECT id, {SQL_DAYS}, amount FROM sales WHERE id > ? ORDER BY id", (sales_watermark,)
+                )
+                new_sales = np.fromiter(cursor, SALES_DTYPE)
+
+                expenses_watermark = int(self.expenses["id"][-1]) if len(self.expenses) else 0
+                cursor.execute(
+                    f"SELECT id, {SQL_DAYS}, amount, category FROM expenses WHERE id > ? ORDER BY id",
+                    (expenses_watermark,),
+                )
+                new_expenses = np.fromiter(
+                    ((expense_id, day, amount, self._encode(category)) for expense_id, day, amount, category in cursor),
+                    EXPENSES_DTYPE,
+                )
+                cursor.close()
+            finally:
+                connection.close()
+            if len(new_sales):
+                self.sales = np.concatenate([self.sales, new_sales])
+            if len(new_expenses):
+                self.expenses = np.concatenate([self.expenses, new_expenses])
+        return len(new_sales), len(new_expenses)
+
+    def _encode(self, category):
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self.categories)
+            self.categories.append(category)
+        return code
+
+    @staticmethod
+    def _in_range(rows, start_date=None, end_date=None):
+        """The rows whose day falls in an optional inclusive date range."""
+        start, end = to_days(start_date), to_days(end_date)
+        if start is None and end is None:
+            return rows
+        mask = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            mask &= rows["day"] >= start
+        if end is not None:
+            mask &= rows["day"] <= end
+        return rows[mask]
+
+    # Rollups
+    def daily_revenue(self, start_date=None, end_date=None):
+        """Return (dates, revenue): one entry per calendar day, days without sales included as 0."""
+        sales = self._in_range(self.sales, start_date, end_date)
+        first = to_days(start_date) if start_date else int(sales["day"].min()) if len(sales) else None
+        last = to_days(end_date) if end_date else int(sales["day"].max()) if len(sales) else None
+        if first is None or last is None or last < first:
+            return to_dates([]), np.zeros(0)
+        totals = np.bincount(sales["day"] - first, weights=sales["amount"], minlength=last - first + 1)
+        return to_dates(np.arange(first, last + 1)), totals / 100
+
+    def rolling_revenue(self, window=7, start_date=None, end_date=None):
+        """Return (dates, revenue over the trailing `window` days ending on each date)."""
+        if window < 1:
+            raise ValidationError("Window must be at least one day.")
+        dates, daily = self.daily_revenue(start_date, end_date)
+        running = np.cumsum(daily)
+        running[window:] = running[window:] - running[:-window]
+        return dates, running
+
+    def moving_average(self, window=7, start_date=None, end_date=None):
+        """Return (dates, mean daily revenue over the trailing `window` days)."""
+        dates, rolling = self.rolling_revenue(window, start_date, end_date)
+        return dates, rolling / window
+
+    def spend_by_category(self, start_date=None, end_date=None):
+        """Return {category: total spent}, largest first."""
+        expenses = self._in_range(self.expenses, start_date, end_date)
+        totals = np.bincount(expenses["category"], weights=expenses["amount"], minlength=len(self.categories)) / 100
+        order = np.argsort(-totals, kind="stable")
+        return {self.categories[code]: float(totals[code]) for code in order if totals[code]}
+
+    def expense_ratios(self, start_date=None, end_date=None):
+        """Return {category: spend / revenue} over the range (None if there was no revenue)."""
+        revenue = int(self._in_range(self.sales, start_date, end_date)["amount"].sum()) / 100
+        return {
+            category: total / revenue if revenue else None
+            for category, total in self.spend_by_category(start_date, end_date).items()
+        }
+
+    @staticmethod
+    def _periods(days, period):
+        """Bucket int days by period: the day itself, the Monday starting its week, or its month as datetime64[M]."""
+        if period == "day":
+            return to_dates(days)
+        if period == "week":
+            return to_dates(days - (days + 3) % 7)  # 1970-01-01 was a Thursday
+        if period == "month":
+            return to_dates(days).astype("datetime64[M]")
+        raise ValidationError("Period must be 'day', 'week' or 'month'.")
+
+    def profit_margin(self, period="month", start_date=None, end_date=None):
+        """
+        Return (period, revenue, expenses, margin) tuples, where margin is
+        (revenue - expenses) / revenue, or None for a period without revenue.
+        Weeks are labelled with the date of their Monday.
+        """
+        sales = self._in_range(self.sales, start_date, end_date)
+        expenses = self._in_range(self.expenses, start_date, end_date)
+        all_periods = np.concatenate([self._periods(sales["day"], period), self._periods(expenses["day"], period)])
+        periods, inverse = np.unique(all_periods, return_inverse=True)
+        revenue = np.bincount(inverse[:len(sales)], weights=sales["amount"], minlength=len(periods)) / 100
+        spent = np.bincount(inverse[len(sales):], weights=expenses["amount"], minlength=len(periods)) / 100
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margin = (revenue - spent) / revenue
+        return [
+            (str(label), float(earned), float(cost), float(ratio) if earned else None)
+            for label, earned, cost, ratio in zip(periods, revenue, spent, margin)
+        ]
+
+    def stats(self):
+        """Row counts, watermarks and array memory of the snapshot."""
+        return {
+            "sales": len(self.sales),
+            "expenses": len(self.expenses),
+            "categories": len(self.categories),
+            "sales_watermark": int(self.sales["id"][-1]) if len(self.sales) else 0,
+            "expenses_watermark": int(self.expenses["id"][-1]) if len(self.expenses) else 0,
+            "bytes": self.sales.nbytes + self.expenses.nbytes,
+        }
@@ -0,0 +1,170 @@
+"""
+Move old sales (with their sale lines) and expenses out of the café database into one
+SQLite archive file per year, so the tables the tills write to stay small.
+
+    python archive.py [--db URL] run --before 2024-01-01 [--dir DIR] [--chunk-size 5000] [--vacuum]
+    python archive.py [--db URL] run --keep-days 365
+    python archive.py [--db URL] list
+
+Rows dated before the cutoff are copied to <dir>/<database name>-<year>.db (default
+directory: the database's own) and then deleted, one chunk of `chunk_size` rows per
+transaction, so tills only ever wait for one short chunk. Each chunk is copied and
+committed to the archive before it is deleted here, and copying again replaces the
+earlier copy, so a run that is interrupted loses nothing and can simply be repeated.
+The archives table records every file and how far it goes; DataAccessLayer queries
+passed include_archive=True ATTACH the files their date range needs. Summaries are read
+from daily_totals, which keeps covering the archived days, so they need no archive.
+AnalyticsSnapshot.reload() and migrations.rebuild_daily_totals only see the rows left here.
+
+The highest id of each table is never archived: SQLite hands out the next id after the
+highest one in the table, so keeping it means a new row can't reuse an archived row's id.
+"""
+import argparse
+import os
+from datetime import date, timedelta
+
+from errors import ValidationError
+
+ARCHIVE_CHUNK_SIZE = 5000
+
+
+def archive_file_name(db_path, year):
+    """The archive file name for `year` of the database at `db_path`, e.g. cafe_management-2023.db."""
+    stem, extension = os.path.splitext(os.path.basename(db_path))
+    return f"{stem}-{year}{extension or '.db'}"
+
+
+def archive_rows(engine, before, archive_dir=None, chunk_size=ARCHIVE_CHUNK_SIZE, vacuum=False, progress=None):
+    """
+    Archive the sales, sale lines and expenses dated before `before` (a date). Returns
+    {"sales": n, "expenses": m}, the numbers of rows moved. `progress(table, year, moved)`
+    is called after every chunk.
+    """
+    from sqlalchemy import create_engine, delete, func, select
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    from dal import archive_table, attach_archives
+    from models import Archive, Base, Expense, Sale, SaleLine
+
+    if chunk_size <= 0:
+        raise ValidationError("Chunk size must be greater than zero.")
+    db_path = os.path.abspath(engine.url.database)
+    archive_dir = os.path.abspath(archive_dir or os.path.dirname(db_path))
+    os.makedirs(archive_dir, exist_ok=True)
+    moved = {"sales": 0, "expenses": 0}
+
+    with engine.connect() as connection:
+        firsts = [connection.execute(select(func.min(model.date)).where(model.date < before)).scalar()
+                  for model in (Sale, Expense)]
+        firsts = [first for first in firsts if first]
+        if not firsts:
+            return moved
+        kept_sales = [
+            connection.execute(select(func.max(Sale.id))).scalar(),
+            connection.execute(select(SaleLine.sale_id).order_by(SaleLine.id.desc()).limit(1)).scalar(),
+        ]
+        kept_expense = connection.execute(select(func.max(Expense.id))).scalar()
+
+        for year in range(min(firsts).year, (before - timedelta(days=1)).year + 1):
+            start, end = date(year, 1, 1), min(before, date(year + 1, 1, 1))
+            path = os.path.join(archive_dir, archive_file_name(db_path, year))
+            archive_engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(archive_engine, tables=[model.__table__ for model in (Sale, SaleLine, Expense)])
+            archive_engine.dispose()
+
+            # Recorded first: from here on readers skip archived copies of rows that are still here
+            registered = sqlite_insert(Archive).values(
+                year=year, path=os.path.relpath(path, os.path.dirname(db_path)), archived_before=end
+            )
+            connection.execute(registered.on_conflict_do_update(
+                index_elements=["year"],
+                set_={"path": registered.excluded.path,
+                      "archived_before": func.max(Archive.archived_before, registered.excluded.archived_before)},
+            ))
+            connection.commit()
+            (schema,) = attach_archives(connection, start, end - timedelta(days=1))
+
+            # (model, rows to skip, [(model, key column) of rows moved along with it])
+            plans = [
+                (Sale, Sale.id.not_in([sale_id for sale_id in kept_sales if sale_id is not None]),
+                 [(SaleLine, SaleLine.sale_id), (Sale, Sale.id)]),
+                (Expense, Expense.id != kept_expense, [(Expense, Expense.id)]),
+            ]
+            for model, keep, copies in plans:
+                while True:
+                    ids = connection.execute(
+                        select(model.id).where(model.date >= start, model.date < end, keep).limit(chunk_size)
+                    ).scalars().all()
+                    if not ids:
+                        break
+                    for copied, key in copies:
+                        columns = [column.name for column in copied.__table__.columns]
+                        rows = select(*copied.__table__.columns).where(key.in_(ids))
+                        connection.execute(
+                            sqlite_insert(archive_table(copied, schema)).prefix_with("OR REPLACE").from_select(columns, rows)
+                        )
+                    connection.commit()
+                    for copied, key in copies:
+                        connection.execute(delete(copied).where(key.in_(ids)))
+                    connection.commit()
+                    moved[model.__tablename__] += len(ids)
+                    if progress:
+                        progress(model.__tablename__, year, len(ids))
+        if vacuum:
+            connection.exec_driver_sql("VACUUM")
+    return moved
+
+
+def list_archives(engine):
+    """(year, path, archived_before, sales, expenses) for every archive file, oldest first."""
+    from sqlalchemy import func, select
+
+    from dal import archive_schema, archive_table, attach_archives
+    from models import Archive, Expense, Sale
+
+    with engine.connect() as connection:
+        archives = connection.execute(select(Archive.year, Archive.path, Archive.archived_before).order_by(Archive.year)).all()
+        attach_archives(connection)
+        return [
+            (year, path, archived_before,
+             *(connection.execute(select(func.count()).select_from(archive_table(model, archive_schema(year)))).scalar()
+               for model in (Sale, Expense)))
+            for year, path, archived_before in archives
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old sales and expenses into per-year SQLite files")
+    parser.add_argument("--db", help="SQLAlchemy database URL (default: $CAFE_DB_URL or sqlite:///cafe_management.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="archive the rows dated before a cutoff")
+    cutoff = run.add_mutually_exclusive_group(required=True)
+    cutoff.add_argument("--before", type=date.fromisoformat, help="archive rows dated before YYYY-MM-DD")
+    cutoff.add_argument("--keep-days", type=int, help="archive rows older than this many days")
+    run.add_argument("--dir", help="archive directory (default: the database's directory)")
+    run.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE, help="rows per transaction")
+    run.add_argument("--vacuum", action="store_true", help="compact the database file afterwards")
+    subparsers.add_parser("list", help="list the archive files")
+    args = parser.parse_args()
+
+    from models import get_engine
+
+    engine = get_engine(args.db)
+    try:
+        if args.command == "list":
+            from tables import Column, render_table
+
+            headers = ("Year", "Path", "Archived Before", "Sales", "Expenses")
+            render_table(list_archives(engine), [Column(i, header) for i, header in enumerate(headers)],
+                         empty="No archives.")
+        else:
+            before = args.before or date.today() - timedelta(days=args.keep_days)
+            moved = archive_rows(
+                engine, before, args.dir, args.chunk_size, args.vacuum,
+                progress=lambda table, year, count: print(f"{year}: {count} {table} archived"),
+            )
+            print(f"Archived {moved['sales']} sales and {moved['expenses']} expenses dated before {before}.")
+    except ValidationError as e:
+        raise SystemExit(f"Error: {e}")
+    finally:
+        engine.dispose()
@@ -0,0 +1,189 @@
+"""
+Business rules over AsyncDataAccessLayer, for asyncio services.
+
+    bll = AsyncBusinessLogic(AsyncDataAccessLayer(engine))
+    sale = await bll.checkout_lines({item_id: 2})
+
+Validation is shared with bll.BusinessLogic, so both paths accept and reject exactly the
+same input; the operations that reach the database are coroutines.
+"""
+from datetime import datetime
+
+from bll import AuthenticatedUser, BusinessLogic
+from dal import DataAccessLayer
+from errors import AuthenticationError, InsufficientStockError, NotFoundError, ValidationError
+from models import parse_items_sold
+from passwords import hash_password, needs_rehash, run_in_pool_async, verify_password
+
+
+class AsyncBusinessLogic:
+    def __init__(self, dal):
+        self.dal = dal
+
+    # Validation (see BusinessLogic; raises ValidationError)
+    _parse_date = staticmethod(BusinessLogic._parse_date)
+    _parse_number = staticmethod(BusinessLogic._parse_number)
+    _parse_text = staticmethod(BusinessLogic._parse_text)
+    _parse_money = staticmethod(BusinessLogic._parse_money)
+    _parse_date_range = staticmethod(BusinessLogic._parse_date_range)
+    _expense_filters = BusinessLogic._expense_filters
+    _inventory_filters = BusinessLogic._inventory_filters
+    _sales_filters = BusinessLogic._sales_filters
+    _change_feed_options = BusinessLogic._change_feed_options
+    validate_expense = BusinessLogic.validate_expense
+    validate_inventory_item = BusinessLogic.validate_inventory_item
+    validate_sale = BusinessLogic.validate_sale
+
+    # User Management
+    async def register_user(self, username, password, email, role):
+        if not username or not password or not email:
+            raise ValidationError("All fields are required.")
+        if role not in ['admin', 'user']:
+            raise ValidationError("Role must be 'admin' or 'user'.")
+        return await self.dal.add_user(username, await run_in_pool_async(hash_password, password), email, role)
+
+    async def view_all_users(self):
+        return await self.dal.get_all_users()
+
+    async def authenticate_user(self, username, password):
+        """See BusinessLogic.authenticate_user; the KDF runs on the hashing pool, off the event loop."""
+        cached = self.dal.login_cache.get(username, password)
+        if cached:
+            return cached
+        user = await self.dal.get_user_by_username(username)
+        if not user:
+            raise AuthenticationError("User not found.")
+        if not await run_in_pool_async(verify_password, password, user.password):
+            raise AuthenticationError("Incorrect password.")
+        if needs_rehash(user.password):
+            await self.dal.update_user(user.id, {"password": await run_in_pool_async(hash_password, password)})
+        authenticated = AuthenticatedUser(user.id, user.username, user.email, user.role)
+        self.dal.login_cache.put(username, password, authenticated)
+        return authenticated
+
+    # Expense Management
+    async def record_expense(self, date, amount, category, description=None):
+        expense = self.validate_expense(date, amount, category, description)
+        return await self.dal.add_expense(**expense)
+
+    async def view_expense_history(self, **filters):
+        """See BusinessLogic.view_expense_history."""
+        expenses = await self.dal.get_expense_history(**self._expense_filters(**filters))
+        return [{"date": e.date, "amount": e.amount, "category": e.category, "description": e.description} for e in expenses]
+
+    # Inventory Management
+    async def add_inventory_item(self, item_name, quantity, cost, reorder_threshold=0):
+        item = self.validate_inventory_item(item_name, quantity, cost, reorder_threshold)
+        return await self.dal.add_inventory_item(**item)
+
+    async def view_inventory(self, **filters):
+        """See BusinessLogic.view_inventory."""
+        if filters:
+            inventory = await self.dal.search_inventory(**self._inventory_filters(**filters))
+        else:
+            inventory = await self.dal.get_inventory()
+        return [
+            {"id": inv.id, "item_name": inv.item_name, "quantity": inv.quantity, "cost": inv.cost,
+             "reorder_threshold": inv.reorder_threshold}
+            for inv in inventory
+        ]
+
+    # Reordering
+    async def reorder_suggestions(self, window_days=28, lead_days=7, cover_days=14):
+        """See BusinessLogic.reorder_suggestions."""
+        since, window = BusinessLogic._reorder_window(window_days, lead_days, cover_days)
+        units_sold = await self.dal.units_sold_since(since)
+        selling = (await self.dal.get_inventory_items(units_sold)).values()
+        return BusinessLogic._rank_reorders(await self.dal.low_stock_items(), selling, units_sold, *window)
+
+    # Purchases
+    async def price_lines(self, quantities):
+        """See BusinessLogic.price_lines."""
+        BusinessLogic._check_quantities(quantities)
+        items = await self.dal.get_inventory_items(list(quantities))
+        priced = BusinessLogic._price(quantities, items)
+        await self._check_stock(quantities, items)
+        return priced
+
+    async def _check_stock(self, quantities, items):
+        """See BusinessLogic._check_stock."""
+        suspect = BusinessLogic._short_of(quantities, {item_id: items[item_id].quantity for item_id in quantities})
+        if suspect:
+            stock = await self.dal.get_stock_levels(suspect)
+            short = BusinessLogic._short_of({item_id: quantities[item_id] for item_id in suspect}, stock)
+            if short:
+                names = ", ".join(items[item_id].item_name for item_id in short)
+                raise InsufficientStockError(f"Not enough stock available for {names}.")
+
+    async def checkout_lines(self, quantities):
+        """
+        Sell {inventory_id: quantity} as one sale, with every stock decrement and the sale
+        committed together. Payment must already have been taken. Returns the Sale.
+        """
+        lines, items_sold, _ = await self.price_lines(quantities)
+        return await self.dal.checkout(lines, datetime.now().date(), items_sold)
+
+    async def purchase_item(self, item_id, quantity):
+        """Sell `quantity` units of one item; see checkout_lines."""
+        if quantity <= 0:
+            raise ValidationError("Quantity must be greater than zero.")
+        if not await self.dal.get_inventory_item(item_id):
+            raise NotFoundError("Item not found.")
+        return await self.checkout_lines({item_id: quantity})
+
+    # Sales Management
+    async def record_sale(self, date, amount, items_sold, lines=None):
+        """Record a sale; see BusinessLogic.record_sale."""
+        sale = self.validate_sale(date, amount, items_sold)
+        if lines is None:
+            parsed = parse_items_sold(items_sold)
+            items = await self.dal.get_inventory_by_names([name for name, _ in parsed])
+            lines = [(items[name].id, quantity, items[name].cost) for name, quantity in parsed if name in items]
+        return await self.dal.add_sale(sale["date"], sale["amount"], items_sold, lines)
+
+    async def view_sales_history(self, **filters):
+        """See BusinessLogic.view_sales_history."""
+        sales = await self.dal.get_sales_history(**self._sales_filters(**filters))
+        return [{"date": s.date, "amount": s.amount, "items_sold": s.items_sold} for s in sales]
+
+    # Change Feed
+    async def changes_since(self, seq=0, limit=DataAccessLayer.CHANGES_PAGE_SIZE, entity=None):
+        """See BusinessLogic.changes_since."""
+        return await self.dal.changes_since(**self._change_feed_options(seq, limit, entity))
+
+    # Reporting
+    async def generate_reports(self, start_date=None, end_date=None, page_size=DataAccessLayer.REPORT_PAGE_SIZE,
+                               include_archive=False):
+        """Return the reports as async row streams, fetched page by page while the caller iterates."""
+        parsed_start, parsed_end = self._parse_date_range(start_date, end_date)
+        if page_size <= 0:
+            raise ValidationError("Page size must be greater than zero.")
+        return {
+            "Expenses": await self.dal.generate_expense_report(parsed_start, parsed_end, page_size, bool(include_archive)),
+            "Inventory": await self.dal.generate_inventory_report(page_size),
+            "Sales": await self.dal.generate_sales_report(parsed_start, parsed_end, page_size, bool(include_archive)),
+        }
+
+    async def generate_summary(self, period="month", start_date=None, end_date=None):
+        """See BusinessLogic.generate_summary."""
+        if period not in DataAccessLayer.PERIOD_FORMATS:
+            raise ValidationError("Period must be 'day', 'week' or 'month'.")
+        date_range = self._parse_date_range(start_date, end_date)
+        return {
+            "Sales": await self.dal.summarize_sales(period, *date_range),
+            "Expenses by Category": await self.dal.summarize_expenses("category", *date_range),
+            "Expenses": await self.dal.summarize_expenses(period, *date_range),
+            "Net Profit": await self.dal.summarize_profit(period, *date_range),
+        }
+
+    async def best_sellers(self, start_date=None, end_date=None, limit=10, include_archive=False):
+        """See BusinessLogic.best_sellers."""
+        date_range = self._parse_date_range(start_date, end_date)
+        if limit <= 0:
+            raise ValidationError("Limit must be greater than zero.")
+        include_archive = bool(include_archive)
+        bounds = date_range
+        if None in date_range:
+            bounds = await self.dal.get_sales_date_bounds(*date_range, include_archive=include_archive)
+        rows = await self.dal.best_sellers(*date_range, limit=limit, include_archive=include_archive)
+        return BusinessLogic._with_velocity(rows, date_range, bounds)
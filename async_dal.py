@@ -0,0 +1,348 @@
+"""
+Asynchronous data access on SQLAlchemy's asyncio extension and the aiosqlite driver, for
+services that serve many tills from one event loop instead of one thread per caller.
+
+    engine = await init_async_db()  # $CAFE_DB_URL or cafe_management.db, via aiosqlite
+    dal = AsyncDataAccessLayer(engine)
+    items = await dal.get_inventory()
+    await dal.close()
+
+It uses the same models, engine profiles, migrations, catalogue cache and SQL statements
+as dal.DataAccessLayer. Methods behave like their synchronous namesakes but are coroutines,
+and the report streams are async generators.
+"""
+import weakref
+
+from sqlalchemy import make_url, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from cache import CredentialCache, InventoryCache
+from dal import (CHANGE_LOG_DELETE, CHANGE_LOG_INSERTS, CHANGE_LOG_UPDATES, DAILY_TOTALS_UPSERT, PRUNED_THROUGH,
+                 SEARCH_INDEX_INSERTS, STOCK_DECREMENT, STOCK_LEVELS, DataAccessLayer, InventoryRow, attach_archives, change_entries,
+                 daily_totals_increments)
+from errors import DuplicateError, InsufficientStockError, NotFoundError
+from metrics import metrics
+from migrations import create_and_migrate
+from models import DEFAULT_ENGINE_PROFILE, Expense, Inventory, Sale, SaleLine, User, apply_engine_profile, get_db_url
+
+
+async def init_async_db(db_url=None, profile=DEFAULT_ENGINE_PROFILE, **engine_options):
+    """
+    Async counterpart of models.init_db: creates the tables, runs pending migrations and
+    returns an AsyncEngine tuned with `profile`. A plain "sqlite://" URL (the default is
+    models.get_db_url()) is switched to the aiosqlite driver.
+    """
+    url = make_url(db_url or get_db_url())
+    if url.drivername == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    engine = create_async_engine(url, echo=False, **engine_options)
+    # PRAGMAs are set by the connect hook of the sync engine that the AsyncEngine wraps
+    apply_engine_profile(engine.sync_engine, profile)
+    metrics.instrument_engine(engine)
+    async with engine.connect() as connection:
+        await connection.run_sync(create_and_migrate)
+    return engine
+
+
+# Async Data Access Layer
+# Same contract as DataAccessLayer: methods return the rows they create and raise
+# errors.CafeError subclasses on failure. Every public method is timed and counted by metrics.
+@metrics.instrument_class
+class AsyncDataAccessLayer:
+    REPORT_PAGE_SIZE = DataAccessLayer.REPORT_PAGE_SIZE
+    PERIOD_FORMATS = DataAccessLayer.PERIOD_FORMATS
+    CHANGES_PAGE_SIZE = DataAccessLayer.CHANGES_PAGE_SIZE
+    _inventory_caches = weakref.WeakKeyDictionary()  # One catalogue cache per engine, shared by its DALs
+    _login_caches = weakref.WeakKeyDictionary()  # Likewise for verified logins
+
+    def __init__(self, engine=None, session=None):
+        """Use `session` if given, otherwise open one on `engine` (an AsyncEngine)."""
+        engine = session.bind if session is not None else engine
+        # Attributes can't be lazily reloaded without an await, so don't expire them on commit
+        self.session = session if session is not None else AsyncSession(engine, expire_on_commit=False)
+        self.inventory_cache = self._inventory_caches.setdefault(engine.sync_engine, InventoryCache())
+        self.login_cache = self._login_caches.setdefault(engine.sync_engine, CredentialCache())
+
+    async def close(self):
+        """Release the session and return its connection to the pool."""
+        await self.session.close()
+
+    # User Management
+    async def add_user(self, username, password, email, role):
+        try:
+            new_user = User(username=username, password=password, email=email, role=role)
+            self.session.add(new_user)
+            await self.session.flush()
+            await self._log_inserted("users", new_user.id)
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise DuplicateError("Username or email already exists.") from None
+        return new_user
+
+    async def update_user(self, user_id, updates):
+        user = await self.session.get(User, user_id)
+        if not user:
+            raise NotFoundError(f"User with ID {user_id} not found.")
+        for key, value in updates.items():
+            if hasattr(user, key):
+                setattr(user, key, value)
+        try:
+            await self.session.flush()
+            await self._log_changed("users", "update", [user_id])
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise DuplicateError("Username or email already exists.") from None
+        self.login_cache.invalidate()
+        return user
+
+    async def get_all_users(self):
+        """Fetch all users with their ID, username, email, and role."""
+        users = (await self.session.scalars(select(User))).all()
+        return [{"id": user.id, "username": user.username, "email": user.email, "role": user.role} for user in users]
+
+    async def get_user_by_username(self, username):
+        return await self.session.scalar(select(User).filter_by(username=username))
+
+    # Expense Management
+    async def add_expense(self, date, amount, category, description):
+        expense = Expense(date=date, amount=amount, category=category, description=description)
+        self.session.add(expense)
+        await self.session.flush()
+        await self._update_daily_totals(expenses=[(date, amount, category)])
+        await self._index_search_text("expenses_fts", expense.id)
+        await self._log_inserted("expenses", expense.id)
+        await self.session.commit()
+        return expense
+
+    async def _update_daily_totals(self, sales=(), expenses=()):
+        """Add sales/expenses to daily_totals within the current transaction."""
+        increments = daily_totals_increments(sales, expenses)
+        if increments:
+            await (await self.session.connection()).execute(DAILY_TOTALS_UPSERT, increments)
+
+    async def _index_search_text(self, search_index, first_id):
+        """Add the rows inserted within the current transaction from id `first_id` up to a search index."""
+        await (await self.session.connection()).execute(SEARCH_INDEX_INSERTS[search_index], {"first_id": first_id})
+
+    async def _log_inserted(self, content, first_id):
+        """Add the rows of table `content` inserted within the current transaction from id `first_id` up to the change log."""
+        await (await self.session.connection()).execute(CHANGE_LOG_INSERTS[content], {"first_id": first_id})
+
+    async def _log_changed(self, content, operation, ids):
+        """Add the rows of table `content` just updated or deleted ("update"/"delete") within the current transaction to the change log."""
+        connection = await self.session.connection()
+        if operation == "delete":
+            await connection.execute(CHANGE_LOG_DELETE, [{"entity": content, "entity_id": id} for id in ids])
+        else:
+            await connection.execute(CHANGE_LOG_UPDATES[content], {"ids": list(ids)})
+
+    async def get_expense_history(self, include_archive=False, **filters):
+        """Expenses matching the filters of DataAccessLayer._expense_query, from the archives too if asked."""
+        archives = await self._attach_archives(filters.get("start_date"), filters.get("end_date")) if include_archive else ()
+        return (await self.session.scalars(DataAccessLayer._expense_query(**filters, archives=archives))).all()
+
+    async def _attach_archives(self, start_date=None, end_date=None):
+        """See dal.attach_archives; on the session's connection."""
+        connection = await self.session.connection()
+        return await connection.run_sync(attach_archives, start_date, end_date)
+
+    # Inventory Management
+    async def add_inventory_item(self, item_name, quantity, cost, reorder_threshold=0):
+        try:
+            inventory_item = Inventory(item_name=item_name, quantity=quantity, cost=cost, reorder_threshold=reorder_threshold)
+            self.session.add(inventory_item)
+            await self.session.flush()
+            await self._log_inserted("inventory", inventory_item.id)
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise DuplicateError(f"Inventory item '{item_name}' already exists.") from None
+        self.inventory_cache.invalidate()
+        return inventory_item
+
+    async def _catalogue(self):
+        """The cached (by_id, by_name) maps, loaded from the database on a miss."""
+        maps, version = self.inventory_cache.lookup()
+        if maps is not None:
+            return maps
+        rows = [InventoryRow(*row) for row in await self.session.execute(select(*Inventory.__table__.columns))]
+        return self.inventory_cache.store(version, rows)
+
+    async def get_inventory(self):
+        """All inventory rows, served from the catalogue cache."""
+        by_id, _ = await self._catalogue()
+        return [by_id[item_id] for item_id in sorted(by_id)]
+
+    async def get_inventory_item(self, item_id):
+        """Fetch item details from the inventory by ID (cached; stock is re-checked at checkout)."""
+        by_id, _ = await self._catalogue()
+        return by_id.get(item_id)
+
+    async def get_inventory_items(self, item_ids):
+        """Fetch {id: InventoryRow} for the given ids from the catalogue cache."""
+        by_id, _ = await self._catalogue()
+        return {item_id: by_id[item_id] for item_id in set(item_ids) if item_id in by_id}
+
+    async def get_stock_levels(self, item_ids):
+        """Fetch {id: quantity} for the given ids from the database, bypassing the cache's possibly stale stock."""
+        return dict((await self.session.execute(STOCK_LEVELS, {"ids": list(item_ids)})).all())
+
+    async def get_inventory_by_names(self, item_names):
+        """Fetch {item_name: InventoryRow} for the given names from the catalogue cache."""
+        _, by_name = await self._catalogue()
+        return {name: by_name[name] for name in set(item_names) if name in by_name}
+
+    async def search_inventory(self, **filters):
+        """Inventory rows matching the filters of DataAccessLayer._inventory_query, read from the database."""
+        return [InventoryRow(*row) for row in await self.session.execute(DataAccessLayer._inventory_query(**filters))]
+
+    def inventory_cache_stats(self):
+        return self.inventory_cache.stats()
+
+    # Reordering
+    async def low_stock_items(self):
+        """Return (inventory_id, item_name, quantity, reorder_threshold) for every item at or below its reorder threshold."""
+        return [tuple(row) for row in await self.session.execute(DataAccessLayer._low_stock_query())]
+
+    async def units_sold_since(self, since_date):
+        """Return {inventory_id: units_sold} over the sales dated `since_date` or later."""
+        return dict((await self.session.execute(DataAccessLayer._units_sold_since_query(since_date))).all())
+
+    # Sales Management
+    async def add_sale(self, date, amount, items_sold, lines=()):
+        """Record a sale together with its (inventory_id, quantity, unit_price) line items."""
+        sale = await self._stage_sale(date, amount, items_sold, lines)
+        await self.session.commit()
+        return sale
+
+    async def _stage_sale(self, date, amount, items_sold, lines):
+        """Add a sale and its lines to the current transaction without committing."""
+        sale = Sale(date=date, amount=amount, items_sold=items_sold)
+        self.session.add(sale)
+        await self.session.flush()
+        self.session.add_all(
+            SaleLine(sale_id=sale.id, inventory_id=inventory_id, quantity=quantity, unit_price=unit_price)
+            for inventory_id, quantity, unit_price in lines
+        )
+        await self.session.flush()  # The change log entry is read back with the lines
+        await self._update_daily_totals(sales=[(date, amount)])
+        await self._index_search_text("sales_fts", sale.id)
+        await self._log_inserted("sales", sale.id)
+        return sale
+
+    async def checkout(self, lines, date, items_sold):
+        """
+        Take every (inventory_id, quantity, unit_price) line out of stock and record one sale,
+        all in a single transaction; see DataAccessLayer.checkout.
+        Returns the new Sale; raises InsufficientStockError, with nothing written, if any line lacked stock.
+        """
+        try:
+            connection = await self.session.connection()
+            result = await connection.execute(
+                STOCK_DECREMENT, [{"item_id": item_id, "sold": quantity} for item_id, quantity, _ in lines]
+            )
+            if result.rowcount != len(lines):
+                raise InsufficientStockError("Not enough stock available.")
+            await self._log_changed("inventory", "update", sorted({item_id for item_id, _, _ in lines}))
+            amount = sum(quantity * unit_price for _, quantity, unit_price in lines)
+            sale = await self._stage_sale(date, amount, items_sold, lines)
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+            raise
+        for item_id, quantity, _ in lines:
+            self.inventory_cache.adjust_quantity(item_id, -quantity)
+        return sale
+
+    async def get_sales_history(self, include_archive=False, **filters):
+        """Sales matching the filters of DataAccessLayer._sales_query, from the archives too if asked."""
+        archives = await self._attach_archives(filters.get("start_date"), filters.get("end_date")) if include_archive else ()
+        return (await self.session.scalars(DataAccessLayer._sales_query(**filters, archives=archives))).all()
+
+    # Reporting
+    async def _iter_report(self, report, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """Stream a DataAccessLayer report layout one keyset page at a time, from the archives too if asked."""
+        id_column, columns, date_column, headers = report
+        filters = DataAccessLayer._date_filters(date_column, start_date, end_date) if date_column is not None else []
+        last_id, archive_ends, queries, parameters = 0, {}, {}, {}
+        while True:
+            if include_archive:
+                archives = await self._attach_archives(start_date, end_date)
+                new = [schema for schema in archives if schema not in archive_ends]
+                if new:
+                    ends = await self.session.execute(DataAccessLayer._archive_ends_query(id_column.class_, new))
+                    archive_ends.update(ends.all())
+                archives = DataAccessLayer._unfinished_archives(archives, archive_ends, last_id)
+                if archives not in queries:
+                    queries[archives] = DataAccessLayer._archive_page_query(report, start_date, end_date, page_size, archives)
+                query, parameters = queries[archives], {"last_id": last_id}
+            else:
+                query = DataAccessLayer._page_query(id_column, columns, filters, last_id, page_size)
+            page = (await self.session.execute(query, parameters)).all()
+            for row in page:
+                yield dict(zip(headers, row[1:]))
+            if len(page) < page_size:
+                return
+            last_id = page[-1][0]
+
+    async def _open_report(self, report, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """
+        The row stream of a report, with its archives attached up front (see DataAccessLayer._iter_report),
+        so that a range needing too many of them raises ValidationError here rather than midway.
+        """
+        if include_archive:
+            await self._attach_archives(start_date, end_date)
+        return self._iter_report(report, start_date, end_date, page_size, include_archive)
+
+    async def generate_expense_report(self, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """Stream structured expense rows, optionally limited to a date range and including the archives."""
+        return await self._open_report(DataAccessLayer.EXPENSE_REPORT, start_date, end_date, page_size, include_archive)
+
+    async def generate_inventory_report(self, page_size=REPORT_PAGE_SIZE):
+        """Stream structured inventory rows."""
+        return await self._open_report(DataAccessLayer.INVENTORY_REPORT, page_size=page_size)
+
+    async def generate_sales_report(self, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """Stream structured sales rows, optionally limited to a date range and including the archives."""
+        return await self._open_report(DataAccessLayer.SALES_REPORT, start_date, end_date, page_size, include_archive)
+
+    # Aggregation
+    async def summarize_sales(self, period="day", start_date=None, end_date=None):
+        """Return (period, sale_count, revenue, average_sale) tuples, grouped and summed inside SQLite."""
+        result = await self.session.execute(DataAccessLayer._sales_summary_query(period, start_date, end_date))
+        return [tuple(row) for row in result]
+
+    async def summarize_expenses(self, group_by="category", start_date=None, end_date=None):
+        """Return (key, expense_count, total, average_expense) tuples; key is the category or a period bucket."""
+        result = await self.session.execute(DataAccessLayer._expense_summary_query(group_by, start_date, end_date))
+        return [tuple(row) for row in result]
+
+    async def summarize_profit(self, period="month", start_date=None, end_date=None):
+        """Return (period, revenue, expenses, net_profit) tuples."""
+        result = await self.session.execute(DataAccessLayer._profit_query(period, start_date, end_date))
+        return [tuple(row) for row in result]
+
+    async def best_sellers(self, start_date=None, end_date=None, limit=10, inventory_id=None, include_archive=False):
+        """Return (inventory_id, item_name, units_sold, revenue) tuples ranked by units sold."""
+        archives = await self._attach_archives(start_date, end_date) if include_archive else ()
+        query = DataAccessLayer._best_sellers_query(start_date, end_date, limit, inventory_id, archives)
+        return [tuple(row) for row in await self.session.execute(query)]
+
+    async def get_sales_date_bounds(self, start_date=None, end_date=None, include_archive=False):
+        """Return the (first, last) sale dates within an optional range."""
+        archives = await self._attach_archives(start_date, end_date) if include_archive else ()
+        query = DataAccessLayer._sales_date_bounds_query(start_date, end_date, archives)
+        return tuple((await self.session.execute(query)).one())
+
+    # Change feed (see changes.py)
+    async def changes_since(self, seq=0, limit=CHANGES_PAGE_SIZE, entity=None):
+        """See DataAccessLayer.changes_since."""
+        rows = (await self.session.execute(DataAccessLayer._changes_query(seq, limit, entity))).all()
+        return change_entries(rows, await self.session.scalar(select(PRUNED_THROUGH)), seq)
+
+    async def change_log_head(self):
+        """See DataAccessLayer.change_log_head."""
+        return await self.session.scalar(DataAccessLayer._change_log_head_query())
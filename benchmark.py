@@ -0,0 +1,1299 @@
+"""
+Benchmarks for the café data layer. Every benchmark builds its own throwaway
+SQLite database in a temporary directory; the production database is never touched.
+
+    python benchmark.py commits [--count N]
+    python benchmark.py checkout-stress [--threads N] [--stock N]
+    python benchmark.py bulk [--rows N] [--chunk-size N]
+    python benchmark.py http [--clients N] [--seconds N] [--url URL --user NAME --password PW]
+    python benchmark.py async [--tills N] [--ops N]
+    python benchmark.py logins [--count N] [--threads N]
+    python benchmark.py startup [--runs N]
+    python benchmark.py analytics [--sales N] [--expenses N]
+    python benchmark.py reorder [--skus N] [--sales N]
+    python benchmark.py ingest [--threads N] [--sales N]
+    python benchmark.py money [--sales N] [--expenses N]
+    python benchmark.py search [--expenses N] [--sales N]
+    python benchmark.py branches [--branches N] [--tills N] [--sales N] [--scale small]
+    python benchmark.py archive [--scale medium] [--keep-days 90] [--chunk-size N]
+    python benchmark.py changes [--scale small] [--ops N] [--poll-every N]
+    python benchmark.py suite [--scales small medium large] [--output FILE] [--save-baseline] [--tolerance 0.5]
+
+`suite` generates synthetic databases (see synthetic.py), times the main DAL/BLL operations
+at each scale and compares the median latencies with benchmark_baseline.json.
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+
+def bench_commits(count):
+    """Commits per second for single-row expense inserts under each engine profile."""
+    from models import ENGINE_PROFILES, Expense, init_db, get_session
+
+    results = {}
+    for profile in ENGINE_PROFILES:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile=profile)
+            session = get_session(engine)
+            start = time.perf_counter()
+            for i in range(count):
+                session.add(Expense(date=date(2024, 1, 1), amount=1.0 + i, category="Bench", description=None))
+                session.commit()
+            elapsed = time.perf_counter() - start
+            session.close()
+            engine.dispose()
+        results[profile] = count / elapsed
+        print(f"{profile:<8} {results[profile]:>10.0f} commits/s  ({count} commits in {elapsed:.2f}s)")
+    return results
+
+
+def stress_checkout(threads, stock):
+    """
+    Several tills sell the same item one unit at a time until it runs out.
+    With no lost updates, units sold + units left == initial stock, and no sale is recorded without its decrement.
+    """
+    from dal import DataAccessLayer
+    from errors import InsufficientStockError
+    from models import Inventory, Sale, init_db, get_session
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        session = get_session(engine)
+        session.add(Inventory(item_name="Croissant", quantity=stock, cost=2.5))
+        session.commit()
+        item_id = session.query(Inventory.id).scalar()
+
+        sold = [0] * threads
+
+        def till(index):
+            dal = DataAccessLayer(engine)
+            try:
+                while True:
+                    dal.checkout([(item_id, 1, 2.5)], date.today(), "Croissant x 1")
+                    sold[index] += 1
+            except InsufficientStockError:
+                pass
+            dal.session.close()
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=till, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        remaining = session.query(Inventory.quantity).filter_by(id=item_id).scalar()
+        sales = session.query(Sale).count()
+        session.close()
+        engine.dispose()
+
+    print(f"{threads} tills sold {sum(sold)} units in {elapsed:.2f}s ({sum(sold) / elapsed:.0f} checkouts/s), "
+          f"per till: {sold}")
+    print(f"initial stock {stock}, remaining {remaining}, sales recorded {sales}")
+    ok = remaining == 0 and sum(sold) == stock and sales == stock
+    print("OK: no lost updates" if ok else "FAILED: stock and sales disagree")
+    return ok
+
+
+def bench_bulk(rows, chunk_size):
+    """Rows per second for a CSV expense import and the matching JSONL export."""
+    from bll import BusinessLogic
+    from bulk import export_file, import_file
+    from dal import DataAccessLayer
+    from models import init_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "expenses.csv")
+        with open(source, "w", newline="") as stream:
+            writer = csv.writer(stream)
+            writer.writerow(["date", "amount", "category", "description"])
+            for i in range(rows):
+                writer.writerow([f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"{(i % 500) + 0.99:.2f}", f"Category {i % 20}", f"Row {i}"])
+
+        engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        bll = BusinessLogic(DataAccessLayer(engine))
+
+        start = time.perf_counter()
+        imported, rejected = import_file(bll, "expenses", source, chunk_size=chunk_size)
+        import_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = export_file(bll, "expenses", os.path.join(tmp, "expenses.jsonl"))
+        export_elapsed = time.perf_counter() - start
+        bll.dal.session.close()
+        engine.dispose()
+
+    print(f"import {imported} rows ({rejected} rejected) in {import_elapsed:.2f}s: {imported / import_elapsed:>10.0f} rows/s")
+    print(f"export {exported} rows in {export_elapsed:.2f}s: {exported / export_elapsed:>10.0f} rows/s")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def load_test(url, username, password, clients, seconds, checkout_ratio=0.2):
+    """
+    Hammer a running server with `clients` keep-alive connections for `seconds`: a mix of
+    catalogue reads and single-item checkouts. Prints requests/second and latency percentiles.
+    """
+    target = urlsplit(url)
+    auth = "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        rng = random.Random(index)
+        connection = http.client.HTTPConnection(target.hostname, target.port)
+        item_ids = [item["id"] for item in request(connection, "GET", "/inventory")[1]]
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if item_ids and rng.random() < checkout_ratio:
+                body = {"items": [{"item_id": rng.choice(item_ids), "quantity": 1}]}
+                status, _ = request(connection, "POST", "/checkout", body)
+            else:
+                status, _ = request(connection, "GET", "/inventory")
+            latencies[index].append(time.perf_counter() - start)
+            errors[index] += status >= 400
+        connection.close()
+
+    def request(connection, method, path, body=None):
+        headers = {"Authorization": auth, "Content-Type": "application/json"}
+        connection.request(method, path, json.dumps(body).encode() if body is not None else None, headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    all_latencies = sorted(latency for per_client in latencies for latency in per_client)
+    total = len(all_latencies)
+    print(f"{clients} clients, {total} requests in {elapsed:.2f}s: {total / elapsed:.0f} req/s, {sum(errors)} errors")
+    print(f"latency p50 {percentile(all_latencies, 0.50) * 1000:.2f} ms, "
+          f"p99 {percentile(all_latencies, 0.99) * 1000:.2f} ms, max {all_latencies[-1] * 1000 if total else 0:.2f} ms")
+    return total / elapsed
+
+
+def bench_http(clients, seconds):
+    """Start a server on a temp database seeded with a catalogue and a till user, then load-test it."""
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from server import create_server
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = create_server(port=0, db_url=f"sqlite:///{os.path.join(tmp, 'bench.db')}", pool_size=clients, quiet=True)
+        bll = BusinessLogic(DataAccessLayer(server.engine))
+        bll.register_user("till", "till", "till@example.com", "user")
+        for i in range(50):
+            bll.add_inventory_item(f"Item {i}", 1_000_000, 2.5 + i)
+        bll.dal.close()
+
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            load_test(f"http://127.0.0.1:{server.server_address[1]}", "till", "till", clients, seconds)
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.engine.dispose()
+
+
+def bench_async(tills, ops, checkout_ratio=0.2):
+    """
+    Operations/second for the same till workload on the sync DAL (one thread per till) and
+    the async DAL (one task per till on a single event loop). Each operation is a user lookup,
+    plus a one-item checkout for `checkout_ratio` of them.
+    """
+    from async_dal import AsyncDataAccessLayer, init_async_db
+    from dal import DataAccessLayer
+    from models import Inventory, User, get_session, init_db
+
+    rng = random.Random(0)
+    plans = [[rng.randint(1, 50) if rng.random() < checkout_ratio else None for _ in range(ops)] for _ in range(tills)]
+
+    def seed(path):
+        """Create the database with a till user and 50 items; returns its (sync) engine."""
+        engine = init_db(f"sqlite:///{path}")
+        session = get_session(engine)
+        session.add(User(username="till", password="x", email="till@example.com", role="user"))
+        session.add_all(Inventory(item_name=f"Item {i}", quantity=1_000_000, cost=2.5) for i in range(50))
+        session.commit()
+        session.close()
+        return engine
+
+    def run_sync(path):
+        engine = seed(path)
+
+        def till(plan):
+            dal = DataAccessLayer(engine)
+            for item_id in plan:
+                dal.get_user_by_username("till")
+                if item_id:
+                    dal.checkout([(item_id, 1, 2.5)], date.today(), f"Item {item_id - 1} x 1")
+            dal.close()
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=till, args=(plan,)) for plan in plans]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        engine.dispose()
+        return elapsed
+
+    async def run_async(path):
+        seed(path).dispose()
+        engine = await init_async_db(f"sqlite+aiosqlite:///{path}")
+
+        async def till(plan):
+            dal = AsyncDataAccessLayer(engine)
+            for item_id in plan:
+                await dal.get_user_by_username("till")
+                if item_id:
+                    await dal.checkout([(item_id, 1, 2.5)], date.today(), f"Item {item_id - 1} x 1")
+            await dal.close()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(till(plan) for plan in plans))
+        elapsed = time.perf_counter() - start
+        await engine.dispose()
+        return elapsed
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "sync": run_sync(os.path.join(tmp, "sync.db")),
+            "async": asyncio.run(run_async(os.path.join(tmp, "async.db"))),
+        }
+    total = tills * ops
+    for name, elapsed in results.items():
+        print(f"{name:<6} {tills} tills x {ops} ops in {elapsed:.2f}s: {total / elapsed:>8.0f} ops/s")
+    return results
+
+
+def bench_logins(count, threads):
+    """
+    Logins/second with the password KDF on every login (login cache disabled) and with the
+    login cache, across `threads` threads. Also checks that a legacy sha256 row is rehashed.
+    """
+    from bll import BusinessLogic
+    from cache import CredentialCache
+    from dal import DataAccessLayer
+    from models import init_db
+    from passwords import needs_rehash
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        bll = BusinessLogic(DataAccessLayer(engine))
+        bll.register_user("till", "till", "till@example.com", "user")
+        bll.dal.add_user("legacy", hashlib.sha256(b"legacy").hexdigest(), "legacy@example.com", "user")
+        bll.authenticate_user("legacy", "legacy")
+        rehashed = not needs_rehash(bll.dal.get_user_by_username("legacy").password)
+        print(f"legacy sha256 password rehashed on login: {'yes' if rehashed else 'NO'}")
+        bll.authenticate_user("till", "till")  # Warm the login cache for the cached run
+        bll.dal.close()
+
+        def run(cached):
+            def worker():
+                dal = DataAccessLayer(engine)
+                if not cached:
+                    dal.login_cache = CredentialCache(ttl=0)
+                worker_bll = BusinessLogic(dal)
+                for _ in range(count // threads):
+                    worker_bll.authenticate_user("till", "till")
+                dal.close()
+
+            start = time.perf_counter()
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            return (count // threads * threads) / (time.perf_counter() - start)
+
+        results = {"KDF every login": run(cached=False), "login cache": run(cached=True)}
+        engine.dispose()
+    for name, rate in results.items():
+        print(f"{name:<16} {rate:>10.0f} logins/s ({threads} threads)")
+    return results
+
+
+def bench_analytics(sales, expenses):
+    """
+    Load time of the NumPy analytics snapshot against the per-row dict path
+    (view_sales_history/view_expense_history), rollup timings, and an incremental refresh.
+    The snapshot's monthly profit is checked against the SQL summary.
+    """
+    from analytics import AnalyticsSnapshot
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from models import Expense, Sale, init_db
+
+    rng = random.Random(0)
+    first_day = date(2022, 1, 1).toordinal()
+
+    def random_rows(count, model):
+        for _ in range(count):
+            row = {"date": date.fromordinal(first_day + rng.randrange(3 * 365)), "amount": round(rng.uniform(1, 200), 2)}
+            if model is Sale:
+                row["items_sold"] = "Espresso x 1"
+            else:
+                row.update(category=f"Category {rng.randrange(12)}", description=None)
+            yield row
+
+    def timed(label, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        print(f"{label:<40} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        bll = BusinessLogic(DataAccessLayer(engine))
+        bll.dal.bulk_add("sales", list(random_rows(sales, Sale)))
+        bll.dal.bulk_add("expenses", list(random_rows(expenses, Expense)))
+
+        timed(f"dict path: {sales} sales + {expenses} expenses", lambda: (bll.view_sales_history(), bll.view_expense_history()))
+        snapshot = AnalyticsSnapshot(engine)
+        timed("snapshot: full load", snapshot.reload)
+        print(f"{'snapshot memory':<40} {snapshot.stats()['bytes'] / 1024:>9.0f} KiB")
+        timed("rolling 7-day revenue", snapshot.rolling_revenue, 7)
+        timed("rolling 30-day moving average", snapshot.moving_average, 30)
+        timed("spend by category", snapshot.spend_by_category)
+        margins = timed("monthly profit margin", snapshot.profit_margin, "month")
+
+        bll.dal.bulk_add("sales", list(random_rows(100, Sale)))
+        new_sales, _ = timed("incremental refresh (+100 sales)", snapshot.refresh)
+
+        expected = [(period, revenue, spent) for period, revenue, spent, _ in bll.dal.summarize_profit("month")]
+        actual = [(period, revenue, spent) for period, revenue, spent, _ in snapshot.profit_margin("month")]
+        ok = new_sales == 100 and len(actual) == len(expected) and all(
+            a[0] == e[0] and abs(a[1] - float(e[1])) < 1e-6 and abs(a[2] - float(e[2])) < 1e-6 for a, e in zip(actual, expected)
+        )
+        print("OK: snapshot matches the SQL summary" if ok else "FAILED: snapshot and SQL summary disagree")
+        bll.dal.close()
+        engine.dispose()
+    return ok
+
+
+def bench_ingest(threads, sales):
+    """
+    Checkout throughput of `threads` tills selling `sales` single-item sales each, committing
+    every sale itself vs. queueing to a group-committing SaleWriter, under each engine profile.
+    Checks that units sold + units left == initial stock and that every sale was recorded.
+    """
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from ingest import SaleWriter
+    from models import ENGINE_PROFILES, Inventory, Sale, init_db
+
+    stock = threads * sales
+    ok = True
+    print(f"{'Profile':<8} {'Mode':<13} {'Sales/s':>9} {'Avg batch':>10}")
+    for profile in ENGINE_PROFILES:
+        for grouped in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile=profile)
+                setup = DataAccessLayer(engine)
+                item_id = setup.add_inventory_item("Croissant", stock, 2.5).id
+                writer = SaleWriter(engine).start() if grouped else None
+
+                def till():
+                    bll = BusinessLogic(DataAccessLayer(engine), writer)
+                    for _ in range(sales):
+                        bll.purchase_item(item_id, 1, confirm_payment=True)
+                    bll.dal.close()
+
+                start = time.perf_counter()
+                tills = [threading.Thread(target=till) for _ in range(threads)]
+                for thread in tills:
+                    thread.start()
+                for thread in tills:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                batch = writer.stats()["average_batch"] if writer else 1.0
+                if writer:
+                    writer.close()
+
+                left = setup.session.query(Inventory.quantity).filter_by(id=item_id).scalar()
+                recorded = setup.session.query(Sale).count()
+                setup.close()
+                engine.dispose()
+            consistent = left == 0 and recorded == stock
+            ok = ok and consistent
+            print(f"{profile:<8} {'group commit' if grouped else 'per sale':<13} {stock / elapsed:>9.0f} {batch:>10.1f}"
+                  f"{'' if consistent else '  INCONSISTENT'}")
+    return ok
+
+
+def bench_reorder(skus, sales, window_days=28):
+    """
+    Reorder list timings on a large catalogue and sales history: the low-stock index
+    query, recent units sold and the full ranked list. The list is checked against one
+    computed by scanning every item and sale line.
+    """
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from models import init_db
+
+    rng = random.Random(0)
+    today = datetime.now().date()
+
+    def timed(label, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        print(f"{label:<40} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        bll = BusinessLogic(DataAccessLayer(engine))
+        bll.dal.bulk_add("inventory", [
+            {"item_name": f"SKU {i}", "quantity": rng.randrange(200), "cost": 2.5, "reorder_threshold": rng.randrange(20)}
+            for i in range(skus)
+        ])
+        rows = []
+        for _ in range(sales):
+            lines = [(rng.randrange(1, skus + 1), rng.randrange(1, 4), 2.5) for _ in range(rng.randrange(1, 4))]
+            rows.append({"date": today - timedelta(days=rng.randrange(2 * 365)), "amount": 2.5 * sum(q for _, q, _ in lines),
+                         "items_sold": "", "lines": lines})
+        for start in range(0, len(rows), 10000):
+            bll.dal.bulk_add("sales", rows[start:start + 10000])
+
+        low = timed(f"low stock ({skus} SKUs)", bll.dal.low_stock_items)
+        since = today - timedelta(days=window_days - 1)
+        timed(f"units sold, last {window_days} days ({sales} sales)", bll.dal.units_sold_since, since)
+        suggestions = timed("ranked reorder list", bll.reorder_suggestions, window_days)
+        print(f"{len(low)} item(s) at or below threshold, {len(suggestions)} to reorder")
+
+        # Reference: every item and every sale line, no indexes
+        units_sold = {}
+        for sale in rows:
+            if sale["date"] >= since:
+                for item_id, quantity, _ in sale["lines"]:
+                    units_sold[item_id] = units_sold.get(item_id, 0) + quantity
+        reference = BusinessLogic._rank_reorders([], bll.dal.get_inventory(), units_sold, window_days, 7, 14)
+        ok = {entry["id"]: entry for entry in suggestions} == {entry["id"]: entry for entry in reference}
+        print("OK: matches a full scan" if ok else "FAILED: reorder list differs from a full scan")
+        bll.dal.close()
+        engine.dispose()
+    return ok
+
+
+
+def bench_money(sales, expenses):
+    """
+    Aggregate and report speed with money stored as REAL currency units (schema version 4)
+    and, after migration 5, as INTEGER cents. The same grand total, monthly summary and
+    formatted report pass run on both; the float total is compared with the exact sum.
+    """
+    from decimal import Decimal
+
+    from sqlalchemy import Float, MetaData, create_engine
+
+    from dal import DataAccessLayer
+    from migrations import MONEY_COLUMNS, rebuild_daily_totals
+    from models import SALES_TOTALS_CATEGORY, Base, from_cents, init_db
+
+    rng = random.Random(0)
+    first_day = date(2022, 1, 1).toordinal()
+    categories = [f"Category {i}" for i in range(12)]
+    sale_rows = [
+        (date.fromordinal(first_day + rng.randrange(3 * 365)).isoformat(), f"{rng.randrange(100, 20000) / 100:.2f}", "Espresso x 1")
+        for _ in range(sales)
+    ]
+    expense_rows = [
+        (date.fromordinal(first_day + rng.randrange(3 * 365)).isoformat(), f"{rng.randrange(500, 50000) / 100:.2f}",
+         rng.choice(categories), None)
+        for _ in range(expenses)
+    ]
+    exact = sum(Decimal(amount) for _, amount, _ in sale_rows)
+
+    # name: (SQL, parameters); daily_totals holds each day's sales under SALES_TOTALS_CATEGORY
+    queries = {
+        "grand total": ("SELECT SUM(amount) FROM sales", ()),
+        "monthly sales summary": (
+            "SELECT strftime('%Y-%m', date), SUM(sale_count), SUM(revenue), SUM(revenue) / SUM(sale_count) "
+            "FROM daily_totals WHERE category = ? GROUP BY 1 ORDER BY 1",
+            (SALES_TOTALS_CATEGORY,),
+        ),
+        "expenses per category": (
+            "SELECT category, SUM(expense_count), SUM(expense_total) FROM daily_totals "
+            "WHERE category != ? GROUP BY 1 ORDER BY 1",
+            (SALES_TOTALS_CATEGORY,),
+        ),
+    }
+
+    def timed(label, func, *args, runs=5):
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label:<44} {best * 1000:>9.1f} ms")
+        return result
+
+    def run_queries(connection, stage):
+        return {
+            name: timed(f"{stage}: {name}", lambda sql=sql, parameters=parameters: connection.exec_driver_sql(sql, parameters).all())
+            for name, (sql, parameters) in queries.items()
+        }
+
+    def report(connection, to_text):
+        cursor = connection.exec_driver_sql("SELECT date, amount, items_sold FROM sales ORDER BY id")
+        return sum(len(to_text(amount)) for _, amount, _ in cursor)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # The version 4 schema: every money column declared REAL
+        legacy = MetaData()
+        for model_table in Base.metadata.sorted_tables:
+            table = model_table.to_metadata(legacy)
+            for name in MONEY_COLUMNS.get(model_table, ()):
+                table.c[name].type = Float()
+        engine = create_engine(url)
+        legacy.create_all(engine)
+        with engine.connect() as connection:
+            connection.exec_driver_sql("INSERT INTO sales (date, amount, items_sold) VALUES (?, CAST(? AS REAL), ?)", sale_rows)
+            connection.exec_driver_sql(
+                "INSERT INTO expenses (date, amount, category, description) VALUES (?, CAST(? AS REAL), ?, ?)", expense_rows
+            )
+            connection.commit()
+            rebuild_daily_totals(connection)
+            connection.exec_driver_sql("PRAGMA user_version = 4")
+            connection.commit()
+
+            print(f"{sales} sales, {expenses} expenses")
+            before = run_queries(connection, "REAL")
+            timed("REAL: sales report, formatted per row", report, connection, lambda amount: f"{amount:.2f}")
+        engine.dispose()
+
+        start = time.perf_counter()
+        engine = init_db(url)  # Runs migration 5
+        print(f"{'migration to integer cents':<44} {(time.perf_counter() - start) * 1000:>9.1f} ms")
+        dal = DataAccessLayer(engine)
+        with engine.connect() as connection:
+            after = run_queries(connection, "INTEGER")
+            timed("INTEGER: sales report, formatted per row", report, connection, lambda amount: str(from_cents(amount)))
+        timed("DAL: summarize_sales('month')", dal.summarize_sales, "month")
+        timed("DAL: summarize_expenses('category')", dal.summarize_expenses, "category")
+        timed("DAL: sales report stream, formatted", lambda: sum(len(str(row["Amount"])) for row in dal.generate_sales_report()))
+
+        float_total = before["grand total"][0][0]
+        cents_total = after["grand total"][0][0]
+        print(f"exact total {exact}, REAL SUM {float_total!r} (off by {Decimal(float_total) - exact:.3e}), "
+              f"INTEGER SUM {from_cents(cents_total)}")
+        ok = from_cents(cents_total) == exact and all(
+            after[name] and [row[2] for row in after[name]] == [round(row[2] * 100) for row in before[name]]
+            for name in ("monthly sales summary", "expenses per category")
+        )
+        print("OK: integer totals are exact" if ok else "FAILED: integer totals differ from the exact sums")
+        dal.close()
+        engine.dispose()
+    return ok
+
+
+def bench_search(expenses, sales):
+    """
+    Filtered listings compiled to SQL against loading the whole history and filtering it in
+    Python, and the FTS5 description search against a LIKE scan. Each SQL result is
+    checked against the Python filter.
+    """
+    from sqlalchemy import select
+
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from models import Expense, init_db
+
+    rng = random.Random(0)
+    first_day = date(2022, 1, 1).toordinal()
+    words = ["espresso", "milk", "beans", "repair", "cleaning", "supplier", "invoice", "delivery", "rent", "wages",
+             "grinder", "cups", "lids", "sugar", "syrup", "pastries", "flour", "butter", "electricity", "water"]
+    categories = [f"Category {i}" for i in range(12)]
+
+    def timed(label, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        print(f"{label:<48} {(time.perf_counter() - start) * 1000:>9.1f} ms  ({len(result)} rows)")
+        return result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = init_db(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        bll = BusinessLogic(DataAccessLayer(engine))
+        start = time.perf_counter()
+        for offset in range(0, expenses, 10000):
+            bll.dal.bulk_add("expenses", [
+                {"date": date.fromordinal(first_day + rng.randrange(3 * 365)), "amount": rng.randrange(100, 100000) / 100,
+                 "category": rng.choice(categories), "description": " ".join(rng.choices(words, k=6)) + f" #{i}"}
+                for i in range(offset, min(offset + 10000, expenses))
+            ])
+        for offset in range(0, sales, 10000):
+            bll.dal.bulk_add("sales", [
+                {"date": date.fromordinal(first_day + rng.randrange(3 * 365)), "amount": rng.randrange(100, 5000) / 100,
+                 "items_sold": f"{rng.choice(words).title()} x {rng.randrange(1, 5)}"}
+                for _ in range(offset, min(offset + 10000, sales))
+            ])
+        print(f"{'bulk load, search index included':<48} {(time.perf_counter() - start) * 1000:>9.1f} ms  "
+              f"({expenses} expenses, {sales} sales)")
+
+        cases = [
+            ("one category, one month", {"category": "Category 3", "start_date": "2023-06-01", "end_date": "2023-06-30"},
+             lambda e: e["category"] == "Category 3" and date(2023, 6, 1) <= e["date"] <= date(2023, 6, 30)),
+            ("amount 990-1000, newest 20", {"min_amount": 990, "max_amount": 1000, "sort": "date", "descending": True,
+                                            "limit": 20},
+             lambda e: 990 <= e["amount"] <= 1000),
+            ("description contains 'grinder cups'", {"search": "grinder cups"},
+             lambda e: "grinder cups" in e["description"]),
+        ]
+        ok = True
+        everything = timed("all expenses, unfiltered", bll.view_expense_history)
+        for label, filters, predicate in cases:
+            python_rows = timed(f"Python: {label}", lambda: [e for e in bll.view_expense_history() if predicate(e)])
+            sql_rows = timed(f"SQL:    {label}", lambda: bll.view_expense_history(**filters))
+            if "limit" in filters:
+                python_rows = sorted(python_rows, key=lambda e: e["date"], reverse=True)[:filters["limit"]]
+                ok &= [e["date"] for e in python_rows] == [e["date"] for e in sql_rows]
+            else:
+                ok &= python_rows == sql_rows
+
+        for text in ("grinder cups", f"#{expenses // 2}"):
+            like_query = select(Expense).where(Expense.description.like(f"%{text}%"))
+            like = timed(f"LIKE scan: description contains '{text}'", lambda: bll.dal.session.scalars(like_query).all())
+            ok &= len(like) == len(timed(f"FTS5: description contains '{text}'",
+                                         lambda: bll.dal.get_expense_history(search=text)))
+        timed("FTS5: sales whose items contain 'syrup', top 50", lambda: bll.view_sales_history(
+            search="syrup", sort="amount", descending=True, limit=50))
+        print(f"{len(everything)} expenses in total")
+        print("OK: SQL filters match the Python filters" if ok else "FAILED: SQL and Python filters disagree")
+        bll.dal.close()
+        engine.dispose()
+    return ok
+
+def bench_branches(branches, tills, sales, scale="small"):
+    """
+    Checkout throughput of `branches` branches with `tills` tills each, all on one shared
+    database vs. one database per branch; then a consolidated summary over `branches`
+    synthetic branch histories, branch by branch vs. fanned out to a thread pool. Checks
+    that no sale was lost and that the merged totals equal the per-branch totals.
+    """
+    from sqlalchemy import func, select
+
+    from bll import BusinessLogic
+    from branches import Branches
+    from dal import DataAccessLayer
+    from models import ENGINE_PROFILES, Expense, Inventory, Sale, init_db
+    from synthetic import generate
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'Profile':<8} {'Layout':<22} {'Sales/s':>9}  ({branches} branches x {tills} tills x {sales} sales)")
+        for profile in ENGINE_PROFILES:
+            for layout, files in (("one shared database", 1), ("database per branch", branches)):
+                engines = [init_db(f"sqlite:///{os.path.join(tmp, f'{profile}-{files}-{i}.db')}", profile=profile)
+                           for i in range(files)]
+                engines = [engines[i % files] for i in range(branches)]
+                item_ids = []
+                for i, engine in enumerate(engines):
+                    setup = DataAccessLayer(engine)
+                    item_ids.append(setup.add_inventory_item(f"Croissant {i}", tills * sales, 2.5).id)
+                    setup.close()
+
+                def till(engine, item_id):
+                    bll = BusinessLogic(DataAccessLayer(engine))
+                    for _ in range(sales):
+                        bll.purchase_item(item_id, 1, confirm_payment=True)
+                    bll.dal.close()
+
+                threads = [threading.Thread(target=till, args=(engine, item_id))
+                           for engine, item_id in zip(engines, item_ids) for _ in range(tills)]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                recorded = 0
+                for engine in set(engines):
+                    dal = DataAccessLayer(engine)
+                    recorded += dal.session.query(Sale).count()
+                    ok &= not dal.session.query(Inventory).filter(Inventory.quantity != 0).count()
+                    dal.close()
+                    engine.dispose()
+                ok &= recorded == branches * tills * sales
+                print(f"{profile:<8} {layout:<22} {recorded / elapsed:>9.0f}")
+
+        root = os.path.join(tmp, "branches")
+        os.makedirs(root)
+        start = time.perf_counter()
+        for i in range(branches):
+            generate(f"sqlite:///{os.path.join(root, f'branch-{i}.db')}", scale, seed=i).dispose()
+        print(f"\n{branches} synthetic '{scale}' branch histories in {time.perf_counter() - start:.1f}s")
+
+        group = Branches(root)
+        expected_revenue = expected_expenses = 0
+        for name in group.names():
+            dal = group.dal(name)
+            expected_revenue += dal.session.scalar(select(func.sum(Sale.amount)))
+            expected_expenses += dal.session.scalar(select(func.sum(Expense.amount)))
+            dal.close()
+        group.consolidated_summary("month")  # Warm up: open and migrate every engine
+        timings = {}
+        for label, workers in (("sequential", 1), ("default pool", None), ("thread per branch", branches)):
+            runs = []
+            for _ in range(3):
+                start = time.perf_counter()
+                summary = group.consolidated_summary("month", max_workers=workers)
+                runs.append(time.perf_counter() - start)
+            timings[label] = min(runs)
+            print(f"consolidated summary, {label:<17} {timings[label] * 1000:>9.1f} ms")
+            revenue = sum(row[1] for row in summary["By Branch"])
+            spent = sum(row[2] for row in summary["By Branch"])
+            ok &= revenue == expected_revenue == sum(row[2] for row in summary["Sales"])
+            ok &= spent == expected_expenses == sum(row[2] for row in summary["Expenses by Category"])
+        print(f"speed-up with a thread per branch {timings['sequential'] / timings['thread per branch']:.2f}x "
+              f"on {os.cpu_count()} CPU(s)")
+        group.dispose()
+    print("OK: no lost sales, merged totals match" if ok else "FAILED: lost sales or merged totals differ")
+    return ok
+
+def bench_archive(scale="medium", keep_days=90, chunk_size=5000):
+    """
+    Day-to-day queries on a synthetic history before and after archiving everything older
+    than `keep_days` days, and the same queries with include_archive. Checks that every
+    listing, report and best-seller ranking read with include_archive matches the one
+    taken before the archive job, and that daily_totals still agree with the hot rows.
+    """
+    from archive import archive_rows
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from migrations import check_daily_totals
+    from synthetic import generate
+
+    end_date = date(2025, 12, 31)
+    recent = (end_date - timedelta(days=6)).isoformat()
+    cutoff = end_date - timedelta(days=keep_days)
+    operations = {
+        "sales report, full stream": lambda bll, archive: sum(1 for _ in bll.generate_reports(include_archive=archive)["Sales"]),
+        "sales this week": lambda bll, archive: len(bll.view_sales_history(start_date=recent, include_archive=archive)),
+        "largest 20 expenses": lambda bll, archive: len(bll.view_expense_history(
+            sort="amount", descending=True, limit=20, include_archive=archive)),
+        "best sellers, all time": lambda bll, archive: len(bll.best_sellers(include_archive=archive)),
+        "monthly summary": lambda bll, archive: len(bll.generate_summary("month")["Sales"]),
+    }
+
+    def run(bll, stage, archive):
+        results = {}
+        for label, operation in operations.items():
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                rows = operation(bll, archive)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[label] = rows
+            print(f"{stage:<18} {label:<28} {best * 1000:>9.1f} ms  ({rows} rows)")
+        return results
+
+    def everything(bll):
+        return (
+            bll.view_sales_history(include_archive=True), bll.view_expense_history(include_archive=True),
+            [list(rows) for name, rows in bll.generate_reports(include_archive=True).items() if name != "Inventory"],
+            bll.best_sellers(limit=50, include_archive=True),
+        )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = generate(f"sqlite:///{path}", scale, end_date=end_date)
+        bll = BusinessLogic(DataAccessLayer(engine))
+        expected = everything(bll)
+        before = run(bll, "before archiving", False)
+
+        start = time.perf_counter()
+        moved = archive_rows(engine, cutoff, chunk_size=chunk_size, vacuum=True)
+        elapsed = time.perf_counter() - start
+        print(f"archived {moved['sales']} sales and {moved['expenses']} expenses dated before {cutoff} in {elapsed:.1f}s "
+              f"({(moved['sales'] + moved['expenses']) / elapsed:.0f} rows/s, then VACUUM)")
+        sizes = sorted((name, os.path.getsize(os.path.join(tmp, name))) for name in os.listdir(tmp) if name.endswith(".db"))
+        print("  " + ", ".join(f"{name} {size / 1e6:.1f} MB" for name, size in sizes))
+
+        bll.dal.session.expire_all()
+        run(bll, "hot tables only", False)
+        after = run(bll, "include archive", True)
+        ok = everything(bll) == expected and after == before
+        with engine.connect() as connection:
+            ok &= not check_daily_totals(connection)
+        bll.dal.close()
+        engine.dispose()
+    print("OK: archived history reads back unchanged" if ok else "FAILED: results changed after archiving")
+    return ok
+
+def bench_changes(scale="small", ops=5000, poll_every=100):
+    """
+    A consumer kept current from the change log against one that re-reads the inventory,
+    sales, expenses and users in full, polling after every `poll_every` of `ops` mixed writes
+    (checkouts, expenses, restocks, price changes, new and deleted items) on a synthetic
+    database. Checks that the consumer's copy matches the tables, also when it catches up
+    from an old cursor after compaction, and that retention then expires that cursor.
+    """
+    import copy
+    from decimal import Decimal
+
+    from sqlalchemy import func, select, update
+
+    from changes import trim_changes
+    from dal import DataAccessLayer
+    from errors import CursorExpiredError, InsufficientStockError
+    from models import Change
+    from synthetic import generate
+
+    fields = {
+        "inventory": ("item_name", "quantity", "cost", "reorder_threshold"),
+        "sales": ("date", "amount", "items_sold"),
+        "expenses": ("date", "amount", "category", "description"),
+        "users": ("username", "email", "role"),
+    }
+
+    def full_read(dal):
+        """{table: {id: values}}, read from the tables."""
+        return {
+            "inventory": {row.id: tuple(getattr(row, field) for field in fields["inventory"]) for row in dal.search_inventory()},
+            "sales": {row.id: tuple(getattr(row, field) for field in fields["sales"]) for row in dal.get_sales_history()},
+            "expenses": {row.id: tuple(getattr(row, field) for field in fields["expenses"]) for row in dal.get_expense_history()},
+            "users": {row["id"]: tuple(row[field] for field in fields["users"]) for row in dal.get_all_users()},
+        }
+
+    def catch_up(dal, tables, seq):
+        """Apply the entries after `seq` to `tables`; returns the new cursor."""
+        while entries := dal.changes_since(seq):
+            for entry in entries:
+                if entry.operation == "delete":
+                    tables[entry.entity].pop(entry.entity_id, None)
+                else:
+                    tables[entry.entity][entry.entity_id] = tuple(entry.data[field] for field in fields[entry.entity])
+            seq = entries[-1].seq
+        return seq
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = generate(f"sqlite:///{os.path.join(tmp, 'bench.db')}", scale)
+        writer, reader = DataAccessLayer(engine), DataAccessLayer(engine)
+        first_seq = seq = reader.change_log_head()
+        initial = full_read(reader)
+        tables = copy.deepcopy(initial)
+        items = [item.id for item in writer.get_inventory()]
+        added = []
+        write_time = delta_time = full_time = 0.0
+        polls = 0
+        for op in range(1, ops + 1):
+            roll = rng.random()
+            start = time.perf_counter()
+            if roll < 0.7:
+                lines = [(item_id, rng.randint(1, 3), Decimal("2.50")) for item_id in rng.sample(items, rng.randint(1, 3))]
+                try:
+                    writer.checkout(lines, date(2026, 1, 1), f"Bench x {len(lines)}")
+                except InsufficientStockError:
+                    pass
+            elif roll < 0.8:
+                writer.add_expense(date(2026, 1, 1), Decimal(rng.randrange(100, 10000)) / 100, "Bench", f"bench {op}")
+            elif roll < 0.9:
+                writer.update_inventory_quantity(rng.choice(items), rng.randrange(100, 1000))
+            elif roll < 0.95:
+                writer.update_inventory_item(rng.choice(items), {"cost": Decimal(rng.randrange(50, 2500)) / 100})
+            elif roll < 0.975 or not added:
+                added.append(writer.add_inventory_item(f"Bench item {op}", 100, Decimal("1.00")).id)
+            else:
+                writer.delete_inventory_item(added.pop(rng.randrange(len(added))))
+            write_time += time.perf_counter() - start
+            if op % poll_every == 0:
+                start = time.perf_counter()
+                seq = catch_up(reader, tables, seq)
+                delta_time += time.perf_counter() - start
+                start = time.perf_counter()
+                full_read(reader)
+                full_time += time.perf_counter() - start
+                polls += 1
+        seq = catch_up(reader, tables, seq)
+        current = full_read(reader)
+        ok = tables == current
+        logged = seq - first_seq
+        print(f"{ops} writes in {write_time:.2f}s ({ops / write_time:.0f}/s), {logged} change log entries "
+              f"({logged / ops:.1f} per write)")
+        print(f"{'catch up from the change log':<32} {delta_time / polls * 1000:>9.2f} ms per poll  ({polls} polls)")
+        print(f"{'re-read every table in full':<32} {full_time / polls * 1000:>9.2f} ms per poll")
+
+        # Age the whole log past the compaction horizon, then compact it
+        with engine.begin() as connection:
+            connection.execute(update(Change).values(changed_at=func.datetime(Change.changed_at, "-2 days")))
+            before = connection.execute(select(func.count()).select_from(Change)).scalar()
+        start = time.perf_counter()
+        removed = trim_changes(engine, retain_days=None, compact_after_days=1)
+        elapsed = time.perf_counter() - start
+        print(f"compaction removed {removed['compacted']} of {before} entries in {elapsed * 1000:.0f} ms")
+        # A consumer still at the first cursor catches up on the latest state of every row
+        late = copy.deepcopy(initial)
+        catch_up(reader, late, first_seq)
+        ok &= late == current
+        trim_changes(engine, retain_days=1, compact_after_days=None)
+        try:
+            reader.changes_since(first_seq)
+            ok = False
+        except CursorExpiredError:
+            pass
+        writer.close()
+        reader.close()
+        engine.dispose()
+    print("OK: consumers caught up from the change log match the tables" if ok
+          else "FAILED: a consumer's copy differs from the tables")
+    return ok
+
+# Written by `benchmark.py suite --save-baseline`; later suite runs are compared against it
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def measure(func, iterations):
+    """Call func() `iterations` times; return its throughput and latency percentiles."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_s": iterations / sum(timings),
+        "mean_ms": sum(timings) / iterations * 1000,
+        "p50_ms": timings[iterations // 2] * 1000,
+        "p95_ms": timings[min(iterations - 1, iterations * 95 // 100)] * 1000,
+    }
+
+
+def suite_operations(bll, scale, rng):
+    """(name, iterations, callable) for every operation the suite times, against a BusinessLogic over synthetic data."""
+    from cache import CredentialCache
+    from synthetic import EXPENSE_CATEGORIES, SYNTHETIC_PASSWORD
+
+    dal = bll.dal
+    last_day = dal.get_sales_date_bounds()[1]
+    month_start = (last_day - timedelta(days=29)).isoformat()
+    hot_items = range(1, min(scale.skus, 50) + 1)
+
+    def cold_inventory():
+        dal.inventory_cache.invalidate()
+        dal.get_inventory()
+
+    def reports(start=None, end=None):
+        for rows in bll.generate_reports(start, end).values():
+            for _ in rows:
+                pass
+
+    def kdf_login():
+        cache, dal.login_cache = dal.login_cache, CredentialCache(ttl=0)
+        try:
+            bll.authenticate_user(f"user{rng.randrange(scale.users)}", SYNTHETIC_PASSWORD)
+        finally:
+            dal.login_cache = cache
+
+    bll.authenticate_user("user0", SYNTHETIC_PASSWORD)  # Warm the login cache for the cached run
+    return [
+        ("get_inventory (cold)", 20, cold_inventory),
+        ("get_inventory (cached)", 2000, dal.get_inventory),
+        ("purchase_item", 500, lambda: bll.purchase_item(rng.choice(hot_items), 1, confirm_payment=True)),
+        ("record_sale", 500, lambda: bll.record_sale(last_day.isoformat(), "7.50", "SKU 00000 x 1, SKU 00001 x 2")),
+        ("record_expense", 500, lambda: bll.record_expense(
+            last_day.isoformat(), "42.00", rng.choice(EXPENSE_CATEGORIES), "benchmark")),
+        ("generate_reports (30 days)", 10, lambda: reports(month_start, last_day.isoformat())),
+        ("generate_reports (all)", 3, reports),
+        ("authenticate_user (cached)", 2000, lambda: bll.authenticate_user("user0", SYNTHETIC_PASSWORD)),
+        ("authenticate_user (KDF)", 10, kdf_login),
+    ]
+
+
+def compare_to_baseline(results, baseline, tolerance, noise_ms=0.05):
+    """
+    Print each operation's p50 next to the baseline's. Returns (scale, operation, baseline_ms, current_ms)
+    for every operation whose p50 grew by more than `tolerance` (a fraction) and by more than
+    `noise_ms`, so timer jitter on microsecond operations isn't reported.
+    """
+    regressions = []
+    print(f"\n{'Scale':<8} {'Operation':<30} {'Baseline p50':>13} {'Current p50':>12} {'Change':>8}")
+    for scale, operations in results.items():
+        for name, current in operations.items():
+            previous = baseline.get(scale, {}).get(name)
+            if previous is None:
+                continue
+            change = current["p50_ms"] / previous["p50_ms"] - 1 if previous["p50_ms"] else 0.0
+            slower = change > tolerance and current["p50_ms"] - previous["p50_ms"] > noise_ms
+            flag = "  REGRESSION" if slower else ""
+            print(f"{scale:<8} {name:<30} {previous['p50_ms']:>10.3f} ms {current['p50_ms']:>9.3f} ms {change:>+8.0%}{flag}")
+            if flag:
+                regressions.append((scale, name, previous["p50_ms"], current["p50_ms"]))
+    return regressions
+
+
+def bench_suite(scales, seed=0, output=None, baseline_path=BASELINE_PATH, save_baseline=False, tolerance=0.5):
+    """
+    Time the main DAL/BLL operations on synthetic databases of each scale (see synthetic.SCALES).
+    Results are written as JSON to `output` (if given) and compared against the stored baseline;
+    returns False if any operation regressed by more than `tolerance`.
+    """
+    import platform
+
+    import sqlalchemy
+
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+    from synthetic import SCALES, generate
+
+    results = {}
+    for scale_name in scales:
+        scale = SCALES[scale_name]
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            engine = generate(f"sqlite:///{os.path.join(tmp, 'bench.db')}", scale, seed)
+            print(f"\n[{scale_name}] {scale} generated in {time.perf_counter() - start:.1f}s")
+            bll = BusinessLogic(DataAccessLayer(engine))
+            rng = random.Random(seed)
+            results[scale_name] = {}
+            for name, iterations, func in suite_operations(bll, scale, rng):
+                result = results[scale_name][name] = measure(func, iterations)
+                print(f"{name:<30} {result['ops_per_s']:>10.0f} ops/s  p50 {result['p50_ms']:>9.3f} ms  "
+                      f"p95 {result['p95_ms']:>9.3f} ms")
+            bll.dal.close()
+            engine.dispose()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": seed,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+
+    regressions = []
+    if save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            regressions = compare_to_baseline(results, json.load(f)["results"], tolerance)
+        print(f"{len(regressions)} regression(s) beyond {tolerance:.0%}" if regressions else "No regressions.")
+    return not regressions
+
+
+# (label, python arguments) of the commands whose startup cost is tracked
+STARTUP_COMMANDS = [
+    ("import dal", ["-c", "import dal"]),
+    ("import bll", ["-c", "import bll"]),
+    ("presentation_layer.py --help", ["presentation_layer.py", "--help"]),
+    ("bulk.py --help", ["bulk.py", "--help"]),
+    ("server.py --help", ["server.py", "--help"]),
+]
+
+
+def parse_importtime(stderr):
+    """Return (total import microseconds, names of every imported module) from `-X importtime` output."""
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):  # Top-level imports are not indented
+            total += int(cumulative)
+    return total, modules
+
+
+def bench_startup(runs):
+    """
+    Import time (from `python -X importtime`) and wall time of each startup command, best of
+    `runs`, run from an empty working directory. Flags commands that load SQLAlchemy or
+    create a database file just by starting.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {key: value for key, value in os.environ.items() if key != "CAFE_DB_URL"}
+    env["PYTHONPATH"] = here
+    results = {}
+    print(f"{'Command':<30} {'Import ms':>10} {'Wall ms':>9}  SQLAlchemy  Creates DB")
+    for label, args in STARTUP_COMMANDS:
+        if not args[0].startswith("-"):
+            args = [os.path.join(here, args[0])] + args[1:]
+        best_import = best_wall = float("inf")
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(runs):
+                start = time.perf_counter()
+                completed = subprocess.run(
+                    [sys.executable, "-X", "importtime", *args], cwd=tmp, env=env, capture_output=True, text=True
+                )
+                best_wall = min(best_wall, time.perf_counter() - start)
+                import_us, modules = parse_importtime(completed.stderr)
+                best_import = min(best_import, import_us / 1000)
+            creates_db = bool(os.listdir(tmp))
+        loads_sqlalchemy = "sqlalchemy" in modules
+        results[label] = {"import_ms": best_import, "wall_ms": best_wall * 1000,
+                          "sqlalchemy": loads_sqlalchemy, "creates_db": creates_db}
+        print(f"{label:<30} {best_import:>10.1f} {best_wall * 1000:>9.1f}  {'yes' if loads_sqlalchemy else 'no':<10}  "
+              f"{'YES' if creates_db else 'no'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Brew and Bite data layer benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    commits = subparsers.add_parser("commits", help="single-row commit throughput per engine profile")
+    commits.add_argument("--count", type=int, default=2000)
+
+    stress = subparsers.add_parser("checkout-stress", help="concurrent checkouts of one item must not lose updates")
+    stress.add_argument("--threads", type=int, default=8)
+    stress.add_argument("--stock", type=int, default=2000)
+
+    bulk = subparsers.add_parser("bulk", help="CSV import and JSONL export throughput")
+    bulk.add_argument("--rows", type=int, default=100000)
+    bulk.add_argument("--chunk-size", type=int, default=5000)
+
+    http_parser = subparsers.add_parser("http", help="requests/second and p99 latency of the HTTP API")
+    http_parser.add_argument("--clients", type=int, default=8)
+    http_parser.add_argument("--seconds", type=float, default=5.0)
+    http_parser.add_argument("--url", help="load-test an already running server instead of a temporary one")
+    http_parser.add_argument("--user", default="till")
+    http_parser.add_argument("--password", default="till")
+
+    async_parser = subparsers.add_parser("async", help="concurrent till throughput, sync DAL threads vs async DAL tasks")
+    async_parser.add_argument("--tills", type=int, default=32)
+    async_parser.add_argument("--ops", type=int, default=200)
+
+    logins = subparsers.add_parser("logins", help="password verification throughput, with and without the login cache")
+    logins.add_argument("--count", type=int, default=200)
+    logins.add_argument("--threads", type=int, default=4)
+
+    startup = subparsers.add_parser("startup", help="import and wall time of the command-line entry points")
+    startup.add_argument("--runs", type=int, default=5)
+
+    analytics = subparsers.add_parser("analytics", help="NumPy analytics snapshot load, rollups and incremental refresh")
+    analytics.add_argument("--sales", type=int, default=200000)
+    analytics.add_argument("--expenses", type=int, default=50000)
+
+    reorder = subparsers.add_parser("reorder", help="low-stock query and ranked reorder list on a large catalogue")
+    reorder.add_argument("--skus", type=int, default=5000)
+    reorder.add_argument("--sales", type=int, default=200000)
+
+    ingest = subparsers.add_parser("ingest", help="checkout throughput, per-sale commits vs. the group-committing SaleWriter")
+    ingest.add_argument("--threads", type=int, default=8)
+    ingest.add_argument("--sales", type=int, default=250, help="sales per thread")
+
+    money = subparsers.add_parser("money", help="aggregates and reports over REAL amounts vs. integer cents")
+    money.add_argument("--sales", type=int, default=200000)
+    money.add_argument("--expenses", type=int, default=50000)
+
+    search = subparsers.add_parser("search", help="filtered listings and FTS5 search vs. filtering the full history")
+    search.add_argument("--expenses", type=int, default=200000)
+    search.add_argument("--sales", type=int, default=200000)
+
+    branch_parser = subparsers.add_parser("branches", help="shared vs. per-branch databases; parallel consolidated report")
+    branch_parser.add_argument("--branches", type=int, default=4)
+    branch_parser.add_argument("--tills", type=int, default=2, help="tills per branch")
+    branch_parser.add_argument("--sales", type=int, default=200, help="sales per till")
+    branch_parser.add_argument("--scale", choices=("small", "medium", "large"), default="small",
+                               help="synthetic history of each branch")
+
+    archive_parser = subparsers.add_parser("archive", help="hot-table queries before/after archiving old history")
+    archive_parser.add_argument("--scale", choices=("small", "medium", "large"), default="medium")
+    archive_parser.add_argument("--keep-days", type=int, default=90, help="history left in the hot tables")
+    archive_parser.add_argument("--chunk-size", type=int, default=5000, help="rows per archive transaction")
+
+    changes_parser = subparsers.add_parser("changes", help="following the change log vs. re-reading every table")
+    changes_parser.add_argument("--scale", choices=("small", "medium", "large"), default="small")
+    changes_parser.add_argument("--ops", type=int, default=5000, help="writes to follow")
+    changes_parser.add_argument("--poll-every", type=int, default=100, help="writes between consumer polls")
+
+    suite = subparsers.add_parser("suite", help="main DAL/BLL operations on synthetic data, compared with a baseline")
+    suite.add_argument("--scales", nargs="+", choices=("small", "medium", "large"), default=["small", "medium"])
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--output", help="write the results as JSON to this file")
+    suite.add_argument("--baseline", default=BASELINE_PATH, help="baseline results file")
+    suite.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    suite.add_argument("--tolerance", type=float, default=0.5, help="allowed p50 slowdown before failing (0.5 = 50%%)")
+
+    args = parser.parse_args()
+    if args.benchmark == "commits":
+        bench_commits(args.count)
+    elif args.benchmark == "checkout-stress":
+        if not stress_checkout(args.threads, args.stock):
+            raise SystemExit(1)
+    elif args.benchmark == "bulk":
+        bench_bulk(args.rows, args.chunk_size)
+    elif args.benchmark == "http":
+        if args.url:
+            load_test(args.url, args.user, args.password, args.clients, args.seconds)
+        else:
+            bench_http(args.clients, args.seconds)
+    elif args.benchmark == "async":
+        bench_async(args.tills, args.ops)
+    elif args.benchmark == "logins":
+        bench_logins(args.count, args.threads)
+    elif args.benchmark == "startup":
+        bench_startup(args.runs)
+    elif args.benchmark == "analytics":
+        if not bench_analytics(args.sales, args.expenses):
+            raise SystemExit(1)
+    elif args.benchmark == "reorder":
+        if not bench_reorder(args.skus, args.sales):
+            raise SystemExit(1)
+    elif args.benchmark == "ingest":
+        if not bench_ingest(args.threads, args.sales):
+            raise SystemExit(1)
+    elif args.benchmark == "money":
+        if not bench_money(args.sales, args.expenses):
+            raise SystemExit(1)
+    elif args.benchmark == "search":
+        if not bench_search(args.expenses, args.sales):
+            raise SystemExit(1)
+    elif args.benchmark == "branches":
+        if not bench_branches(args.branches, args.tills, args.sales, args.scale):
+            raise SystemExit(1)
+    elif args.benchmark == "archive":
+        if not bench_archive(args.scale, args.keep_days, args.chunk_size):
+            raise SystemExit(1)
+    elif args.benchmark == "changes":
+        if not bench_changes(args.scale, args.ops, args.poll_every):
+            raise SystemExit(1)
+    elif args.benchmark == "suite":
+        if not bench_suite(args.scales, args.seed, args.output, args.baseline, args.save_baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
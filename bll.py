@@ -1,26 +1,40 @@
 from dal import DataAccessLayer
-from datetime import datetime
-import hashlib
+from errors import AuthenticationError, DuplicateError, InsufficientStockError, NotFoundError, ValidationError
+from models import CHANGE_LOG_TABLES, from_cents, parse_items_sold, to_cents
+from passwords import hash_password, needs_rehash, run_in_pool, verify_password
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta
 
+# What authenticate_user returns: a detached snapshot, safe to cache and to use after the session closes
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "username", "email", "role"])
+
+# Business Logic Layer
+# Operations return their result and raise errors.CafeError subclasses when a rule is broken.
 class BusinessLogic:
-    def __init__(self):
-        self.dal = DataAccessLayer()
+    def __init__(self, dal=None, sale_writer=None):
+        self.dal = dal or DataAccessLayer()
+        self.cart = {}  # inventory_id -> quantity
+        # Optional ingest.SaleWriter: checkouts are then queued and group-committed by its writer thread
+        self.sale_writer = sale_writer
 
     # User Management
+    # Passwords are passed in plain text and only ever stored hashed (see passwords.py).
     def register_user(self, username, password, email, role):
         if not username or not password or not email:
-            print("Error: All fields are required.")
-            return
+            raise ValidationError("All fields are required.")
         if role not in ['admin', 'user']:
-            print("Error: Role must be 'admin' or 'user'.")
-            return
-        self.dal.add_user(username, password, email, role)
+            raise ValidationError("Role must be 'admin' or 'user'.")
+        return self.dal.add_user(username, run_in_pool(hash_password, password), email, role)
 
     def update_user_info(self, user_id, updates):
         if not updates:
-            print("Error: No updates provided.")
-            return
-        self.dal.update_user(user_id, updates)
+            raise ValidationError("No updates provided.")
+        if "password" in updates:
+            if not updates["password"]:
+                raise ValidationError("Password must not be empty.")
+            updates = {**updates, "password": run_in_pool(hash_password, updates["password"])}
+        return self.dal.update_user(user_id, updates)
 
     def view_all_users(self):
         """Retrieve all registered users with their ID, username, email, and role."""
@@ -30,110 +44,584 @@ class BusinessLogic:
         self.dal.delete_user(user_id)
 
     def authenticate_user(self, username, password):
+        """
+        Verify the credentials and return an AuthenticatedUser. Logins verified within the
+        last minute are answered from the login cache without touching the database or the KDF.
+        A password stored in a legacy or outdated format is rehashed on success.
+        """
+        cached = self.dal.login_cache.get(username, password)
+        if cached:
+            return cached
         user = self.dal.get_user_by_username(username)
         if not user:
-            print("Error: User not found.")
-            return None
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        if user.password == hashed_password:
-            print("Authentication successful.")
-            return user
-        else:
-            print("Error: Incorrect password.")
-            return None
+            raise AuthenticationError("User not found.")
+        if not run_in_pool(verify_password, password, user.password):
+            raise AuthenticationError("Incorrect password.")
+        if needs_rehash(user.password):
+            self.dal.update_user(user.id, {"password": run_in_pool(hash_password, password)})
+        authenticated = AuthenticatedUser(user.id, user.username, user.email, user.role)
+        self.dal.login_cache.put(username, password, authenticated)
+        return authenticated
 
-    # Expense Management
-    def record_expense(self, date, amount, category, description=None):
-        if not date or not amount or not category:
-            print("Error: Date, amount, and category are required.")
-            return
+    def login_cache_stats(self):
+        """Hit/miss counters of the verified-login cache."""
+        return self.dal.login_cache.stats()
+
+    # Validation (shared by the interactive and bulk import paths; raises ValidationError)
+    @staticmethod
+    def _parse_date(date):
         try:
-            parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
-        except ValueError:
-            print("Error: Invalid date format. Use YYYY-MM-DD.")
-            return
+            return datetime.strptime(date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            raise ValidationError("Invalid date format. Use YYYY-MM-DD.") from None
+
+    @staticmethod
+    def _parse_number(value, cast, message):
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ValidationError(message) from None
+
+    @staticmethod
+    def _parse_text(value, message):
+        """Return `value` if it is a string; anything else (e.g. a JSON number or list) raises ValidationError."""
+        if not isinstance(value, str):
+            raise ValidationError(message)
+        return value
+
+    @staticmethod
+    def _parse_money(value, message):
+        """Parse an amount of money into a Decimal rounded to the cent."""
+        try:
+            return from_cents(to_cents(value))
+        except (TypeError, ValueError, ArithmeticError):
+            raise ValidationError(message) from None
+
+    @classmethod
+    def _amount_range(cls, min_amount=None, max_amount=None):
+        """Parse an optional amount range into {"min_amount", "max_amount"} Decimals or Nones."""
+        bounds = [None if value in (None, "") else cls._parse_money(value, "Amounts must be numbers.")
+                  for value in (min_amount, max_amount)]
+        if None not in bounds and bounds[0] > bounds[1]:
+            raise ValidationError("Minimum amount must not be more than the maximum.")
+        return {"min_amount": bounds[0], "max_amount": bounds[1]}
+
+    @classmethod
+    def _listing_options(cls, sorts, sort="id", descending=False, limit=None, offset=0):
+        """Validate the ordering and paging of a filtered listing; `sorts` are the columns it can be sorted by."""
+        if sort not in sorts:
+            raise ValidationError(f"Sort must be one of: {', '.join(sorts)}.")
+        limit = None if limit in (None, "") else cls._parse_number(limit, int, "Limit must be a whole number.")
+        offset = 0 if offset in (None, "") else cls._parse_number(offset, int, "Offset must be a whole number.")
+        if (limit is not None and limit <= 0) or offset < 0:
+            raise ValidationError("Limit must be greater than zero and offset can't be negative.")
+        return {"sort": sort, "descending": bool(descending), "limit": limit, "offset": offset}
+
+    def validate_expense(self, date, amount, category, description=None):
+        """Return the expense as a dict of column values, or raise ValidationError."""
+        if not date or not amount or not category:
+            raise ValidationError("Date, amount, and category are required.")
+        parsed_date = self._parse_date(date)
+        amount = self._parse_money(amount, "Amount must be a number.")
+        if amount <= 0:
+            raise ValidationError("Amount must be greater than zero.")
+        category = self._parse_text(category, "Category must be text.")
+        if description is not None:
+            description = self._parse_text(description, "Description must be text.")
+        return {"date": parsed_date, "amount": amount, "category": category, "description": description}
+
+    def validate_inventory_item(self, item_name, quantity, cost, reorder_threshold=0):
+        """Return the inventory item as a dict of column values, or raise ValidationError."""
+        if not item_name or quantity in (None, "") or cost in (None, ""):
+            raise ValidationError("Item name, quantity, and cost are required.")
+        item_name = self._parse_text(item_name, "Item name must be text.")
+        quantity = self._parse_number(quantity, int, "Quantity must be a whole number.")
+        cost = self._parse_money(cost, "Cost must be a number.")
+        if reorder_threshold in (None, ""):
+            reorder_threshold = 0
+        reorder_threshold = self._parse_number(reorder_threshold, int, "Reorder threshold must be a whole number.")
+        if quantity < 0 or cost < 0 or reorder_threshold < 0:
+            raise ValidationError("Quantity, cost and reorder threshold must be non-negative.")
+        return {"item_name": item_name, "quantity": quantity, "cost": cost, "reorder_threshold": reorder_threshold}
+
+    def validate_sale(self, date, amount, items_sold):
+        """Return the sale as a dict of column values, or raise ValidationError."""
+        if not date or not amount or not items_sold:
+            raise ValidationError("Date, amount, and items sold are required.")
+        parsed_date = self._parse_date(date)
+        amount = self._parse_money(amount, "Amount must be a number.")
         if amount <= 0:
-            print("Error: Amount must be greater than zero.")
-            return
-        self.dal.add_expense(parsed_date, amount, category, description)
+            raise ValidationError("Amount must be greater than zero.")
+        items_sold = self._parse_text(items_sold, "Items sold must be text.")
+        return {"date": parsed_date, "amount": amount, "items_sold": items_sold}
 
-    def view_expense_history(self):
-        expenses = self.dal.get_expense_history()
+    # Expense Management
+    def record_expense(self, date, amount, category, description=None):
+        expense = self.validate_expense(date, amount, category, description)
+        return self.dal.add_expense(**expense)
+
+    @classmethod
+    def _expense_filters(cls, start_date=None, end_date=None, category=None, min_amount=None, max_amount=None,
+                         search=None, sort="id", descending=False, limit=None, offset=0, include_archive=False):
+        """Validate expense listing filters into keyword arguments for DataAccessLayer.get_expense_history."""
+        start, end = cls._parse_date_range(start_date, end_date)
+        return {
+            "start_date": start, "end_date": end, "category": category or None, **cls._amount_range(min_amount, max_amount),
+            "search": (search or "").strip() or None,
+            **cls._listing_options(DataAccessLayer.EXPENSE_SORTS, sort, descending, limit, offset),
+            "include_archive": bool(include_archive),
+        }
+
+    def view_expense_history(self, **filters):
+        """
+        Expenses, optionally filtered by date range (YYYY-MM-DD), category, amount range and
+        text in the description, sorted by "id", "date", "amount" or "category", with limit/offset.
+        With include_archive, archived expenses (see archive.py) are listed as well.
+        """
+        expenses = self.dal.get_expense_history(**self._expense_filters(**filters))
         return [{"date": e.date, "amount": e.amount, "category": e.category, "description": e.description} for e in expenses]
 
     # Inventory Management
-    def add_inventory_item(self, item_name, quantity, cost):
-        if not item_name or quantity is None or cost is None:
-            print("Error: Item name, quantity, and cost are required.")
-            return
-        if quantity < 0 or cost < 0:
-            print("Error: Quantity and cost must be non-negative.")
-            return
-        self.dal.add_inventory_item(item_name, quantity, cost)
+    INVENTORY_FIELDS = ("item_name", "quantity", "cost", "reorder_threshold")  # The fields an update may change
 
-    def update_inventory_item(self, item_id, updates):
+    def add_inventory_item(self, item_name, quantity, cost, reorder_threshold=0):
+        item = self.validate_inventory_item(item_name, quantity, cost, reorder_threshold)
+        return self.dal.add_inventory_item(**item)
+
+    def validate_inventory_updates(self, updates):
+        """Return the updates to an inventory item as a dict of column values, or raise ValidationError."""
         if not updates:
-            print("Error: No updates provided.")
-            return
-        self.dal.update_inventory_item(item_id, updates)
+            raise ValidationError("No updates provided.")
+        unknown = sorted(set(updates) - set(self.INVENTORY_FIELDS))
+        if unknown:
+            raise ValidationError(f"Unknown inventory fields: {', '.join(map(str, unknown))}.")
+        # The rules of validate_inventory_item, with valid stand-ins for the fields left as they are
+        item = self.validate_inventory_item(
+            updates.get("item_name", "-"), updates.get("quantity", 0), updates.get("cost", 0), updates.get("reorder_threshold", 0)
+        )
+        return {key: item[key] for key in updates}
+
+    def update_inventory_item(self, item_id, updates):
+        return self.dal.update_inventory_item(item_id, self.validate_inventory_updates(updates))
 
     def delete_inventory_item(self, item_id):
         self.dal.delete_inventory_item(item_id)
 
-    def view_inventory(self):
-        inventory = self.dal.get_inventory()
-        return [{"id": inv.id, "item_name": inv.item_name, "quantity": inv.quantity, "cost": inv.cost} for inv in inventory]
+    @classmethod
+    def _inventory_filters(cls, name_prefix=None, name_contains=None, sort="id", descending=False, limit=None, offset=0):
+        """Validate inventory listing filters into keyword arguments for DataAccessLayer.search_inventory."""
+        return {
+            "name_prefix": name_prefix or None, "name_contains": name_contains or None,
+            **cls._listing_options(DataAccessLayer.INVENTORY_SORTS, sort, descending, limit, offset),
+        }
+
+    def view_inventory(self, **filters):
+        """
+        The inventory, from the catalogue cache; with filters (item name prefix or substring,
+        sort by "id", "item_name", "quantity" or "cost", limit/offset), from the database.
+        """
+        inventory = self.dal.search_inventory(**self._inventory_filters(**filters)) if filters else self.dal.get_inventory()
+        return [
+            {"id": inv.id, "item_name": inv.item_name, "quantity": inv.quantity, "cost": inv.cost,
+             "reorder_threshold": inv.reorder_threshold}
+            for inv in inventory
+        ]
+
+    def inventory_cache_stats(self):
+        """Hit/miss counters and version of the inventory catalogue cache."""
+        return self.dal.inventory_cache_stats()
+
+    # Reordering
+    def reorder_suggestions(self, window_days=28, lead_days=7, cover_days=14):
+        """
+        Return the items that need reordering, most urgent first. An item is listed when its
+        stock is at or below its reorder threshold, or when it will run out within `lead_days`
+        at the rate it sold over the last `window_days`. Each entry gives units sold per day,
+        the projected days until stockout (None if it hasn't sold) and a suggested order that
+        restocks to the threshold plus `cover_days` of sales.
+        """
+        since, window = self._reorder_window(window_days, lead_days, cover_days)
+        units_sold = self.dal.units_sold_since(since)
+        selling = self.dal.get_inventory_items(units_sold).values()
+        return self._rank_reorders(self.dal.low_stock_items(), selling, units_sold, *window)
 
-    def purchase_item(self, item_id, quantity):
-        """Handle purchasing an inventory item."""
+    @classmethod
+    def _reorder_window(cls, window_days, lead_days, cover_days):
+        """Validate the reorder parameters; return (first day of the sales window, (window, lead, cover) as ints)."""
+        window = tuple(cls._parse_number(days, int, "Days must be a whole number.")
+                       for days in (window_days, lead_days, cover_days))
+        if window[0] < 1 or min(window) < 0:
+            raise ValidationError("The sales window must be at least one day; lead and cover days can't be negative.")
+        return datetime.now().date() - timedelta(days=window[0] - 1), window
+
+    @staticmethod
+    def _rank_reorders(low_stock, selling, units_sold, window_days, lead_days, cover_days):
+        """
+        Merge the low_stock_items rows with the inventory rows of recently sold items and
+        return the reorder entries, ordered by days until stockout (items without sales last).
+        """
+        candidates = {item_id: (item_name, quantity, threshold) for item_id, item_name, quantity, threshold in low_stock}
+        for item in selling:
+            candidates.setdefault(item.id, (item.item_name, item.quantity, item.reorder_threshold))
+        suggestions = []
+        for item_id, (item_name, quantity, threshold) in candidates.items():
+            per_day = units_sold.get(item_id, 0) / window_days
+            days_left = quantity / per_day if per_day else None
+            if quantity > threshold and (days_left is None or days_left > lead_days):
+                continue
+            suggestions.append({
+                "id": item_id,
+                "item_name": item_name,
+                "quantity": quantity,
+                "reorder_threshold": threshold,
+                "units_per_day": per_day,
+                "days_left": days_left,
+                # Always enough to lift the stock above the threshold
+                "suggested_order": max(threshold + 1 - quantity, math.ceil(threshold + per_day * cover_days - quantity)),
+            })
+        suggestions.sort(key=lambda entry: (
+            entry["days_left"] is None, entry["days_left"] or 0, entry["quantity"] - entry["reorder_threshold"]
+        ))
+        return suggestions
+
+    def purchase_item(self, item_id, quantity, confirm_payment):
+        """
+        Sell `quantity` units of one item. `confirm_payment` is a flag or a callable that is
+        given the total amount and returns whether payment was taken; it is consulted before
+        any write, then the stock decrement and the sale are committed together.
+        Returns the Sale, or None if payment was not confirmed.
+        """
+        if quantity <= 0:
+            raise ValidationError("Quantity must be greater than zero.")
         item = self.dal.get_inventory_item(item_id)
         if not item:
-            print("Error: Item not found.")
-            return
-
-        if quantity > item.quantity:
-            print("Error: Not enough stock available.")
-            return
-
-        total_amount = item.cost * quantity
-        print(f"Total amount to pay: {total_amount:.2f}")
-        payment_done = input("Is payment done? (yes/no): ").strip().lower()
-
-        if payment_done == "yes":
-            new_quantity = item.quantity - quantity
-            self.dal.update_inventory_quantity(item_id, new_quantity)
-            today = datetime.now().strftime("%Y-%m-%d")
-            items_sold = f"{item.item_name} x {quantity}"
-            self.record_sale(today, total_amount, items_sold)
-            print("Purchase complete.")
+            raise NotFoundError("Item not found.")
+
+        self._check_stock({item_id: quantity}, {item_id: item})
+
+        item_name, unit_price = item.item_name, item.cost
+        if not self._payment_confirmed(confirm_payment, unit_price * quantity):
+            return None
+        # Stock may have changed while waiting for payment; the checkout re-checks it atomically
+        return self._checkout([(item_id, quantity, unit_price)], f"{item_name} x {quantity}")
+
+    @staticmethod
+    def _payment_confirmed(confirm_payment, total_amount):
+        return confirm_payment(total_amount) if callable(confirm_payment) else bool(confirm_payment)
+
+    def _checkout(self, lines, items_sold):
+        """Commit a priced sale dated today, directly or through the sale writer."""
+        if self.sale_writer is not None:
+            return self.sale_writer.submit(lines, datetime.now().date(), items_sold).result()
+        return self.dal.checkout(lines, datetime.now().date(), items_sold)
+
+    # Cart
+    def add_to_cart(self, item_id, quantity):
+        """Add units of an item to the cart and return the item."""
+        if quantity <= 0:
+            raise ValidationError("Quantity must be greater than zero.")
+        item = self.dal.get_inventory_item(item_id)
+        if not item:
+            raise NotFoundError("Item not found.")
+        self._check_stock({item_id: self.cart.get(item_id, 0) + quantity}, {item_id: item})
+        self.cart[item_id] = self.cart.get(item_id, 0) + quantity
+        return item
+
+    def remove_from_cart(self, item_id, quantity=None):
+        """Remove `quantity` units of an item from the cart, or the whole line if quantity is None."""
+        if item_id not in self.cart:
+            raise NotFoundError("Item is not in the cart.")
+        if quantity is None or quantity >= self.cart[item_id]:
+            del self.cart[item_id]
         else:
-            print("Purchase not done.")
+            self.cart[item_id] -= quantity
+
+    def view_cart(self):
+        """Return the cart lines priced from the current inventory, fetched with one query."""
+        items = self.dal.get_inventory_items(list(self.cart))
+        return [
+            {
+                "id": item_id,
+                "item_name": items[item_id].item_name,
+                "quantity": quantity,
+                "cost": items[item_id].cost,
+                "total": items[item_id].cost * quantity,
+            }
+            for item_id, quantity in self.cart.items()
+            if item_id in items
+        ]
+
+    def price_lines(self, quantities):
+        """
+        Check {inventory_id: quantity} against the catalogue with one lookup and price it.
+        Returns ([(inventory_id, quantity, unit_price)], items_sold, total_amount).
+        """
+        self._check_quantities(quantities)
+        items = self.dal.get_inventory_items(list(quantities))
+        priced = self._price(quantities, items)
+        self._check_stock(quantities, items)
+        return priced
+
+    def _check_stock(self, quantities, items):
+        """
+        Raise InsufficientStockError if the database lacks stock for {inventory_id: quantity}.
+        The cached rows in `items` may be behind other tills and processes, so a shortage they
+        show is re-read from the database before it is reported (checkout re-checks it anyway).
+        """
+        suspect = self._short_of(quantities, {item_id: items[item_id].quantity for item_id in quantities})
+        if suspect:
+            stock = self.dal.get_stock_levels(suspect)
+            short = self._short_of({item_id: quantities[item_id] for item_id in suspect}, stock)
+            if short:
+                names = ", ".join(items[item_id].item_name for item_id in short)
+                raise InsufficientStockError(f"Not enough stock available for {names}.")
+
+    @staticmethod
+    def _short_of(quantities, stock):
+        """The ids in {inventory_id: quantity} that {inventory_id: quantity on hand} can't cover."""
+        return [item_id for item_id, quantity in quantities.items() if quantity > stock.get(item_id, 0)]
+
+    @staticmethod
+    def _check_quantities(quantities):
+        if not quantities:
+            raise ValidationError("Cart is empty.")
+        if any(quantity <= 0 for quantity in quantities.values()):
+            raise ValidationError("Quantity must be greater than zero.")
+
+    @staticmethod
+    def _price(quantities, items):
+        """Price {inventory_id: quantity} against {inventory_id: InventoryRow}; see price_lines. Stock isn't checked here."""
+        missing = [item_id for item_id in quantities if item_id not in items]
+        if missing:
+            raise NotFoundError(f"Item(s) not found: {', '.join(map(str, missing))}.")
+
+        lines = [(item_id, quantity, items[item_id].cost) for item_id, quantity in quantities.items()]
+        items_sold = ", ".join(f"{items[item_id].item_name} x {quantity}" for item_id, quantity, _ in lines)
+        total_amount = sum(quantity * unit_price for _, quantity, unit_price in lines)
+        return lines, items_sold, total_amount
+
+    def checkout_lines(self, quantities):
+        """
+        Sell {inventory_id: quantity} as one sale without prompting, for callers that
+        have already taken payment (e.g. the HTTP service). Returns the Sale.
+        """
+        lines, items_sold, _ = self.price_lines(quantities)
+        return self._checkout(lines, items_sold)
+
+    def checkout_cart(self, confirm_payment):
+        """
+        Buy everything in the cart as one sale. All items are fetched and validated with a
+        single lookup, payment is confirmed (see purchase_item) before any write, and every
+        stock decrement plus the sale are committed together.
+        Returns the Sale, or None if payment was not confirmed.
+        """
+        lines, items_sold, total_amount = self.price_lines(self.cart)
+        if not self._payment_confirmed(confirm_payment, total_amount):
+            return None
+        sale = self._checkout(lines, items_sold)
+        self.cart.clear()
+        return sale
 
     # Sales Management
-    def record_sale(self, date, amount, items_sold):
-        if not date or not amount or not items_sold:
-            print("Error: Date, amount, and items sold are required.")
-            return
-        try:
-            parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
-        except ValueError:
-            print("Error: Invalid date format. Use YYYY-MM-DD.")
-            return
-        if amount <= 0:
-            print("Error: Amount must be greater than zero.")
-            return
-        self.dal.add_sale(parsed_date, amount, items_sold)
+    def record_sale(self, date, amount, items_sold, lines=None):
+        """
+        Record a sale. `lines` is a list of (inventory_id, quantity, unit_price); when it is
+        omitted the line items are derived from the "Item x Qty" entries in items_sold.
+        """
+        sale = self.validate_sale(date, amount, items_sold)
+        if lines is None:
+            lines = self._lines_from_items_sold(items_sold)
+        return self.dal.add_sale(sale["date"], sale["amount"], items_sold, lines)
+
+    def _lines_from_items_sold(self, items_sold):
+        """Resolve the "Item x Qty" entries of a manually entered sale against the inventory."""
+        parsed = parse_items_sold(items_sold)
+        items = self.dal.get_inventory_by_names([name for name, _ in parsed])
+        return [(items[name].id, quantity, items[name].cost) for name, quantity in parsed if name in items]
 
-    def view_sales_history(self):
-        sales = self.dal.get_sales_history()
+    @classmethod
+    def _sales_filters(cls, start_date=None, end_date=None, min_amount=None, max_amount=None, search=None, sort="id",
+                       descending=False, limit=None, offset=0, include_archive=False):
+        """Validate sales listing filters into keyword arguments for DataAccessLayer.get_sales_history."""
+        start, end = cls._parse_date_range(start_date, end_date)
+        return {
+            "start_date": start, "end_date": end, **cls._amount_range(min_amount, max_amount),
+            "search": (search or "").strip() or None,
+            **cls._listing_options(DataAccessLayer.SALE_SORTS, sort, descending, limit, offset),
+            "include_archive": bool(include_archive),
+        }
+
+    def view_sales_history(self, **filters):
+        """
+        Sales, optionally filtered by date range (YYYY-MM-DD), amount range and text in
+        items_sold, sorted by "id", "date" or "amount", with limit/offset. With include_archive,
+        archived sales (see archive.py) are listed as well.
+        """
+        sales = self.dal.get_sales_history(**self._sales_filters(**filters))
         return [{"date": s.date, "amount": s.amount, "items_sold": s.items_sold} for s in sales]
 
+    # Bulk Import/Export
+    BULK_TABLES = ("inventory", "expenses", "sales")
+
+    def bulk_import(self, table, rows, chunk_size=5000, reject=None):
+        """
+        Validate and insert an iterable of row dicts into `table` ("inventory", "expenses" or "sales"),
+        committing once per chunk. Rows are consumed lazily, so input of any size is streamed.
+        Invalid rows, including any that aren't dicts (see bulk.read_rows), are passed to
+        reject(row_number, row, error) and skipped.
+        Returns (imported, rejected) counts.
+        """
+        validate = {
+            "inventory": lambda row: self.validate_inventory_item(
+                row.get("item_name"), row.get("quantity"), row.get("cost"), row.get("reorder_threshold")
+            ),
+            "expenses": lambda row: self.validate_expense(
+                row.get("date"), row.get("amount"), row.get("category"), row.get("description") or None
+            ),
+            "sales": lambda row: self.validate_sale(row.get("date"), row.get("amount"), row.get("items_sold")),
+        }[table]
+
+        def validate_row(row):
+            if not isinstance(row, dict):
+                raise ValidationError("Row must be an object of column values.")
+            return validate(row)
+
+        reject = reject or (lambda row_number, row, error: None)
+        imported = rejected = 0
+        chunk = []
+
+        def flush():
+            nonlocal imported, rejected
+            failures = self._insert_chunk(table, chunk)
+            for row_number, row, error in failures:
+                reject(row_number, row, error)
+            imported += len(chunk) - len(failures)
+            rejected += len(failures)
+            chunk.clear()
+
+        for row_number, row in enumerate(rows, start=1):
+            try:
+                chunk.append((row_number, row, validate_row(row)))
+            except ValidationError as e:
+                reject(row_number, row, str(e))
+                rejected += 1
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+        return imported, rejected
+
+    def _insert_chunk(self, table, chunk):
+        """
+        Insert validated (row_number, row, values) entries in one transaction. If the chunk
+        violates a constraint (e.g. a duplicate item name), fall back to inserting row by row
+        so only the offending rows are rejected. Returns the (row_number, row, error) failures.
+        """
+        values = [entry[2] for entry in chunk]
+        if table == "sales":
+            # Resolve the item names of the whole chunk with one query
+            parsed = [parse_items_sold(sale["items_sold"]) for sale in values]
+            items = self.dal.get_inventory_by_names([name for entries in parsed for name, _ in entries])
+            for sale, entries in zip(values, parsed):
+                sale["lines"] = [(items[name].id, quantity, items[name].cost) for name, quantity in entries if name in items]
+        try:
+            self.dal.bulk_add(table, values)
+            return []
+        except DuplicateError:
+            pass
+        failures = []
+        for row_number, row, value in chunk:
+            try:
+                self.dal.bulk_add(table, [value])
+            except DuplicateError as e:
+                failures.append((row_number, row, str(e)))
+        return failures
+
+    def bulk_export(self, table, start_date=None, end_date=None):
+        """Stream the raw rows of `table` as dicts, optionally limited to a date range (YYYY-MM-DD)."""
+        return self.dal.iter_table_rows(table, *self._parse_date_range(start_date, end_date))
+
+    # Change Feed (see changes.py)
+    MAX_CHANGES_PAGE = 10000
+
+    @classmethod
+    def _change_feed_options(cls, seq=0, limit=DataAccessLayer.CHANGES_PAGE_SIZE, entity=None):
+        """Validate a change feed cursor, page size and table (strings are accepted, e.g. from a query string)."""
+        seq = 0 if seq in (None, "") else cls._parse_number(seq, int, "Seq must be a whole number.")
+        limit = (DataAccessLayer.CHANGES_PAGE_SIZE if limit in (None, "")
+                 else cls._parse_number(limit, int, "Limit must be a whole number."))
+        if seq < 0 or not 0 < limit <= cls.MAX_CHANGES_PAGE:
+            raise ValidationError(f"Seq can't be negative and limit must be between 1 and {cls.MAX_CHANGES_PAGE}.")
+        if entity in (None, ""):
+            entity = None
+        elif entity not in CHANGE_LOG_TABLES:
+            raise ValidationError(f"Entity must be one of: {', '.join(CHANGE_LOG_TABLES)}.")
+        return {"seq": seq, "limit": limit, "entity": entity}
+
+    def changes_since(self, seq=0, limit=DataAccessLayer.CHANGES_PAGE_SIZE, entity=None):
+        """The change log entries after `seq`; see DataAccessLayer.changes_since."""
+        return self.dal.changes_since(**self._change_feed_options(seq, limit, entity))
+
     # Reporting
-    def generate_reports(self):
-        """Generate and return structured reports."""
+    @staticmethod
+    def _parse_date_range(start_date, end_date):
+        """Parse an optional YYYY-MM-DD date range into a (start, end) pair of dates or Nones."""
+        parsed_start = BusinessLogic._parse_date(start_date) if start_date else None
+        parsed_end = BusinessLogic._parse_date(end_date) if end_date else None
+        if parsed_start and parsed_end and parsed_start > parsed_end:
+            raise ValidationError("Start date must not be after end date.")
+        return parsed_start, parsed_end
+
+    def generate_reports(self, start_date=None, end_date=None, page_size=DataAccessLayer.REPORT_PAGE_SIZE,
+                         include_archive=False):
+        """
+        Return the reports as lazy row streams, optionally limited to a date range (YYYY-MM-DD)
+        and including archived sales and expenses. Rows are fetched from the database page by
+        page while the caller iterates.
+        """
+        parsed_start, parsed_end = self._parse_date_range(start_date, end_date)
+        if page_size <= 0:
+            raise ValidationError("Page size must be greater than zero.")
         return {
-            "Expenses": self.dal.generate_expense_report(),
-            "Inventory": self.dal.generate_inventory_report(),
-            "Sales": self.dal.generate_sales_report(),
+            "Expenses": self.dal.generate_expense_report(parsed_start, parsed_end, page_size, bool(include_archive)),
+            "Inventory": self.dal.generate_inventory_report(page_size),
+            "Sales": self.dal.generate_sales_report(parsed_start, parsed_end, page_size, bool(include_archive)),
         }
 
+    def generate_summary(self, period="month", start_date=None, end_date=None):
+        """
+        Return aggregated summaries computed in SQL as compact tuples:
+        sales per period, expenses per category and per period, and net profit per period.
+        """
+        if period not in DataAccessLayer.PERIOD_FORMATS:
+            raise ValidationError("Period must be 'day', 'week' or 'month'.")
+        date_range = self._parse_date_range(start_date, end_date)
+        return {
+            "Sales": self.dal.summarize_sales(period, *date_range),
+            "Expenses by Category": self.dal.summarize_expenses("category", *date_range),
+            "Expenses": self.dal.summarize_expenses(period, *date_range),
+            "Net Profit": self.dal.summarize_profit(period, *date_range),
+        }
+
+    def best_sellers(self, start_date=None, end_date=None, limit=10, include_archive=False):
+        """
+        Return (item_name, units_sold, revenue, units_per_day) tuples for the top sellers.
+        Velocity is units sold per day over the requested range (or the span of recorded sales).
+        """
+        date_range = self._parse_date_range(start_date, end_date)
+        if limit <= 0:
+            raise ValidationError("Limit must be greater than zero.")
+        include_archive = bool(include_archive)
+        bounds = date_range
+        if None in date_range:
+            bounds = self.dal.get_sales_date_bounds(*date_range, include_archive=include_archive)
+        rows = self.dal.best_sellers(*date_range, limit=limit, include_archive=include_archive)
+        return self._with_velocity(rows, date_range, bounds)
+
+    @staticmethod
+    def _with_velocity(rows, date_range, sales_bounds):
+        """Turn best_sellers rows into (item_name, units_sold, revenue, units_per_day), filling open range ends from the sales bounds."""
+        first, last = date_range[0] or sales_bounds[0], date_range[1] or sales_bounds[1]
+        days = (last - first).days + 1 if first and last else 1
+        return [(item_name, units, revenue, units / days) for _, item_name, units, revenue in rows]
@@ -0,0 +1,208 @@
+"""
+One SQLite database per café branch, with consolidated reports for head office.
+
+    python branches.py [--dir DIR] list
+    python branches.py [--dir DIR] create NAME
+    python branches.py [--dir DIR] report [--period month] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+
+    branches = Branches()                    # $CAFE_BRANCH_DIR or ./branches
+    dal = branches.dal("harbour-street")     # DataAccessLayer on branches/harbour-street.db
+                                             # (or DataAccessLayer(branch="harbour-street"))
+    summary = branches.consolidated_summary("month")
+
+Every branch has its own file, so tills at different branches never wait on each other's
+write lock; the tills of one branch use `python presentation_layer.py --branch NAME` or
+`python server.py --branch NAME`. A consolidated report runs the same daily_totals summary
+queries as BusinessLogic.generate_summary on every branch at once (one thread each; SQLite
+releases the GIL while it executes) and adds up the partial sums. Averages are recomputed
+from the merged totals and counts, never averaged across branches.
+"""
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from errors import NotFoundError, ValidationError
+from models import BRANCH_NAME_PATTERN, DEFAULT_ENGINE_PROFILE, branch_db_url, from_cents, get_branch_dir, to_cents
+
+
+class Branches:
+    def __init__(self, root=None, profile=DEFAULT_ENGINE_PROFILE):
+        self.root = root or get_branch_dir()
+        self.profile = profile
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        """The branches that have a database, sorted by name."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-3] for name in os.listdir(self.root) if name.endswith(".db") and BRANCH_NAME_PATTERN.match(name[:-3]))
+
+    def create(self, branch):
+        """Create (and migrate) the database of a new branch and return its engine."""
+        if branch in self.names():
+            raise ValidationError(f"Branch '{branch}' already exists.")
+        return self._engine(branch_db_url(branch, self.root, create=True))
+
+    def engine(self, branch):
+        """The engine of an existing branch, shared by every caller. Raises NotFoundError for an unknown branch."""
+        return self._engine(branch_db_url(branch, self.root))
+
+    def _engine(self, url):
+        from models import init_db
+
+        with self._lock:
+            if url not in self._engines:
+                self._engines[url] = init_db(url, profile=self.profile)
+            return self._engines[url]
+
+    def dal(self, branch):
+        """A new DataAccessLayer on `branch`; close it when done."""
+        from dal import DataAccessLayer
+
+        return DataAccessLayer(self.engine(branch))
+
+    def dispose(self):
+        """Close every branch engine's pooled connections."""
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+    # Consolidated reporting
+    def fan_out(self, operation, branches=None, max_workers=None):
+        """
+        Run operation(BusinessLogic) on every branch (default: all of them) in parallel, each
+        with its own session, on up to `max_workers` threads (default: one per CPU, since the
+        queries are CPU-bound once the pages are cached). Returns {branch: result}; the first
+        error is raised.
+        """
+        from bll import BusinessLogic
+
+        branches = self.names() if branches is None else list(branches)
+        engines = {branch: self.engine(branch) for branch in branches}  # Unknown branches fail before any work
+
+        def run(branch):
+            from dal import DataAccessLayer
+
+            bll = BusinessLogic(DataAccessLayer(engines[branch]))
+            try:
+                return operation(bll)
+            finally:
+                bll.dal.close()
+
+        if not branches:
+            return {}
+        with ThreadPoolExecutor(max_workers=max_workers or min(len(branches), os.cpu_count() or 1), thread_name_prefix="branch") as pool:
+            return dict(zip(branches, pool.map(run, branches)))
+
+    def consolidated_summary(self, period="month", start_date=None, end_date=None, branches=None, max_workers=None):
+        """
+        BusinessLogic.generate_summary over every branch, merged: the same sections, plus
+        "Best Sellers" (item_name, units_sold, revenue), merged by item name since item ids
+        differ between branches, and "By Branch" (branch, revenue, expenses, net_profit).
+        """
+        def summarize(bll):
+            summary = bll.generate_summary(period, start_date, end_date)
+            dates = bll._parse_date_range(start_date, end_date)
+            summary["Best Sellers"] = bll.dal.best_sellers(*dates, limit=None)
+            return summary
+
+        partials = self.fan_out(summarize, branches, max_workers)
+        merged = {
+            section: _merge_counted(summary[section] for summary in partials.values())
+            for section in ("Sales", "Expenses by Category", "Expenses")
+        }
+        merged["Net Profit"] = _merge_sums(summary["Net Profit"] for summary in partials.values())
+        merged["Best Sellers"] = sorted(
+            _merge_sums([(name, units, revenue) for _, name, units, revenue in summary["Best Sellers"]]
+                        for summary in partials.values()),
+            key=lambda row: (-row[1], row[0]),
+        )
+        merged["By Branch"] = [
+            (branch, *_column_totals(row[1:] for row in summary["Net Profit"]))
+            for branch, summary in partials.items()
+        ]
+        return merged
+
+
+def _merge_counted(partials):
+    """Merge (key, count, total, average) rows by key: counts and totals add up, averages are recomputed."""
+    merged = {}
+    for rows in partials:
+        for key, count, total, _ in rows:
+            entry = merged.setdefault(key, [0, Decimal(0)])
+            entry[0] += count
+            entry[1] += total
+    return [
+        (key, count, total, from_cents(to_cents(total / count)) if count else None)
+        for key, (count, total) in sorted(merged.items())
+    ]
+
+
+def _column_totals(rows, width=3):
+    """The sum of each of the `width` value columns of `rows`."""
+    totals = [from_cents(0)] * width
+    for row in rows:
+        totals = [total + value for total, value in zip(totals, row)]
+    return totals
+
+
+def _merge_sums(partials):
+    """Merge (key, value, ...) rows by key, adding up every value column."""
+    merged = {}
+    for rows in partials:
+        for key, *values in rows:
+            if key in merged:
+                merged[key] = [total + value for total, value in zip(merged[key], values)]
+            else:
+                merged[key] = list(values)
+    return [(key, *values) for key, values in sorted(merged.items())]
+
+
+if __name__ == "__main__":
+    from tables import Column, render_table
+
+    parser = argparse.ArgumentParser(description="Manage café branches and print consolidated reports")
+    parser.add_argument("--dir", help="branch database directory (default: $CAFE_BRANCH_DIR or ./branches)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="list the branches")
+    create = subparsers.add_parser("create", help="create a branch database")
+    create.add_argument("name")
+    report = subparsers.add_parser("report", help="summary report over every branch")
+    report.add_argument("--period", choices=("day", "week", "month"), default="month")
+    report.add_argument("--start", help="YYYY-MM-DD")
+    report.add_argument("--end", help="YYYY-MM-DD")
+    report.add_argument("--top", type=int, default=10, help="best sellers to show")
+    args = parser.parse_args()
+
+    branches = Branches(args.dir)
+    try:
+        if args.command == "list":
+            for name in branches.names():
+                print(name)
+        elif args.command == "create":
+            branches.create(args.name)
+            print(f"Created branch '{args.name}' in {branches.root}.")
+        else:
+            summary = branches.consolidated_summary(args.period, args.start, args.end)
+            summary["Best Sellers"] = summary["Best Sellers"][:args.top]
+            period = args.period.capitalize()
+            headers = {
+                "Sales": (period, "Sales", "Revenue", "Average Sale"),
+                "Expenses by Category": ("Category", "Expenses", "Total", "Average Expense"),
+                "Expenses": (period, "Expenses", "Total", "Average Expense"),
+                "Net Profit": (period, "Revenue", "Expenses", "Net Profit"),
+                "Best Sellers": ("Item Name", "Units Sold", "Revenue"),
+                "By Branch": ("Branch", "Revenue", "Expenses", "Net Profit"),
+            }
+            print(f"Consolidated report over {len(summary['By Branch'])} branch(es)")
+            for section, rows in summary.items():
+                print(f"\n--- {section} ---")
+                render_table(rows, [Column(i, header) for i, header in enumerate(headers[section])])
+    except (NotFoundError, ValidationError) as e:
+        raise SystemExit(f"Error: {e}")
+    finally:
+        branches.dispose()
@@ -0,0 +1,131 @@
+"""
+Bulk import and export of inventory, expenses and sales as CSV or JSON Lines.
+
+    python bulk.py [--db URL] import expenses expenses.csv [--rejects rejects.jsonl] [--chunk-size 5000]
+    python bulk.py export sales sales.jsonl [--start 2024-01-01] [--end 2024-12-31]
+
+Files are streamed row by row in both directions, so memory use does not grow with the
+file size. Imported rows go through the same validation as the interactive menus and are
+inserted one chunk per transaction; rows that fail are written to the rejects file
+(JSON Lines with the row number, the row and the error) instead of stopping the import.
+
+Columns: inventory (item_name, quantity, cost, optional reorder_threshold), expenses (date, amount, category,
+description), sales (date, amount, items_sold). Dates are YYYY-MM-DD. The format is
+taken from the file extension (.csv or .jsonl) unless --format is given. The database
+is --db, $CAFE_DB_URL or sqlite:///cafe_management.db.
+"""
+import argparse
+import csv
+import json
+import sys
+from datetime import date
+
+from errors import CafeError
+
+# BusinessLogic.BULK_TABLES, repeated so that parsing the command line doesn't import SQLAlchemy
+TABLES = ("inventory", "expenses", "sales")
+
+
+def detect_format(path, file_format=None):
+    if file_format:
+        return file_format
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def read_rows(stream, file_format):
+    """
+    Yield one dict per CSV record or JSON line. A line that isn't a JSON object is yielded
+    as its text instead, so bulk_import rejects it and keeps going.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield row if isinstance(row, dict) else line.rstrip("\r\n")
+
+
+def write_rows(stream, rows, file_format):
+    """Write dict rows as CSV (header taken from the first row) or JSON Lines. Returns the row count."""
+    count = 0
+    writer = None
+    for row in rows:
+        row = {key: value.isoformat() if isinstance(value, date) else value for key, value in row.items()}
+        if file_format == "csv":
+            if writer is None:
+                writer = csv.DictWriter(stream, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)  # Decimal amounts are written as-is, e.g. 12.50
+        else:
+            stream.write(json.dumps(row, default=float) + "\n")  # Decimal amounts become JSON numbers
+        count += 1
+    return count
+
+
+def import_file(bll, table, path, file_format=None, rejects_path=None, chunk_size=5000):
+    """Import a CSV/JSONL file into `table`. Returns (imported, rejected) counts."""
+    file_format = detect_format(path, file_format)
+    rejects = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+
+    def reject(row_number, row, error):
+        if rejects:
+            rejects.write(json.dumps({"row": row_number, "data": row, "error": error}) + "\n")
+
+    try:
+        with open(path, newline="", encoding="utf-8") as stream:
+            return bll.bulk_import(table, read_rows(stream, file_format), chunk_size, reject)
+    finally:
+        if rejects:
+            rejects.close()
+
+
+def export_file(bll, table, path, file_format=None, start_date=None, end_date=None):
+    """Export `table` to a CSV/JSONL file. Returns the number of rows written."""
+    rows = bll.bulk_export(table, start_date, end_date)
+    with open(path, "w", newline="", encoding="utf-8") as stream:
+        return write_rows(stream, rows, detect_format(path, file_format))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export for the café database")
+    parser.add_argument("--db", help="SQLAlchemy database URL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="import rows from a CSV/JSONL file")
+    import_parser.add_argument("table", choices=TABLES)
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"))
+    import_parser.add_argument("--rejects", help="write rejected rows to this JSONL file")
+    import_parser.add_argument("--chunk-size", type=int, default=5000)
+
+    export_parser = subparsers.add_parser("export", help="export rows to a CSV/JSONL file")
+    export_parser.add_argument("table", choices=TABLES)
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"))
+    export_parser.add_argument("--start", help="first date to export (YYYY-MM-DD)")
+    export_parser.add_argument("--end", help="last date to export (YYYY-MM-DD)")
+
+    args = parser.parse_args(argv)
+    from bll import BusinessLogic
+    from dal import DataAccessLayer
+
+    bll = BusinessLogic(DataAccessLayer(db_url=args.db))
+    if args.command == "import":
+        imported, rejected = import_file(bll, args.table, args.path, args.format, args.rejects, args.chunk_size)
+        print(f"Imported {imported} row(s) into {args.table}, rejected {rejected}.")
+        return 1 if rejected else 0
+    try:
+        count = export_file(bll, args.table, args.path, args.format, args.start, args.end)
+    except CafeError as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Exported {count} row(s) from {args.table}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
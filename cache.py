@@ -0,0 +1,157 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+class InventoryCache:
+    """
+    Read-through, in-process cache of the inventory catalogue, indexed by id and by name.
+
+    The whole catalogue is loaded on the first miss (it is small and read far more often
+    than it changes). Writers either patch single rows (stock movements) or invalidate the
+    cache (structural changes); every change bumps `version`, and a load that raced with a
+    write is discarded rather than cached. `ttl` bounds how long changes made by other
+    processes can go unseen. Stock levels read from here are advisory only: checkout
+    re-checks them in the database.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_name = {}
+        self._loaded_at = 0.0
+
+    def _fresh(self):
+        return self._by_id is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def lookup(self):
+        """
+        Return ((by_id, by_name), None) on a hit, or (None, version) on a miss; the caller then
+        loads the rows itself and hands them to store() with that version.
+        """
+        with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return (self._by_id, self._by_name), None
+            self.misses += 1
+            return None, self.version
+
+    def store(self, version, rows):
+        """Index freshly loaded rows and return the (by_id, by_name) maps; they are only cached if no write happened since lookup()."""
+        by_id = {row.id: row for row in rows}
+        by_name = {row.item_name: row for row in rows}
+        with self._lock:
+            if version == self.version:
+                self._by_id, self._by_name = by_id, by_name
+                self._loaded_at = time.monotonic()
+        return by_id, by_name
+
+    def _snapshot(self, loader):
+        """Return the (by_id, by_name) maps, loading them with loader() on a miss."""
+        maps, version = self.lookup()
+        if maps is not None:
+            return maps
+        # Load without holding the lock
+        return self.store(version, loader())
+
+    def get_all(self, loader):
+        """All cached rows in id order."""
+        by_id, _ = self._snapshot(loader)
+        return [by_id[item_id] for item_id in sorted(by_id)]
+
+    def get(self, item_id, loader):
+        return self._snapshot(loader)[0].get(item_id)
+
+    def get_by_name(self, item_name, loader):
+        return self._snapshot(loader)[1].get(item_name)
+
+    def adjust_quantity(self, item_id, delta):
+        """Apply a stock movement to a cached row without reloading the catalogue."""
+        with self._lock:
+            self.version += 1
+            if self._by_id is None or item_id not in self._by_id:
+                return
+            row = self._by_id[item_id]._replace(quantity=self._by_id[item_id].quantity + delta)
+            self._by_id[item_id] = row
+            self._by_name[row.item_name] = row
+
+    def invalidate(self):
+        """Drop the cached catalogue; the next read reloads it."""
+        with self._lock:
+            self.version += 1
+            self._by_id = None
+            self._by_name = {}
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "version": self.version,
+                "size": len(self._by_id) if self._by_id is not None else 0,
+            }
+
+
+class CredentialCache:
+    """
+    Short-lived cache of successful logins, so repeated API calls with the same credentials
+    skip both the users query and the password KDF.
+
+    Entries map a username to an HMAC of the password (under a key that never leaves the
+    process, so no plaintext or reusable hash is held) and the authenticated user snapshot.
+    They expire after `ttl` seconds; any change to the users table should call invalidate().
+    """
+
+    def __init__(self, ttl=60.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._key = os.urandom(32)
+        self._lock = threading.Lock()
+        self._entries = {}  # username -> (password_mac, user, expires_at)
+
+    def _mac(self, password):
+        return hmac.new(self._key, password.encode(), hashlib.sha256).digest()
+
+    def get(self, username, password):
+        """The cached user if these exact credentials were verified within the TTL, else None."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry and entry[2] > time.monotonic() and hmac.compare_digest(entry[0], self._mac(password)):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, username, password, user):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.monotonic()
+                self._entries = {name: entry for name, entry in self._entries.items() if entry[2] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[username] = (self._mac(password), user, time.monotonic() + self.ttl)
+
+    def invalidate(self):
+        """Forget every cached login (a user was changed or deleted)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
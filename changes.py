@@ -0,0 +1,215 @@
+"""
+The change log: one entry for every row of sales, expenses, inventory and users that the DAL
+inserts, updates or deletes, written in the same transaction, so that dashboards, accounting
+exports and caches can follow the deltas instead of re-reading whole tables.
+
+    python changes.py [--db URL] tail [--since SEQ] [--entity inventory] [--follow] [--interval 1]
+    python changes.py [--db URL] trim [--retain-days 30 | --no-prune] [--compact-after-days 1 | --no-compact]
+    python changes.py [--db URL] status
+
+    entries = dal.changes_since(seq)     # [ChangeEntry(seq, changed_at, entity, entity_id, operation, data)]
+    for entry in follow(dal, seq): ...   # The same, then new entries as they are committed
+
+An entry's data is the whole row after the change (a sale with its lines, a user without the
+password), or None for a delete, so applying the entries in seq order as upserts and deletes
+keeps a copy of the tables current. A consumer stores the seq of the last entry it applied
+and asks for the entries after it (GET /changes?since=SEQ over HTTP). A new consumer takes
+dal.change_log_head() first, then reads the full state and follows from that seq; entries it
+applies twice are harmless. Archiving (see archive.py) moves rows without logging them.
+
+`trim` keeps the log small, one chunk of `chunk_size` entries per transaction. Compaction
+drops entries older than `compact_after_days` days that a later entry of the same row
+supersedes, so a consumer that falls behind still gets every row's latest state, just not
+every step in between; most entries are stock levels updated by checkouts. Retention drops
+every entry older than `retain_days` days; reading from a cursor before them raises
+CursorExpiredError (HTTP 410), and the consumer starts over from the full state.
+"""
+import argparse
+import json
+import time
+from datetime import date
+from decimal import Decimal
+
+from errors import CursorExpiredError, ValidationError
+
+RETAIN_DAYS = 30
+COMPACT_AFTER_DAYS = 1
+TRIM_CHUNK_SIZE = 5000
+FOLLOW_INTERVAL = 1.0  # Seconds between polls once a follower has caught up
+
+
+def follow(dal, seq=0, entity=None, interval=FOLLOW_INTERVAL, limit=None):
+    """
+    Yield the change log entries after `seq` (see DataAccessLayer.changes_since), then keep
+    yielding new ones as they are committed, checking every `interval` seconds. Never returns.
+    """
+    limit = limit or dal.CHANGES_PAGE_SIZE
+    while True:
+        entries = dal.changes_since(seq, limit, entity)
+        yield from entries
+        if entries:
+            seq = entries[-1].seq
+        if len(entries) < limit:
+            dal.session.rollback()  # Hand the connection back to the pool while waiting
+            time.sleep(interval)
+
+
+def trim_changes(engine, retain_days=RETAIN_DAYS, compact_after_days=COMPACT_AFTER_DAYS, chunk_size=TRIM_CHUNK_SIZE):
+    """
+    Remove the change log entries older than `retain_days` days, and those older than
+    `compact_after_days` days that a later entry of the same row supersedes; None skips either.
+    Returns {"pruned": n, "compacted": m}, the numbers of entries removed.
+    """
+    from sqlalchemy import Column, Integer, MetaData, Table, delete, func, insert, select
+
+    from models import Change, ChangeTrim
+
+    if chunk_size <= 0:
+        raise ValidationError("Chunk size must be greater than zero.")
+    if any(days is not None and days < 0 for days in (retain_days, compact_after_days)):
+        raise ValidationError("Days must not be negative.")
+    removed = {"pruned": 0, "compacted": 0}
+
+    with engine.connect() as connection:
+        head = connection.execute(select(func.max(Change.seq))).scalar() or 0
+
+        def older_than(days):
+            """The seq of the last entry made more than `days` days ago, or 0."""
+            if days is None:
+                return 0
+            first_recent = connection.execute(
+                select(Change.seq).where(Change.changed_at >= func.datetime("now", f"-{days} days")).order_by(Change.seq).limit(1)
+            ).scalar()
+            return (head + 1 if first_recent is None else first_recent) - 1
+
+        def delete_in_chunks(lowest, highest, *filters):
+            """Delete the entries with lowest < seq <= highest that match `filters`, a chunk per transaction."""
+            count = 0
+            while lowest < highest:
+                upper = connection.execute(
+                    select(Change.seq).where(Change.seq > lowest, Change.seq <= highest)
+                    .order_by(Change.seq).offset(chunk_size - 1).limit(1)
+                ).scalar() or highest
+                count += connection.execute(delete(Change).where(Change.seq > lowest, Change.seq <= upper, *filters)).rowcount
+                connection.commit()
+                lowest = upper
+            return count
+
+        previous = connection.execute(select(func.max(ChangeTrim.pruned_through))).scalar() or 0
+        pruned_through = max(previous, older_than(retain_days))
+        compacted_through = max(pruned_through, older_than(compact_after_days))
+        # Recorded first: a reader that finds entries missing then also finds the watermark (see changes_since)
+        connection.execute(insert(ChangeTrim).values(pruned_through=pruned_through, compacted_through=compacted_through))
+        connection.commit()
+
+        removed["pruned"] = delete_in_chunks(0, pruned_through)
+        if compacted_through > pruned_through:
+            # The latest entry of every row, as of now: any entry not in it has a later one
+            latest = Table("latest_changes", MetaData(), Column("seq", Integer, primary_key=True), prefixes=["TEMPORARY"])
+            latest.create(connection)
+            try:
+                connection.execute(insert(latest).from_select(
+                    ["seq"], select(func.max(Change.seq)).group_by(Change.entity, Change.entity_id)
+                ))
+                removed["compacted"] = delete_in_chunks(pruned_through, compacted_through,
+                                                        Change.seq.not_in(select(latest.c.seq)))
+            finally:
+                latest.drop(connection)
+                connection.commit()
+    return removed
+
+
+def change_log_status(engine):
+    """{"head", "entries", "oldest_seq", "oldest_at", "pruned_through", "last_trimmed_at"} of the change log."""
+    from sqlalchemy import func, select
+
+    from dal import DataAccessLayer
+    from models import Change, ChangeTrim
+
+    with engine.connect() as connection:
+        entries, oldest_seq = connection.execute(select(func.count(), func.min(Change.seq))).one()
+        oldest_at = connection.execute(select(Change.changed_at).where(Change.seq == oldest_seq)).scalar()
+        pruned_through, last_trimmed_at = connection.execute(
+            select(func.max(ChangeTrim.pruned_through), func.max(ChangeTrim.trimmed_at))
+        ).one()
+        return {
+            "head": connection.execute(DataAccessLayer._change_log_head_query()).scalar(),
+            "entries": entries,
+            "oldest_seq": oldest_seq,
+            "oldest_at": oldest_at,
+            "pruned_through": pruned_through or 0,
+            "last_trimmed_at": last_trimmed_at,
+        }
+
+
+def entry_json(entry):
+    """A ChangeEntry as a line of JSON; dates in ISO format and amounts as numbers, as bulk.py exports them."""
+    def default(value):
+        if isinstance(value, date):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+    return json.dumps(entry._asdict(), default=default)
+
+
+if __name__ == "__main__":
+    from models import CHANGE_LOG_TABLES
+
+    parser = argparse.ArgumentParser(description="Read and trim the change log of the café database")
+    parser.add_argument("--db", help="SQLAlchemy database URL (default: $CAFE_DB_URL or sqlite:///cafe_management.db)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    tail = subparsers.add_parser("tail", help="print the entries after a seq as JSON Lines")
+    tail.add_argument("--since", type=int, default=0, help="print the entries after this seq (default: all of them)")
+    tail.add_argument("--entity", choices=CHANGE_LOG_TABLES, help="only the entries of this table")
+    tail.add_argument("--follow", action="store_true", help="keep printing new entries as they are committed")
+    tail.add_argument("--interval", type=float, default=FOLLOW_INTERVAL, help="seconds between polls with --follow")
+    trim = subparsers.add_parser("trim", help="apply retention and compaction")
+    retention = trim.add_mutually_exclusive_group()
+    retention.add_argument("--retain-days", type=int, default=RETAIN_DAYS, help="remove the entries older than this")
+    retention.add_argument("--no-prune", action="store_true", help="keep entries however old they are")
+    compaction = trim.add_mutually_exclusive_group()
+    compaction.add_argument("--compact-after-days", type=int, default=COMPACT_AFTER_DAYS,
+                            help="after this many days, keep only the latest entry of each row")
+    compaction.add_argument("--no-compact", action="store_true", help="keep every superseded entry")
+    trim.add_argument("--chunk-size", type=int, default=TRIM_CHUNK_SIZE, help="entries removed per transaction")
+    subparsers.add_parser("status", help="size and extent of the change log")
+    args = parser.parse_args()
+
+    from models import get_engine
+
+    engine = get_engine(args.db)
+    try:
+        if args.command == "tail":
+            from dal import DataAccessLayer
+
+            dal = DataAccessLayer(engine)
+            try:
+                if args.follow:
+                    for entry in follow(dal, args.since, args.entity, args.interval):
+                        print(entry_json(entry), flush=True)
+                else:
+                    seq = args.since
+                    while page := dal.changes_since(seq, entity=args.entity):
+                        for entry in page:
+                            print(entry_json(entry))
+                        seq = page[-1].seq
+            except KeyboardInterrupt:
+                pass
+            finally:
+                dal.close()
+        elif args.command == "trim":
+            removed = trim_changes(engine, None if args.no_prune else args.retain_days,
+                                   None if args.no_compact else args.compact_after_days, args.chunk_size)
+            print(f"Removed {removed['pruned']} expired and {removed['compacted']} superseded change log entries.")
+        else:
+            status = change_log_status(engine)
+            print(f"Latest seq:     {status['head']}")
+            print(f"Entries:        {status['entries']}")
+            print(f"Oldest entry:   {status['oldest_seq'] or '-'} ({status['oldest_at'] or 'empty log'})")
+            print(f"Pruned through: {status['pruned_through']} (last trimmed: {status['last_trimmed_at'] or 'never'})")
+    except (CursorExpiredError, ValidationError) as e:
+        raise SystemExit(f"Error: {e}")
+    finally:
+        engine.dispose()
@@ -1,33 +1,268 @@
-from models import User, Expense, Inventory, Sale, init_db, get_session
-from sqlalchemy.exc import IntegrityError
+import json
+import os
+import threading
+import weakref
+from collections import namedtuple
+from datetime import date
+
+from cache import CredentialCache, InventoryCache
+from errors import CursorExpiredError, DuplicateError, InsufficientStockError, NotFoundError, ValidationError
+from metrics import metrics
+from models import (Archive, Base, Change, ChangeTrim, User, Expense, Inventory, Sale, SaleLine, DailyTotal, Money,
+                    CHANGE_LOG_TABLES, SALES_TOTALS_CATEGORY, SEARCH_INDEXES, branch_db_url, from_cents, get_engine,
+                    get_session, to_cents)
+from sqlalchemy import Date, MetaData, bindparam, column, func, insert, literal, select, table, type_coerce, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import aliased
+
+# Detached, immutable inventory row as served from the catalogue cache
+InventoryRow = namedtuple("InventoryRow", Inventory.__table__.columns.keys())
+
+# Conditional stock decrement, executed once per (item_id, sold) parameter set: it only
+# matches while enough stock is left, so the rowcount says which lines could be filled
+STOCK_DECREMENT = (
+    update(Inventory.__table__)
+    .where(Inventory.__table__.c.id == bindparam("item_id"), Inventory.__table__.c.quantity >= bindparam("sold"))
+    .values(quantity=Inventory.__table__.c.quantity - bindparam("sold"))
+)
+
+# Puts back stock taken by STOCK_DECREMENT, for orders of a batch that couldn't be filled
+STOCK_RESTORE = (
+    update(Inventory.__table__)
+    .where(Inventory.__table__.c.id == bindparam("item_id"))
+    .values(quantity=Inventory.__table__.c.quantity + bindparam("sold"))
+)
+
+# The stock on hand of the items in :ids, for when the catalogue cache's levels may be stale
+STOCK_LEVELS = select(Inventory.id, Inventory.quantity).where(Inventory.id.in_(bindparam("ids", expanding=True)))
+
+# Adds increments to daily_totals rows, creating the rows that don't exist yet
+_daily_totals_insert = sqlite_insert(DailyTotal.__table__)
+DAILY_TOTALS_UPSERT = _daily_totals_insert.on_conflict_do_update(
+    index_elements=["date", "category"],
+    set_={
+        column: DailyTotal.__table__.c[column] + _daily_totals_insert.excluded[column]
+        for column in ("revenue", "sale_count", "expense_total", "expense_count")
+    },
+)
+
+
+def _search_index_insert(search_index, content, text_column):
+    source = Base.metadata.tables[content]
+    new_rows = select(source.c.id, source.c[text_column]).where(source.c.id >= bindparam("first_id"))
+    return insert(table(search_index, column("rowid"), column(text_column))).from_select(["rowid", text_column], new_rows)
+
+
+# Adds the rows the current transaction inserted, from id :first_id up, to a search index with a
+# single statement (SQLite has one writer at a time, so every such row is the transaction's own)
+SEARCH_INDEX_INSERTS = {
+    search_index: _search_index_insert(search_index, content, text_column)
+    for search_index, (content, text_column) in SEARCH_INDEXES.items()
+}
+
+
+def _change_log_insert(content, operation, selected):
+    source = Base.metadata.tables[content]
+    fields = [field for column in source.columns if column.name not in ("id", "password")
+              for field in (literal(column.name), column)]
+    if content == "sales":
+        lines = SaleLine.__table__
+        line_items = select(func.json_group_array(func.json_array(lines.c.inventory_id, lines.c.quantity, lines.c.unit_price)))
+        fields += [literal("lines"), func.json(line_items.where(lines.c.sale_id == source.c.id).scalar_subquery())]
+    entries = (
+        select(literal(content), source.c.id, literal(operation), func.json_object(*fields))
+        .where(selected(source.c.id))
+        .order_by(source.c.id)
+    )
+    return insert(Change.__table__).from_select(["entity", "entity_id", "operation", "data"], entries)
+
+
+# Change log (see changes.py): every DAL write appends an entry per row it inserts, updates or deletes
+# within its own transaction. An entry's data is the row as stored after the change (a sale with its
+# lines, a user without the password), built by SQLite from the row itself with one statement.
+# Appends the rows inserted from id :first_id up (see SEARCH_INDEX_INSERTS), and the updated rows :ids
+CHANGE_LOG_INSERTS = {
+    content: _change_log_insert(content, "insert", lambda id_column: id_column >= bindparam("first_id"))
+    for content in CHANGE_LOG_TABLES
+}
+CHANGE_LOG_UPDATES = {
+    content: _change_log_insert(content, "update", lambda id_column: id_column.in_(bindparam("ids", expanding=True)))
+    for content in CHANGE_LOG_TABLES
+}
+CHANGE_LOG_DELETE = insert(Change.__table__).values(operation="delete")  # Per {"entity", "entity_id"}
+
+# A change log entry as returned by changes_since; data as decoded by change_values
+ChangeEntry = namedtuple("ChangeEntry", ["seq", "changed_at", "entity", "entity_id", "operation", "data"])
+CHANGE_ENTRY_COLUMNS = (Change.seq, Change.changed_at, Change.entity, Change.entity_id, Change.operation, Change.data)
+PRUNED_THROUGH = select(func.max(ChangeTrim.pruned_through)).scalar_subquery()
+
+
+def change_values(entity, data):
+    """
+    The column values in a change log entry's JSON `data` as the DAL returns them: Decimal amounts,
+    dates, and a sale's lines as (inventory_id, quantity, unit_price) tuples. None for a delete.
+    """
+    if data is None:
+        return None
+    columns = Base.metadata.tables[entity].c
+    values = json.loads(data)
+    for key, value in values.items():
+        if key == "lines":
+            values[key] = [(inventory_id, quantity, from_cents(unit_price)) for inventory_id, quantity, unit_price in value]
+        elif value is not None and isinstance(columns[key].type, Money):
+            values[key] = from_cents(value)
+        elif value is not None and isinstance(columns[key].type, Date):
+            values[key] = date.fromisoformat(value)
+    return values
+
+
+def change_entries(rows, pruned_through, seq):
+    """
+    ChangeEntry tuples of change log `rows` read after `seq`, once the pruning watermark (read
+    after the rows, so that a trim running in between is noticed) shows none were removed.
+    """
+    if pruned_through is not None and seq < pruned_through:
+        raise CursorExpiredError(f"Changes up to seq {pruned_through} have been removed; reload the current "
+                                 "state and follow the changes from the latest seq.")
+    return [ChangeEntry(*row[:5], change_values(row[2], row[5])) for row in rows]
+
+
+# Archived history (see archive.py): sales, their lines and expenses dated before an archive's
+# archived_before are kept in one SQLite file per year, which queries read by ATTACHing it as
+# schema "archive_<year>". The archive job copies each chunk before deleting it from the hot
+# tables, so a row may briefly be in both; the archived copy is skipped while the hot one exists.
+ARCHIVED_BEFORE = select(func.max(Archive.archived_before)).scalar_subquery()
+MAX_ATTACHED_ARCHIVES = 10  # SQLite's default SQLITE_MAX_ATTACHED
+_archive_metadata = MetaData()
+_archive_metadata_lock = threading.Lock()
+
+
+def archive_schema(year):
+    return f"archive_{year}"
+
+
+def archive_table(model, schema):
+    """`model`'s table in the archive attached as `schema`."""
+    with _archive_metadata_lock:
+        key = f"{schema}.{model.__tablename__}"
+        if key not in _archive_metadata.tables:
+            model.__table__.to_metadata(_archive_metadata, schema=schema)
+        return _archive_metadata.tables[key]
+
+
+def attach_archives(connection, start_date=None, end_date=None):
+    """
+    ATTACH to `connection` the archives that may hold rows dated within the optional range
+    and return their schema names. Attachments belong to the pooled DBAPI connection, so
+    each file is attached once per connection rather than once per query.
+    """
+    archives = connection.execute(select(Archive.year, Archive.path, Archive.archived_before)).all()
+    needed = {
+        archive_schema(year): path for year, path, archived_before in archives
+        if (start_date is None or start_date < archived_before) and (end_date is None or end_date >= date(year, 1, 1))
+    }
+    attached = connection.info.setdefault("attached_archives", set())
+    if len(attached | needed.keys()) > MAX_ATTACHED_ARCHIVES:
+        for schema in attached - needed.keys():
+            try:
+                connection.exec_driver_sql(f"DETACH DATABASE {schema}")
+                attached.discard(schema)
+            except OperationalError:
+                pass  # Still read by an open cursor
+        if len(attached | needed.keys()) > MAX_ATTACHED_ARCHIVES:
+            raise ValidationError(f"At most {MAX_ATTACHED_ARCHIVES} archived years can be read at once; "
+                                  "narrow the date range.")
+    directory = os.path.dirname(os.path.abspath(connection.engine.url.database))
+    for schema in sorted(needed.keys() - attached):
+        connection.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (os.path.join(directory, needed[schema]),))
+        attached.add(schema)
+    return tuple(sorted(needed))
+
+
+def daily_totals_increments(sales=(), expenses=()):
+    """
+    Sum (date, amount) sales and (date, amount, category) expenses into one parameter set
+    per daily_totals row, ready to execute with DAILY_TOTALS_UPSERT. Amounts are added up
+    in integer cents, so the totals are exact whatever numeric type they were given in.
+    """
+    totals = {}
+
+    def row(day, category):
+        key = (day, category)
+        if key not in totals:
+            totals[key] = {"date": day, "category": category, "revenue": 0, "sale_count": 0,
+                           "expense_total": 0, "expense_count": 0}
+        return totals[key]
+
+    for day, amount in sales:
+        increment = row(day, SALES_TOTALS_CATEGORY)
+        increment["revenue"] += to_cents(amount)
+        increment["sale_count"] += 1
+    for day, amount, category in expenses:
+        increment = row(day, category)
+        increment["expense_total"] += to_cents(amount)
+        increment["expense_count"] += 1
+    for increment in totals.values():
+        increment["revenue"] = from_cents(increment["revenue"])
+        increment["expense_total"] = from_cents(increment["expense_total"])
+    return list(totals.values())
 
 # Data Access Layer
+# Methods return the rows they create or change and raise errors.CafeError subclasses on failure;
+# they never print. Every public method is timed and counted by metrics.
+@metrics.instrument_class
 class DataAccessLayer:
-    engine = init_db('sqlite:///cafe_management.db')
-    def __init__(self):
-        self.session = get_session(self.engine)
+    _inventory_caches = weakref.WeakKeyDictionary()  # One catalogue cache per engine, shared by its DALs
+    _login_caches = weakref.WeakKeyDictionary()  # Likewise for verified logins
+
+    def __init__(self, engine=None, session=None, db_url=None, branch=None):
+        """
+        Use `session` if given (e.g. one scoped to a web request), otherwise open one on `engine`,
+        or on the shared engine for `db_url` (default: $CAFE_DB_URL or cafe_management.db),
+        or for `branch`'s own database file (see models.branch_db_url).
+        """
+        if branch is not None and db_url is None:
+            db_url = branch_db_url(branch)
+        engine = session.get_bind() if session is not None else engine or get_engine(db_url)
+        self.engine = engine
+        self.session = session if session is not None else get_session(engine)
+        self.inventory_cache = self._inventory_caches.setdefault(engine, InventoryCache())
+        self.login_cache = self._login_caches.setdefault(engine, CredentialCache())
+
+    def close(self):
+        """Release the session and return its connection to the pool."""
+        self.session.close()
 
     # User Management
     def add_user(self, username, password, email, role):
         try:
             new_user = User(username=username, password=password, email=email, role=role)
             self.session.add(new_user)
+            self.session.flush()
+            self._log_inserted("users", new_user.id)
             self.session.commit()
-            print(f"User '{username}' added successfully.")
         except IntegrityError:
             self.session.rollback()
-            print(f"Error: Username or email already exists.")
+            raise DuplicateError("Username or email already exists.") from None
+        return new_user
 
     def update_user(self, user_id, updates):
         user = self.session.query(User).filter_by(id=user_id).first()
         if not user:
-            print(f"User with ID {user_id} not found.")
-            return
+            raise NotFoundError(f"User with ID {user_id} not found.")
         for key, value in updates.items():
             if hasattr(user, key):
                 setattr(user, key, value)
-        self.session.commit()
-        print(f"User ID {user_id} updated successfully.")
+        try:
+            self.session.flush()
+            self._log_changed("users", "update", [user_id])
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            raise DuplicateError("Username or email already exists.") from None
+        self.login_cache.invalidate()
+        return user
 
     def get_all_users(self):
         """Fetch all users with their ID, username, email, and role."""
@@ -37,11 +272,11 @@ class DataAccessLayer:
     def delete_user(self, user_id):
         user = self.session.query(User).filter_by(id=user_id).first()
         if not user:
-            print(f"User with ID {user_id} not found.")
-            return
+            raise NotFoundError(f"User with ID {user_id} not found.")
         self.session.delete(user)
+        self._log_changed("users", "delete", [user_id])
         self.session.commit()
-        print(f"User ID {user_id} deleted successfully.")
+        self.login_cache.invalidate()
 
     def get_user_by_username(self, username):
         return self.session.query(User).filter_by(username=username).first()
@@ -50,106 +285,718 @@ class DataAccessLayer:
     def add_expense(self, date, amount, category, description):
         expense = Expense(date=date, amount=amount, category=category, description=description)
         self.session.add(expense)
+        self.session.flush()
+        self._update_daily_totals(expenses=[(date, amount, category)])
+        self._index_search_text("expenses_fts", expense.id)
+        self._log_inserted("expenses", expense.id)
         self.session.commit()
-        print("Expense added successfully.")
+        return expense
+
+    def _update_daily_totals(self, sales=(), expenses=()):
+        """Add sales/expenses to daily_totals within the current transaction."""
+        increments = daily_totals_increments(sales, expenses)
+        if increments:
+            self.session.connection().execute(DAILY_TOTALS_UPSERT, increments)
+
+    def _index_search_text(self, search_index, first_id):
+        """Add the rows inserted within the current transaction from id `first_id` up to a search index."""
+        self.session.connection().execute(SEARCH_INDEX_INSERTS[search_index], {"first_id": first_id})
 
-    def get_expense_history(self):
-        return self.session.query(Expense).all()
+    def _log_inserted(self, content, first_id):
+        """Add the rows of table `content` inserted within the current transaction from id `first_id` up to the change log."""
+        self.session.connection().execute(CHANGE_LOG_INSERTS[content], {"first_id": first_id})
+
+    def _log_changed(self, content, operation, ids):
+        """Add the rows of table `content` just updated or deleted ("update"/"delete") within the current transaction to the change log."""
+        if operation == "delete":
+            self.session.connection().execute(CHANGE_LOG_DELETE, [{"entity": content, "entity_id": id} for id in ids])
+        else:
+            self.session.connection().execute(CHANGE_LOG_UPDATES[content], {"ids": list(ids)})
+
+    def get_expense_history(self, include_archive=False, **filters):
+        """
+        Expenses matching the filters of _expense_query (all of them, in id order, by default),
+        also read from the archives within the date range if `include_archive` is set.
+        """
+        archives = self._attach_archives(filters.get("start_date"), filters.get("end_date")) if include_archive else ()
+        return self.session.scalars(self._expense_query(**filters, archives=archives)).all()
 
     # Inventory Management
-    def add_inventory_item(self, item_name, quantity, cost):
+    def add_inventory_item(self, item_name, quantity, cost, reorder_threshold=0):
         try:
-            inventory_item = Inventory(item_name=item_name, quantity=quantity, cost=cost)
+            inventory_item = Inventory(item_name=item_name, quantity=quantity, cost=cost, reorder_threshold=reorder_threshold)
             self.session.add(inventory_item)
+            self.session.flush()
+            self._log_inserted("inventory", inventory_item.id)
             self.session.commit()
-            print(f"Inventory item '{item_name}' added successfully.")
         except IntegrityError:
             self.session.rollback()
-            print(f"Error: Inventory item '{item_name}' already exists.")
+            raise DuplicateError(f"Inventory item '{item_name}' already exists.") from None
+        self.inventory_cache.invalidate()
+        return inventory_item
 
     def update_inventory_item(self, item_id, updates):
         item = self.session.query(Inventory).filter_by(id=item_id).first()
         if not item:
-            print(f"Inventory item with ID {item_id} not found.")
-            return
+            raise NotFoundError(f"Inventory item with ID {item_id} not found.")
         for key, value in updates.items():
             if hasattr(item, key):
                 setattr(item, key, value)
-        self.session.commit()
-        print(f"Inventory item ID {item_id} updated successfully.")
+        try:
+            self.session.flush()
+            self._log_changed("inventory", "update", [item_id])
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            raise DuplicateError(f"Inventory item '{updates.get('item_name')}' already exists.") from None
+        self.inventory_cache.invalidate()
+        return item
 
     def delete_inventory_item(self, item_id):
         item = self.session.query(Inventory).filter_by(id=item_id).first()
         if not item:
-            print(f"Inventory item with ID {item_id} not found.")
-            return
+            raise NotFoundError(f"Inventory item with ID {item_id} not found.")
         self.session.delete(item)
+        self._log_changed("inventory", "delete", [item_id])
         self.session.commit()
-        print(f"Inventory item ID {item_id} deleted successfully.")
+        self.inventory_cache.invalidate()
+
+    def _load_inventory(self):
+        return [InventoryRow(*row) for row in self.session.execute(select(*Inventory.__table__.columns))]
 
     def get_inventory(self):
-        return self.session.query(Inventory).all()
+        """All inventory rows, served from the catalogue cache."""
+        return self.inventory_cache.get_all(self._load_inventory)
 
     def get_inventory_item(self, item_id):
-        """Fetch item details from the inventory by ID."""
-        item = self.session.query(Inventory).filter_by(id=item_id).first()
-        return item
+        """Fetch item details from the inventory by ID (cached; stock is re-checked at checkout)."""
+        return self.inventory_cache.get(item_id, self._load_inventory)
+
+    def get_inventory_items(self, item_ids):
+        """Fetch {id: InventoryRow} for the given ids from the catalogue cache."""
+        return {
+            item_id: item
+            for item_id in set(item_ids)
+            if (item := self.inventory_cache.get(item_id, self._load_inventory)) is not None
+        }
+
+    def get_stock_levels(self, item_ids):
+        """Fetch {id: quantity} for the given ids from the database, bypassing the cache's possibly stale stock."""
+        return dict(self.session.execute(STOCK_LEVELS, {"ids": list(item_ids)}).all())
+
+    def get_inventory_by_names(self, item_names):
+        """Fetch {item_name: InventoryRow} for the given names from the catalogue cache."""
+        return {
+            name: item
+            for name in set(item_names)
+            if (item := self.inventory_cache.get_by_name(name, self._load_inventory)) is not None
+        }
+
+    def search_inventory(self, **filters):
+        """Inventory rows matching the filters of _inventory_query, read from the database rather than the cache."""
+        return [InventoryRow(*row) for row in self.session.execute(self._inventory_query(**filters))]
+
+    def inventory_cache_stats(self):
+        return self.inventory_cache.stats()
 
     def update_inventory_quantity(self, item_id, new_quantity):
         """Update the quantity of an inventory item."""
         item = self.session.query(Inventory).filter_by(id=item_id).first()
-        if item:
-            item.quantity = new_quantity
-            self.session.commit()
-            print("Inventory updated successfully.")
-        else:
-            print("Error: Item not found.")
+        if not item:
+            raise NotFoundError("Item not found.")
+        delta = new_quantity - item.quantity
+        item.quantity = new_quantity
+        self.session.flush()
+        self._log_changed("inventory", "update", [item_id])
+        self.session.commit()
+        self.inventory_cache.adjust_quantity(item_id, delta)
+        return item
+
+    # Reordering
+    def low_stock_items(self):
+        """Return (inventory_id, item_name, quantity, reorder_threshold) for every item at or below its reorder threshold."""
+        return [tuple(row) for row in self.session.execute(self._low_stock_query())]
+
+    def units_sold_since(self, since_date):
+        """Return {inventory_id: units_sold} over the sales dated `since_date` or later."""
+        return dict(self.session.execute(self._units_sold_since_query(since_date)).all())
 
     # Sales Management
-    def add_sale(self, date, amount, items_sold):
+    def add_sale(self, date, amount, items_sold, lines=()):
+        """Record a sale together with its (inventory_id, quantity, unit_price) line items."""
+        sale = self._stage_sale(date, amount, items_sold, lines)
+        self.session.commit()
+        return sale
+
+    def _stage_sale(self, date, amount, items_sold, lines):
+        """Add a sale and its lines to the current transaction without committing."""
         sale = Sale(date=date, amount=amount, items_sold=items_sold)
         self.session.add(sale)
-        self.session.commit()
-        print("Sale recorded successfully.")
+        self.session.flush()
+        self.session.add_all(
+            SaleLine(sale_id=sale.id, inventory_id=inventory_id, quantity=quantity, unit_price=unit_price)
+            for inventory_id, quantity, unit_price in lines
+        )
+        self.session.flush()  # The change log entry is read back with the lines
+        self._update_daily_totals(sales=[(date, amount)])
+        self._index_search_text("sales_fts", sale.id)
+        self._log_inserted("sales", sale.id)
+        return sale
 
-    def get_sales_history(self):
-        return self.session.query(Sale).all()
+    def checkout(self, lines, date, items_sold):
+        """
+        Take every (inventory_id, quantity, unit_price) line out of stock and record one sale,
+        all in a single transaction. Each decrement is a conditional UPDATE evaluated by SQLite,
+        so concurrent tills can neither oversell nor overwrite each other's stock level.
+        Returns the new Sale; raises InsufficientStockError, with nothing written, if any line lacked stock.
+        """
+        try:
+            decremented = self.session.connection().execute(
+                STOCK_DECREMENT, [{"item_id": item_id, "sold": quantity} for item_id, quantity, _ in lines]
+            ).rowcount
+            if decremented != len(lines):
+                raise InsufficientStockError("Not enough stock available.")
+            self._log_changed("inventory", "update", sorted({item_id for item_id, _, _ in lines}))
+            amount = sum(quantity * unit_price for _, quantity, unit_price in lines)
+            sale = self._stage_sale(date, amount, items_sold, lines)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        # The UPDATE bypassed the ORM, so reload stock levels on next access
+        self.session.expire_all()
+        for item_id, quantity, _ in lines:
+            self.inventory_cache.adjust_quantity(item_id, -quantity)
+        return sale
 
-    # Reporting
-    def generate_expense_report(self):
-        """Fetch and structure expense data."""
-        expenses = self.session.query(Expense).all()
-        return [
-            {
-                "Date": exp.date.strftime("%Y-%m-%d"),
-                "Amount": f"{exp.amount:.2f}",
-                "Category": exp.category,
-                "Description": exp.description,
-            }
-            for exp in expenses
-        ]
+    def checkout_many(self, orders):
+        """
+        Check out a batch of (lines, date, items_sold) orders with a single commit; see checkout.
+        An order that lacks stock is left out, with its decrements undone in the same transaction,
+        and the rest still go through. Returns a Sale or an InsufficientStockError per order, in order.
+        """
+        connection = self.session.connection()
+        outcomes = []
+        try:
+            for lines, date, items_sold in orders:
+                taken = []
+                for item_id, quantity, _ in lines:
+                    if not connection.execute(STOCK_DECREMENT, {"item_id": item_id, "sold": quantity}).rowcount:
+                        break
+                    taken.append({"item_id": item_id, "sold": quantity})
+                if len(taken) < len(lines):
+                    if taken:
+                        connection.execute(STOCK_RESTORE, taken)
+                    outcomes.append(InsufficientStockError("Not enough stock available."))
+                    continue
+                amount = sum(quantity * unit_price for _, quantity, unit_price in lines)
+                outcomes.append(Sale(date=date, amount=amount, items_sold=items_sold))
+            # One INSERT for all the sales, one for their lines and one daily_totals upsert
+            sold = [(sale, lines) for (lines, _, _), sale in zip(orders, outcomes) if isinstance(sale, Sale)]
+            self.session.add_all(sale for sale, _ in sold)
+            self.session.flush()
+            self.session.add_all(
+                SaleLine(sale_id=sale.id, inventory_id=inventory_id, quantity=quantity, unit_price=unit_price)
+                for sale, lines in sold
+                for inventory_id, quantity, unit_price in lines
+            )
+            self.session.flush()
+            self._update_daily_totals(sales=[(sale.date, sale.amount) for sale, _ in sold])
+            if sold:
+                self._index_search_text("sales_fts", min(sale.id for sale, _ in sold))
+                # One entry per item with its final stock level, however many orders took from it
+                self._log_changed("inventory", "update", sorted({item_id for _, lines in sold for item_id, _, _ in lines}))
+                self._log_inserted("sales", min(sale.id for sale, _ in sold))
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        # Only loaded Inventory objects are stale; the new sales stay usable without a reload
+        for instance in list(self.session.identity_map.values()):
+            if isinstance(instance, Inventory):
+                self.session.expire(instance)
+        for (lines, _, _), outcome in zip(orders, outcomes):
+            if not isinstance(outcome, Exception):
+                for item_id, quantity, _ in lines:
+                    self.inventory_cache.adjust_quantity(item_id, -quantity)
+        return outcomes
+
+    def get_sales_history(self, include_archive=False, **filters):
+        """
+        Sales matching the filters of _sales_query (all of them, in id order, by default),
+        also read from the archives within the date range if `include_archive` is set.
+        """
+        archives = self._attach_archives(filters.get("start_date"), filters.get("end_date")) if include_archive else ()
+        return self.session.scalars(self._sales_query(**filters, archives=archives)).all()
+
+    def _attach_archives(self, start_date=None, end_date=None):
+        """See attach_archives; on the session's connection."""
+        return attach_archives(self.session.connection(), start_date, end_date)
+
+    # Filtered listings
+    # Every filter is compiled into the WHERE clause: date ranges and categories are range scans
+    # of the report indexes, name prefixes of ix_inventory_name_nocase and text searches go
+    # through the FTS5 indexes. Results are ordered by a column from the *_SORTS maps, then id.
+    EXPENSE_SORTS = {"id": Expense.id, "date": Expense.date, "amount": Expense.amount, "category": Expense.category}
+    SALE_SORTS = {"id": Sale.id, "date": Sale.date, "amount": Sale.amount}
+    INVENTORY_SORTS = {"id": Inventory.id, "item_name": Inventory.item_name, "quantity": Inventory.quantity,
+                       "cost": Inventory.cost}
+
+    @staticmethod
+    def _amount_filters(column, min_amount=None, max_amount=None):
+        """Build the WHERE clauses for an optional inclusive amount range."""
+        filters = []
+        if min_amount is not None:
+            filters.append(column >= min_amount)
+        if max_amount is not None:
+            filters.append(column <= max_amount)
+        return filters
 
-    def generate_inventory_report(self):
-        """Fetch and structure inventory data."""
-        inventory = self.session.query(Inventory).all()
-        return [
-            {
-                "Item Name": inv.item_name,
-                "Quantity": inv.quantity,
-                "Cost": f"{inv.cost:.2f}",
-            }
-            for inv in inventory
+    @staticmethod
+    def _escape_like(text):
+        """`text` with the LIKE wildcards escaped by backslashes, to match literally."""
+        return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    @classmethod
+    def _search_filter(cls, columns, text_column, text, search_index=None):
+        """
+        The WHERE clause for rows whose `text_column` contains `text`, ignoring case. Three
+        characters or more are looked up in the trigram `search_index`; shorter text can't be,
+        and archives have no search index, so those fall back to LIKE over the column.
+        """
+        if search_index is None or len(text) < 3:
+            return getattr(columns, text_column).like(f"%{cls._escape_like(text)}%", escape="\\")
+        fts = table(search_index, column("rowid"), column(text_column))
+        phrase = '"' + text.replace('"', '""') + '"'
+        return columns.id.in_(select(fts.c.rowid).where(fts.c[text_column].match(phrase)))
+
+    @staticmethod
+    def _listing(query, sort_column, id_column, descending=False, limit=None, offset=0):
+        """Order `query` by `sort_column` then id (both descending if asked) and apply limit/offset."""
+        order = [sort_column, id_column] if sort_column.key != id_column.key else [id_column]
+        query = query.order_by(*(order_column.desc() if descending else order_column for order_column in order))
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        return query
+
+    @classmethod
+    def _with_archives(cls, model, archives, where):
+        """
+        The entity to select `model`'s rows from and the filters to apply: just the model and
+        where(model, its search index) without archives, otherwise an alias of the UNION ALL
+        of the hot table and each archive's copy, every source filtered by where() itself.
+        """
+        search_index = next((name for name, (content, _) in SEARCH_INDEXES.items() if content == model.__tablename__), None)
+        if not archives:
+            return model, where(model, search_index)
+        sources = [
+            select(source).where(*where(source.c, search_index if source is model.__table__ else None), *guard)
+            for source, guard in cls._archive_sources(model, archives)
         ]
+        return aliased(model, union_all(*sources).subquery()), []
+
+    @staticmethod
+    def _archive_sources(model, archives=()):
+        """
+        (table, filters) pairs to read `model`'s rows from: the hot table, then its copy in
+        each attached archive, filtered to skip the rows the hot table still has.
+        """
+        hot = model.__table__
+        still_hot = select(hot.c.id).where(hot.c.date < ARCHIVED_BEFORE)
+        archived = [archive_table(model, schema) for schema in archives]
+        return [(hot, [])] + [(source, [source.c.id.not_in(still_hot)]) for source in archived]
+
+    @classmethod
+    def _expense_query(cls, start_date=None, end_date=None, category=None, min_amount=None, max_amount=None,
+                       search=None, sort="id", descending=False, limit=None, offset=0, archives=()):
+        """
+        Expenses in a date range, of a category, in an amount range and/or whose description
+        contains `search`, from the hot table and the attached `archives`.
+        """
+        def where(columns, search_index):
+            filters = cls._date_filters(columns.date, start_date, end_date)
+            filters += cls._amount_filters(columns.amount, min_amount, max_amount)
+            if category:
+                filters.append(columns.category == category)
+            if search:
+                filters.append(cls._search_filter(columns, "description", search, search_index))
+            return filters
+
+        source, filters = cls._with_archives(Expense, archives, where)
+        sort_column = getattr(source, cls.EXPENSE_SORTS[sort].key)
+        return cls._listing(select(source).where(*filters), sort_column, source.id, descending, limit, offset)
+
+    @classmethod
+    def _sales_query(cls, start_date=None, end_date=None, min_amount=None, max_amount=None, search=None, sort="id",
+                     descending=False, limit=None, offset=0, archives=()):
+        """
+        Sales in a date range, in an amount range and/or whose items_sold contains `search`,
+        from the hot table and the attached `archives`.
+        """
+        def where(columns, search_index):
+            filters = cls._date_filters(columns.date, start_date, end_date)
+            filters += cls._amount_filters(columns.amount, min_amount, max_amount)
+            if search:
+                filters.append(cls._search_filter(columns, "items_sold", search, search_index))
+            return filters
+
+        source, filters = cls._with_archives(Sale, archives, where)
+        sort_column = getattr(source, cls.SALE_SORTS[sort].key)
+        return cls._listing(select(source).where(*filters), sort_column, source.id, descending, limit, offset)
 
-    def generate_sales_report(self):
-        """Fetch and structure sales data."""
-        sales = self.session.query(Sale).all()
-        return [
-            {
-                "Date": sale.date.strftime("%Y-%m-%d"),
-                "Amount": f"{sale.amount:.2f}",
-                "Items Sold": sale.items_sold,
-            }
-            for sale in sales
+    @classmethod
+    def _inventory_query(cls, name_prefix=None, name_contains=None, sort="id", descending=False, limit=None, offset=0):
+        """
+        Inventory rows whose name starts with `name_prefix` and/or contains `name_contains`,
+        ignoring case. A prefix is a range scan of ix_inventory_name_nocase; a substring has
+        to scan the (small) catalogue.
+        """
+        filters = []
+        if name_prefix:
+            filters.append(Inventory.item_name.like(f"{cls._escape_like(name_prefix)}%", escape="\\"))
+        if name_contains:
+            filters.append(Inventory.item_name.like(f"%{cls._escape_like(name_contains)}%", escape="\\"))
+        query = select(*Inventory.__table__.columns).where(*filters)
+        return cls._listing(query, cls.INVENTORY_SORTS[sort], Inventory.id, descending, limit, offset)
+
+    # Reporting
+    REPORT_PAGE_SIZE = 500
+
+    @staticmethod
+    def _date_filters(column, start_date=None, end_date=None):
+        """Build the WHERE clauses for an optional inclusive date range."""
+        filters = []
+        if start_date:
+            filters.append(column >= start_date)
+        if end_date:
+            filters.append(column <= end_date)
+        return filters
+
+    @staticmethod
+    def _page_query(id_column, columns, filters, last_id, page_size):
+        """The keyset page of (id, *columns) rows that follows `last_id`."""
+        return select(id_column, *columns).where(id_column > last_id, *filters).order_by(id_column).limit(page_size)
+
+    def _iter_pages(self, id_column, columns, filters=(), page_size=REPORT_PAGE_SIZE):
+        """
+        Yield (id, *columns) rows in id order, fetching one keyset page at a time.
+        Only a single page is held in memory and each page is an indexed range scan
+        on the primary key, so the cost per page stays flat however large the table grows.
+        """
+        last_id = 0
+        while True:
+            page = self.session.execute(self._page_query(id_column, columns, filters, last_id, page_size)).all()
+            yield from page
+            if len(page) < page_size:
+                return
+            last_id = page[-1][0]
+
+    # Bulk Import/Export
+    BULK_MODELS = {"inventory": Inventory, "expenses": Expense, "sales": Sale}
+
+    def bulk_add(self, table, rows):
+        """
+        Insert a chunk of row dicts with one executemany and a single commit. Sale rows may
+        carry a "lines" list of (inventory_id, quantity, unit_price) tuples.
+        Raises DuplicateError, with nothing written, if the chunk violates a constraint.
+        """
+        try:
+            if table == "sales":
+                sale_ids = self.session.scalars(
+                    insert(Sale).returning(Sale.id, sort_by_parameter_order=True),
+                    [{key: value for key, value in row.items() if key != "lines"} for row in rows],
+                ).all()
+                lines = [
+                    {"sale_id": sale_id, "inventory_id": inventory_id, "quantity": quantity, "unit_price": unit_price}
+                    for sale_id, row in zip(sale_ids, rows)
+                    for inventory_id, quantity, unit_price in row.get("lines", ())
+                ]
+                if lines:
+                    self.session.execute(insert(SaleLine), lines)
+                self._update_daily_totals(sales=[(row["date"], row["amount"]) for row in rows])
+                if sale_ids:
+                    self._index_search_text("sales_fts", min(sale_ids))
+                    self._log_inserted("sales", min(sale_ids))
+            elif table == "expenses":
+                expense_ids = self.session.scalars(insert(Expense).returning(Expense.id), rows).all()
+                self._update_daily_totals(expenses=[(row["date"], row["amount"], row["category"]) for row in rows])
+                if expense_ids:
+                    self._index_search_text("expenses_fts", min(expense_ids))
+                    self._log_inserted("expenses", min(expense_ids))
+            else:
+                item_ids = self.session.scalars(insert(Inventory).returning(Inventory.id), rows).all()
+                if item_ids:
+                    self._log_inserted("inventory", min(item_ids))
+            self.session.commit()
+            if table == "inventory":
+                self.inventory_cache.invalidate()
+        except IntegrityError:
+            self.session.rollback()
+            raise DuplicateError("Row conflicts with existing data (duplicate name?).") from None
+        return len(rows)
+
+    def iter_table_rows(self, table, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE):
+        """Stream the raw column values of `table` as dicts, in id order, one keyset page at a time."""
+        model = self.BULK_MODELS[table]
+        columns = [column for column in model.__table__.columns if column.name != "id"]
+        filters = self._date_filters(model.date, start_date, end_date) if hasattr(model, "date") else []
+        names = ["id"] + [column.name for column in columns]
+        for row in self._iter_pages(model.id, columns, filters, page_size):
+            yield dict(zip(names, row))
+
+    # Report layouts: (id column, selected columns, date column or None, column headers).
+    # Values are returned as they are (dates, Decimal amounts); formatting is left to the caller.
+    EXPENSE_REPORT = (
+        Expense.id, (Expense.date, Expense.amount, Expense.category, Expense.description), Expense.date,
+        ("Date", "Amount", "Category", "Description"),
+    )
+    INVENTORY_REPORT = (
+        Inventory.id, (Inventory.item_name, Inventory.quantity, Inventory.cost), None,
+        ("Item Name", "Quantity", "Cost"),
+    )
+    SALES_REPORT = (
+        Sale.id, (Sale.date, Sale.amount, Sale.items_sold), Sale.date,
+        ("Date", "Amount", "Items Sold"),
+    )
+
+    @classmethod
+    def _archive_page_query(cls, report, start_date, end_date, page_size, archives):
+        """
+        The keyset page of (id, *columns) rows of a dated report that follows the `last_id`
+        parameter, over the hot table and the attached `archives`: each source's own page (a
+        primary key range scan), merged by id. Built once per stream and executed for every page.
+        """
+        last_id = bindparam("last_id")
+        id_column, columns, date_column, _ = report
+        pages = [
+            select(source.c.id, *(source.c[column.key] for column in columns))
+            .where(source.c.id > last_id, *cls._date_filters(source.c[date_column.key], start_date, end_date), *guard)
+            .order_by(source.c.id)
+            .limit(page_size)
+            .subquery()
+            for source, guard in cls._archive_sources(id_column.class_, archives)
         ]
+        merged = union_all(*(select(page) for page in pages)).subquery()
+        return select(merged).order_by(merged.c.id).limit(page_size)
+
+    @staticmethod
+    def _archive_ends_query(model, archives):
+        """(schema, highest id) of `model`'s rows in each archive: a report is done with an archive once past it."""
+        return union_all(*(select(literal(schema), func.max(archive_table(model, schema).c.id)) for schema in archives))
+
+    @staticmethod
+    def _unfinished_archives(archives, archive_ends, last_id):
+        """The `archives` that still have rows after `last_id`, by their {schema: highest id}."""
+        return tuple(schema for schema in archives if (archive_ends[schema] or 0) > last_id)
+
+    def _iter_report(self, report, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """
+        Stream a report layout one keyset page at a time, from the archives too if asked. The
+        archives are attached here, before the first row is asked for, so that a range needing
+        too many of them raises ValidationError to the caller rather than midway through the stream.
+        """
+        if include_archive:
+            self._attach_archives(start_date, end_date)
+        return self._iter_report_pages(report, start_date, end_date, page_size, include_archive)
+
+    def _iter_report_pages(self, report, start_date, end_date, page_size, include_archive):
+        id_column, columns, date_column, headers = report
+        if not include_archive:
+            filters = self._date_filters(date_column, start_date, end_date) if date_column is not None else []
+            for row in self._iter_pages(id_column, columns, filters, page_size):
+                yield dict(zip(headers, row[1:]))
+            return
+        last_id, archive_ends, queries = 0, {}, {}
+        while True:
+            # Attached for every page, since the session may be on another connection after a commit
+            archives = self._attach_archives(start_date, end_date)
+            new = [schema for schema in archives if schema not in archive_ends]
+            if new:
+                archive_ends.update(self.session.execute(self._archive_ends_query(id_column.class_, new)).all())
+            archives = self._unfinished_archives(archives, archive_ends, last_id)
+            if archives not in queries:
+                queries[archives] = self._archive_page_query(report, start_date, end_date, page_size, archives)
+            page = self.session.execute(queries[archives], {"last_id": last_id}).all()
+            for row in page:
+                yield dict(zip(headers, row[1:]))
+            if len(page) < page_size:
+                return
+            last_id = page[-1][0]
+
+    def generate_expense_report(self, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """Stream structured expense rows, optionally limited to a date range and including the archives."""
+        return self._iter_report(self.EXPENSE_REPORT, start_date, end_date, page_size, include_archive)
+
+    def generate_inventory_report(self, page_size=REPORT_PAGE_SIZE):
+        """Stream structured inventory rows."""
+        return self._iter_report(self.INVENTORY_REPORT, page_size=page_size)
+
+    def generate_sales_report(self, start_date=None, end_date=None, page_size=REPORT_PAGE_SIZE, include_archive=False):
+        """Stream structured sales rows, optionally limited to a date range and including the archives."""
+        return self._iter_report(self.SALES_REPORT, start_date, end_date, page_size, include_archive)
+
+    # Aggregation
+    # Summaries are read from daily_totals: every range is whole days, so the per-day rows
+    # answer them exactly, at a cost that depends on the number of days rather than of sales.
+    PERIOD_FORMATS = {"day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+    @classmethod
+    def _sales_summary_query(cls, period, start_date=None, end_date=None):
+        bucket = func.strftime(cls.PERIOD_FORMATS[period], DailyTotal.date)
+        count, revenue = func.sum(DailyTotal.sale_count), func.sum(DailyTotal.revenue)
+        return (
+            select(bucket, count, revenue, type_coerce(revenue / count, Money))
+            .where(DailyTotal.category == SALES_TOTALS_CATEGORY, *cls._date_filters(DailyTotal.date, start_date, end_date))
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+    @classmethod
+    def _expense_summary_query(cls, group_by, start_date=None, end_date=None):
+        if group_by == "category":
+            key = DailyTotal.category
+        else:
+            key = func.strftime(cls.PERIOD_FORMATS[group_by], DailyTotal.date)
+        count, total = func.sum(DailyTotal.expense_count), func.sum(DailyTotal.expense_total)
+        return (
+            select(key, count, total, type_coerce(total / count, Money))
+            .where(DailyTotal.category != SALES_TOTALS_CATEGORY, *cls._date_filters(DailyTotal.date, start_date, end_date))
+            .group_by(key)
+            .order_by(key)
+        )
+
+    @classmethod
+    def _profit_query(cls, period, start_date=None, end_date=None):
+        bucket = func.strftime(cls.PERIOD_FORMATS[period], DailyTotal.date)
+        revenue, spent = func.sum(DailyTotal.revenue), func.sum(DailyTotal.expense_total)
+        return (
+            select(bucket, revenue, spent, revenue - spent)
+            .where(*cls._date_filters(DailyTotal.date, start_date, end_date))
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+
+    @classmethod
+    def _best_sellers_query(cls, start_date=None, end_date=None, limit=10, inventory_id=None, archives=()):
+        if archives:
+            # Per-item totals of the hot tables and of each archive, then added up and ranked
+            line_tables = [SaleLine.__table__] + [archive_table(SaleLine, schema) for schema in archives]
+            parts = [
+                select(lines.c.inventory_id, func.sum(lines.c.quantity).label("units"),
+                       func.sum(lines.c.quantity * lines.c.unit_price).label("revenue"))
+                .join_from(lines, sales, sales.c.id == lines.c.sale_id)
+                .where(*cls._date_filters(sales.c.date, start_date, end_date), *guard)
+                .where(*([lines.c.inventory_id == inventory_id] if inventory_id is not None else []))
+                .group_by(lines.c.inventory_id)
+                for lines, (sales, guard) in zip(line_tables, cls._archive_sources(Sale, archives))
+            ]
+            totals = union_all(*parts).subquery()
+            units = func.sum(totals.c.units)
+            return (
+                select(totals.c.inventory_id, Inventory.item_name, units, func.sum(totals.c.revenue))
+                .join_from(totals, Inventory, Inventory.id == totals.c.inventory_id)
+                .group_by(totals.c.inventory_id)
+                .order_by(units.desc(), Inventory.item_name, totals.c.inventory_id)
+                .limit(limit)
+            )
+        units = func.sum(SaleLine.quantity)
+        query = (
+            select(SaleLine.inventory_id, Inventory.item_name, units, func.sum(SaleLine.quantity * SaleLine.unit_price))
+            .join(Sale, Sale.id == SaleLine.sale_id)
+            .join(Inventory, Inventory.id == SaleLine.inventory_id)
+            .where(*cls._date_filters(Sale.date, start_date, end_date))
+        )
+        if inventory_id is not None:
+            query = query.where(SaleLine.inventory_id == inventory_id)
+        # Ties broken by name (then id), so `limit` cuts the same items every time
+        return query.group_by(SaleLine.inventory_id).order_by(units.desc(), Inventory.item_name, SaleLine.inventory_id).limit(limit)
+
+    @staticmethod
+    def _low_stock_query():
+        # Same condition as the ix_inventory_reorder partial index, so only its entries are read
+        return select(Inventory.id, Inventory.item_name, Inventory.quantity, Inventory.reorder_threshold).where(
+            Inventory.quantity <= Inventory.reorder_threshold
+        )
+
+    @staticmethod
+    def _units_sold_since_query(since_date):
+        # The recent sales come from the tail of ix_sales_date and their lines from ix_sale_lines_sale,
+        # so the cost follows the size of the window rather than of the whole sales history
+        recent_sales = select(Sale.id).where(Sale.date >= since_date)
+        return (
+            select(SaleLine.inventory_id, func.sum(SaleLine.quantity))
+            .where(SaleLine.sale_id.in_(recent_sales))
+            .group_by(SaleLine.inventory_id)
+        )
+
+    @classmethod
+    def _sales_date_bounds_query(cls, start_date=None, end_date=None, archives=()):
+        if archives:
+            bounds = union_all(*(
+                select(func.min(sales.c.date).label("first"), func.max(sales.c.date).label("last"))
+                .where(*cls._date_filters(sales.c.date, start_date, end_date), *guard)
+                for sales, guard in cls._archive_sources(Sale, archives)
+            )).subquery()
+            return select(func.min(bounds.c.first), func.max(bounds.c["last"]))
+        return select(func.min(Sale.date), func.max(Sale.date)).where(*cls._date_filters(Sale.date, start_date, end_date))
+
+    def summarize_sales(self, period="day", start_date=None, end_date=None):
+        """Return (period, sale_count, revenue, average_sale) tuples, rolled up from the daily totals."""
+        return [tuple(row) for row in self.session.execute(self._sales_summary_query(period, start_date, end_date))]
+
+    def summarize_expenses(self, group_by="category", start_date=None, end_date=None):
+        """
+        Return (key, expense_count, total, average_expense) tuples, where key is the
+        expense category or a period bucket ("day", "week" or "month").
+        """
+        return [tuple(row) for row in self.session.execute(self._expense_summary_query(group_by, start_date, end_date))]
+
+    def summarize_profit(self, period="month", start_date=None, end_date=None):
+        """Return (period, revenue, expenses, net_profit) tuples, rolled up from the daily totals."""
+        return [tuple(row) for row in self.session.execute(self._profit_query(period, start_date, end_date))]
+
+    def best_sellers(self, start_date=None, end_date=None, limit=10, inventory_id=None, include_archive=False):
+        """
+        Return (inventory_id, item_name, units_sold, revenue) tuples ranked by units sold,
+        computed from sale lines in one grouped statement. Pass inventory_id to get a single item's totals.
+        """
+        archives = self._attach_archives(start_date, end_date) if include_archive else ()
+        query = self._best_sellers_query(start_date, end_date, limit, inventory_id, archives)
+        return [tuple(row) for row in self.session.execute(query)]
+
+    def get_sales_date_bounds(self, start_date=None, end_date=None, include_archive=False):
+        """Return the (first, last) sale dates within an optional range."""
+        archives = self._attach_archives(start_date, end_date) if include_archive else ()
+        return tuple(self.session.execute(self._sales_date_bounds_query(start_date, end_date, archives)).one())
+
+    # Change feed (see changes.py)
+    CHANGES_PAGE_SIZE = 1000
+
+    @staticmethod
+    def _changes_query(seq, limit, entity=None):
+        """Up to `limit` change log entries after `seq`, oldest first, of one table if `entity` is given."""
+        query = select(*CHANGE_ENTRY_COLUMNS).where(Change.seq > seq)
+        if entity is not None:
+            query = query.where(Change.entity == entity)
+        return query.order_by(Change.seq).limit(limit)
+
+    @staticmethod
+    def _change_log_head_query():
+        """The seq of the latest change log entry, or of the latest removed one; 0 for an empty log."""
+        latest = select(func.max(Change.seq)).scalar_subquery()
+        return select(func.max(func.coalesce(latest, 0), func.coalesce(PRUNED_THROUGH, 0)))
+
+    def changes_since(self, seq=0, limit=CHANGES_PAGE_SIZE, entity=None):
+        """
+        Return up to `limit` ChangeEntry tuples committed after `seq`, oldest first (of the
+        `entity` table only, if given). Pass the seq of the last one to get the next page.
+        Raises CursorExpiredError if entries after `seq` were removed by retention.
+        """
+        rows = self.session.execute(self._changes_query(seq, limit, entity)).all()
+        return change_entries(rows, self.session.scalar(select(PRUNED_THROUGH)), seq)
 
+    def change_log_head(self):
+        """The seq to follow the change log from after reading the current state; see changes.py."""
+        return self.session.scalar(self._change_log_head_query())
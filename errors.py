@@ -0,0 +1,36 @@
+"""
+Exceptions raised by the data access and business logic layers. They carry a
+user-facing message; the presentation layer (or any other caller) decides how to report them.
+"""
+
+
+class CafeError(Exception):
+    """Base class for expected failures of a café operation."""
+
+
+class ValidationError(CafeError, ValueError):
+    """The input breaks a business rule (missing field, bad date, negative amount, ...)."""
+
+
+class NotFoundError(CafeError):
+    """The referenced user or inventory item does not exist."""
+
+
+class DuplicateError(CafeError):
+    """A unique value (username, email, item name) is already taken."""
+
+
+class InsufficientStockError(CafeError):
+    """There is not enough stock to complete a sale."""
+
+
+class AuthenticationError(CafeError):
+    """Unknown user or wrong password."""
+
+
+class PermissionDeniedError(CafeError):
+    """The user's role does not allow the operation."""
+
+
+class CursorExpiredError(CafeError):
+    """Change log entries after the given cursor have been removed; the reader must start over."""
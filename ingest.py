@@ -0,0 +1,140 @@
+"""
+Queued sale ingestion with group commit.
+
+    writer = SaleWriter(engine).start()
+    future = writer.submit(lines, date, items_sold)  # From any thread
+    sale = future.result()                           # Returns once the sale is committed
+    writer.close()                                   # Commits everything queued, then stops
+
+SQLite has a single write lock and every commit pays for a WAL append (and an fsync under
+the "durable" profile), so tills committing one sale each mostly wait for one another.
+A SaleWriter owns the only writing session: one thread takes sales off a queue and checks
+them out with DataAccessLayer.checkout_many, up to `max_batch` per commit, waiting at most
+`max_delay` seconds for a batch to fill. BusinessLogic(dal, sale_writer=writer) sends its
+checkouts through the writer.
+
+A sale's future resolves only after its transaction has committed, with the Sale or with
+the error (e.g. InsufficientStockError) that kept it out. close() stops accepting sales and
+returns once every queued sale has been committed; it also runs at interpreter exit.
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from dal import DataAccessLayer
+
+_STOP = object()
+
+
+class SaleWriter:
+    def __init__(self, engine=None, max_batch=200, max_delay=0.002, db_url=None):
+        self.dal = DataAccessLayer(engine, db_url=db_url)
+        # Sales are handed to the submitting threads after commit, so they must not need a reload
+        self.dal.session.expire_on_commit = False
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._sales = self._batches = 0
+
+    def start(self):
+        """Start the writer thread. Returns the writer."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SaleWriter is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sale-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, lines, date, items_sold):
+        """
+        Queue a sale of (inventory_id, quantity, unit_price) lines. Returns a Future that
+        resolves to the committed Sale or raises the error that kept it out.
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None or self._closed:
+                raise RuntimeError("SaleWriter is not running.")
+            self._queue.put(((lines, date, items_sold), future))
+        return future
+
+    def flush(self):
+        """Wait until every sale submitted so far has been committed (or rejected)."""
+        barrier = Future()
+        with self._lock:
+            if self._thread is None or self._closed:
+                return
+            self._queue.put((None, barrier))
+        barrier.result()
+
+    def close(self):
+        """Stop accepting sales, commit everything already queued and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._thread is not None:
+                self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join()
+        atexit.unregister(self.close)
+        self.dal.close()
+
+    def stats(self):
+        """Sales committed or rejected, commits made and sales still queued."""
+        return {
+            "sales": self._sales,
+            "batches": self._batches,
+            "average_batch": self._sales / self._batches if self._batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch and batch[-1] is not _STOP:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                stopping = True
+            self._commit(batch)
+
+    def _commit(self, batch):
+        """Check out the queued orders of `batch` in one transaction and resolve every future in it."""
+        # Sales cancelled by their caller while queued are dropped here
+        entries = [
+            (order, future) for order, future in batch
+            if order is not None and future.set_running_or_notify_cancel()
+        ]
+        if entries:
+            try:
+                outcomes = self.dal.checkout_many([order for order, _ in entries])
+            except Exception as e:
+                outcomes = [e] * len(entries)
+            self._sales += len(entries)
+            self._batches += 1
+            for (_, future), outcome in zip(entries, outcomes):
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+        for order, future in batch:
+            if order is None:
+                future.set_result(None)
@@ -0,0 +1,221 @@
+"""
+Lightweight in-process instrumentation for the data access layer.
+
+`Metrics.instrument_class` wraps every public method of a class (plain, generator,
+coroutine or async generator) to record call counts, errors, a latency histogram and the
+number of rows returned. `Metrics.instrument_engine` counts the SQL statements an engine
+(sync or async) executes and attributes them to the instrumented method that issued them.
+Read the numbers with `metrics.snapshot()` or `metrics.render()`.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from collections import defaultdict
+
+# Upper bounds (milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, float("inf"))
+
+
+class MethodStats:
+    __slots__ = ("calls", "errors", "total_seconds", "max_seconds", "rows", "statements", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.statements = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+
+def count_rows(result):
+    """Rows a call returned: the length of a list/dict/set, 0 for None, otherwise 1 (a single row or object)."""
+    if result is None:
+        return 0
+    if isinstance(result, (list, dict, set)):
+        return len(result)
+    return 1
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = defaultdict(MethodStats)
+        # The instrumented method currently running; a context variable so that both threads
+        # and interleaved asyncio tasks each see their own
+        self._current = contextvars.ContextVar("metrics_method", default=None)
+        self.statements = 0
+
+    def record_call(self, name, seconds, rows=0, error=False):
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            stats = self._methods[name]
+            stats.calls += 1
+            stats.errors += error
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.rows += rows
+            stats.buckets[next(i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound)] += 1
+
+    def record_statement(self, *args):
+        current = self._current.get()
+        with self._lock:
+            self.statements += 1
+            if current:
+                self._methods[current].statements += 1
+
+    def _enter(self, name):
+        return self._current.set(name)
+
+    def _exit(self, token):
+        self._current.reset(token)
+
+    def instrument(self, name, func):
+        """Wrap a function so each call is timed and counted under `name`."""
+        if inspect.iscoroutinefunction(func):
+            return self._instrument_coroutine(name, func)
+        if inspect.isasyncgenfunction(func):
+            return self._instrument_async_generator(name, func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = self._enter(name)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.record_call(name, time.perf_counter() - start, error=True)
+                raise
+            finally:
+                self._exit(token)
+            if inspect.isgenerator(result):
+                return self._instrument_generator(name, result, time.perf_counter() - start)
+            self.record_call(name, time.perf_counter() - start, count_rows(result))
+            return result
+        return wrapper
+
+    def _instrument_generator(self, name, generator, elapsed):
+        """Time only the work done inside the generator and count the rows it yields."""
+        rows = 0
+        error = False
+        try:
+            while True:
+                token = self._enter(name)
+                start = time.perf_counter()
+                try:
+                    row = next(generator)
+                except StopIteration:
+                    return
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    elapsed += time.perf_counter() - start
+                    self._exit(token)
+                rows += 1
+                yield row
+        finally:
+            generator.close()
+            self.record_call(name, elapsed, rows, error)
+
+    def _instrument_coroutine(self, name, func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = self._enter(name)
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                self.record_call(name, time.perf_counter() - start, error=True)
+                raise
+            finally:
+                self._exit(token)
+            self.record_call(name, time.perf_counter() - start, count_rows(result))
+            return result
+        return wrapper
+
+    def _instrument_async_generator(self, name, func):
+        """Like _instrument_generator, but wall time includes the awaits between rows of one fetch."""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            elapsed = 0.0
+            rows = 0
+            error = False
+            try:
+                while True:
+                    token = self._enter(name)
+                    start = time.perf_counter()
+                    try:
+                        row = await generator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    except Exception:
+                        error = True
+                        raise
+                    finally:
+                        elapsed += time.perf_counter() - start
+                        self._exit(token)
+                    rows += 1
+                    yield row
+            finally:
+                await generator.aclose()
+                self.record_call(name, elapsed, rows, error)
+        return wrapper
+
+    def instrument_class(self, cls):
+        """Class decorator: instrument every public method, recorded as "ClassName.method"."""
+        for attr_name, attr in list(vars(cls).items()):
+            if not attr_name.startswith("_") and inspect.isfunction(attr):
+                setattr(cls, attr_name, self.instrument(f"{cls.__name__}.{attr_name}", attr))
+        return cls
+
+    def instrument_engine(self, engine):
+        """Count every SQL statement (an executemany counts once) sent through `engine`."""
+        from sqlalchemy import event
+
+        # An AsyncEngine delivers its events through the sync Engine it wraps
+        event.listen(getattr(engine, "sync_engine", engine), "before_cursor_execute", self.record_statement)
+
+    def snapshot(self):
+        """Return {"statements": n, "methods": {name: {...}}} as plain data."""
+        with self._lock:
+            methods = {
+                name: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "total_ms": stats.total_seconds * 1000,
+                    "avg_ms": stats.total_seconds * 1000 / stats.calls if stats.calls else 0.0,
+                    "max_ms": stats.max_seconds * 1000,
+                    "rows": stats.rows,
+                    "statements": stats.statements,
+                    "latency_histogram": dict(zip((f"<={bound}ms" for bound in LATENCY_BUCKETS_MS), stats.buckets)),
+                }
+                for name, stats in sorted(self._methods.items())
+            }
+            return {"statements": self.statements, "methods": methods}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self.statements = 0
+
+    def render(self):
+        """Format the current numbers as a text table."""
+        snapshot = self.snapshot()
+        lines = [f"{'Method':<40} {'Calls':>7} {'Errors':>6} {'Avg ms':>8} {'Max ms':>8} {'Rows':>8} {'SQL':>6}  Latency histogram"]
+        for name, stats in snapshot["methods"].items():
+            histogram = " ".join(f"{bucket}:{count}" for bucket, count in stats["latency_histogram"].items() if count)
+            lines.append(
+                f"{name:<40} {stats['calls']:>7} {stats['errors']:>6} {stats['avg_ms']:>8.2f} "
+                f"{stats['max_ms']:>8.2f} {stats['rows']:>8} {stats['statements']:>6}  {histogram}"
+            )
+        lines.append(f"Total SQL statements: {snapshot['statements']}")
+        return "\n".join(lines)
+
+
+# Process-wide registry used by the data access layer
+metrics = Metrics()
@@ -0,0 +1,415 @@
+"""
+Versioned schema migrations for the café database.
+
+`Base.metadata.create_all` only creates missing tables, so anything added to an
+existing table later (columns, indexes, backfills) is applied here. The applied version is
+kept in SQLite's `PRAGMA user_version`, which only ever moves forward. Each step takes
+SQLite's write lock (BEGIN IMMEDIATE) and re-reads the version first, so when several
+processes start at once, one applies it and the others wait, then skip it. Migration 5
+multiplies amounts by 100 and is not idempotent: it runs as one transaction, committed
+together with its version. The others are idempotent; the batched backfills (1 and 3)
+commit as they go, so they can also run in two processes at once, and a run interrupted
+halfway is simply repeated on the next startup.
+
+Run `python migrations.py [db_url]` to migrate a database (default: $CAFE_DB_URL or
+cafe_management.db) and check that the report range queries are served by indexes
+(via EXPLAIN QUERY PLAN). `--check-daily-totals` also compares the daily_totals summary
+table with the raw rows, and `--rebuild-daily-totals` recomputes it. Days before the
+archive watermark (see archive.py) are left out of both: their rows are no longer all here.
+"""
+import argparse
+import math
+import sys
+import time
+from datetime import timedelta
+
+from sqlalchemy import Float, MetaData, column, delete, exists, func, insert, literal, or_, select, table, type_coerce
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateTable
+
+from models import (Archive, Base, DailyTotal, Expense, Inventory, Sale, SaleLine, SALES_TOTALS_CATEGORY, SEARCH_INDEXES,
+                    parse_items_sold)
+
+
+MIGRATION_LOCK_TIMEOUT = 600  # Seconds to wait for another process's migration step before giving up
+
+
+def begin_immediate(connection):
+    """
+    Take SQLite's write lock now rather than at the first write, so what is read next can't
+    change before it is written back; a no-op if the connection's transaction already has it.
+    """
+    # The driver's own connection: sqlite3's, or aiosqlite's (which has the same flag) under AsyncConnection.run_sync
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def backfill_sale_lines(connection, batch_size=1000):
+    """
+    Create SaleLine rows for sales recorded before line items existed by parsing
+    their items_sold strings. Sales are processed in id order, one transaction per
+    batch, so the job holds the write lock only briefly and can resume where it stopped.
+    Returns the number of sale lines created.
+
+    This runs before money columns hold cents (migration 5), so amounts are read and
+    written as stored, bypassing the Money type.
+    """
+    created = 0
+    last_id = 0
+    items = {
+        name: (item_id, cost)
+        for item_id, name, cost in connection.execute(
+            select(Inventory.id, Inventory.item_name, type_coerce(Inventory.cost, Float))
+        )
+    }
+    raw_sale_lines = table("sale_lines", column("sale_id"), column("inventory_id"), column("quantity"), column("unit_price"))
+    while True:
+        lock_for_migration(connection)  # Another process backfilling can't fill the same sales in between
+        batch = connection.execute(
+            select(Sale.id, type_coerce(Sale.amount, Float), Sale.items_sold)
+            .where(Sale.id > last_id, ~exists().where(SaleLine.sale_id == Sale.id))
+            .order_by(Sale.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+
+        lines = []
+        for sale_id, amount, items_sold in batch:
+            parsed = [(items[name], quantity) for name, quantity in parse_items_sold(items_sold) if name in items]
+            for (item_id, cost), quantity in parsed:
+                # A single-item sale tells us the price actually charged; otherwise fall back to list cost
+                unit_price = amount / quantity if len(parsed) == 1 and quantity else cost
+                lines.append(
+                    {"sale_id": sale_id, "inventory_id": item_id, "quantity": quantity, "unit_price": unit_price}
+                )
+        if lines:
+            connection.execute(insert(raw_sale_lines), lines)
+        connection.commit()
+        created += len(lines)
+        last_id = batch[-1][0]
+    return created
+
+
+def create_report_indexes(connection):
+    """Add the date/category indexes to expenses and sales tables created before they existed."""
+    for table in (Expense.__table__, Sale.__table__):
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def add_reorder_thresholds(connection):
+    """Add inventory.reorder_threshold (0 for existing items) and its low-stock index to older databases."""
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(inventory)")}
+    if "reorder_threshold" not in columns:
+        connection.exec_driver_sql("ALTER TABLE inventory ADD COLUMN reorder_threshold INTEGER NOT NULL DEFAULT 0")
+    for index in Inventory.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+# Money columns stored as REAL before amounts were kept in integer cents
+MONEY_COLUMNS = {
+    Expense.__table__: ("amount",),
+    Inventory.__table__: ("cost",),
+    Sale.__table__: ("amount",),
+    SaleLine.__table__: ("unit_price",),
+    DailyTotal.__table__: ("revenue", "expense_total"),
+}
+
+
+def convert_money_to_cents(connection):
+    """
+    Store every money column as INTEGER cents. Until this migration all amounts are held
+    in currency units (including those written by the migrations above), so each column
+    is multiplied by 100 exactly once: the whole conversion is one transaction, committed
+    together with the new schema version. SQLite can't change a column's type in place, so
+    tables still declaring REAL columns are copied into a new table that then takes their
+    name (and gets its indexes back); tables created with INTEGER columns are updated in place.
+    """
+    # A copy of the whole schema, so that the staging tables' foreign keys resolve
+    schema = MetaData()
+    for model_table in Base.metadata.sorted_tables:
+        model_table.to_metadata(schema)
+
+    begin_immediate(connection)  # pysqlite only opens transactions before DML; the DDL must be inside it
+    for model_table, money_columns in MONEY_COLUMNS.items():
+        name = model_table.name
+        types = {row[1]: row[2].upper() for row in connection.exec_driver_sql(f"PRAGMA table_info({name})")}
+        if all(types.get(money_column) == "INTEGER" for money_column in money_columns):
+            assignments = ", ".join(f"{c} = CAST(ROUND({c} * 100) AS INTEGER)" for c in money_columns)
+            connection.exec_driver_sql(f"UPDATE {name} SET {assignments}")
+            continue
+        staging = model_table.to_metadata(schema, name=f"_new_{name}")
+        connection.execute(CreateTable(staging))
+        columns = [model_column.name for model_column in model_table.columns]
+        values = [f"CAST(ROUND({c} * 100) AS INTEGER)" if c in money_columns else c for c in columns]
+        connection.exec_driver_sql(
+            f"INSERT INTO {staging.name} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {name}"
+        )
+        connection.exec_driver_sql(f"DROP TABLE {name}")
+        connection.exec_driver_sql(f"ALTER TABLE {staging.name} RENAME TO {name}")
+        for index in model_table.indexes:
+            index.create(connection)
+
+
+def create_search_indexes(connection):
+    """
+    Create the FTS5 search indexes (see models.SEARCH_INDEXES) and build them from the rows
+    already there. Triggers keep them in step with updates and deletes. New rows are added by
+    the DAL with one INSERT ... SELECT per transaction instead: FTS5 writes its pending terms
+    out at the end of every statement, so a per-row insert trigger would leave a segment per
+    row and make bulk imports several times slower. Also adds the case-insensitive item name index.
+    """
+    for index in Inventory.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    for fts, (content, text_column) in SEARCH_INDEXES.items():
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({text_column}, content='{content}', "
+            f"content_rowid='id', tokenize='trigram')"
+        )
+        add = f"INSERT INTO {fts}(rowid, {text_column}) VALUES (new.id, new.{text_column});"
+        remove = f"INSERT INTO {fts}({fts}, rowid, {text_column}) VALUES ('delete', old.id, old.{text_column});"
+        connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {content} BEGIN {remove} END")
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {text_column} ON {content} BEGIN {remove} {add} END"
+        )
+        connection.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+DAILY_TOTAL_COLUMNS = ["date", "category", "revenue", "sale_count", "expense_total", "expense_count"]
+
+
+def daily_totals_from_raw(start_date=None, end_date=None):
+    """The (sales, expenses) SELECTs that compute daily_totals rows from the raw tables, optionally for a date range."""
+    def in_range(column):
+        return ([column >= start_date] if start_date else []) + ([column <= end_date] if end_date else [])
+
+    sales = (
+        select(Sale.date, literal(SALES_TOTALS_CATEGORY), func.sum(Sale.amount), func.count(), literal(0), literal(0))
+        .where(*in_range(Sale.date))
+        .group_by(Sale.date)
+    )
+    expenses = (
+        select(Expense.date, Expense.category, literal(0), literal(0), func.sum(Expense.amount), func.count())
+        .where(*in_range(Expense.date))
+        .group_by(Expense.date, Expense.category)
+    )
+    return sales, expenses
+
+
+def archived_before(connection):
+    """The archive watermark: rows dated before it may have been moved to archive files (None if none were)."""
+    return connection.execute(select(func.max(Archive.archived_before))).scalar()
+
+
+def rebuild_daily_totals(connection, chunk_days=31):
+    """
+    Recompute the daily_totals table from sales and expenses, `chunk_days` days per
+    transaction, so the write lock is only held briefly. Each chunk is replaced atomically,
+    which keeps the table consistent even while tills keep writing. Archived days keep
+    the totals they have. Returns the number of daily_totals rows written.
+    """
+    watermark = archived_before(connection)
+    kept = [DailyTotal.date >= watermark] if watermark else []
+    bounds = [
+        connection.execute(select(func.min(model.date), func.max(model.date)).where(
+            *([model.date >= watermark] if watermark else []))).one()
+        for model in (Sale, Expense)
+    ]
+    firsts = [first for first, _ in bounds if first]
+    lasts = [last for _, last in bounds if last]
+    if not firsts:
+        lock_for_migration(connection)
+        connection.execute(delete(DailyTotal).where(*kept))
+        connection.commit()
+        return 0
+    first, last = min(firsts), max(lasts)
+    lock_for_migration(connection)  # Waits out a long migration step in another process instead of failing
+    connection.execute(delete(DailyTotal).where(or_(DailyTotal.date < first, DailyTotal.date > last), *kept))
+    connection.commit()
+
+    written = 0
+    start = first
+    while start <= last:
+        end = min(start + timedelta(days=chunk_days - 1), last)
+        lock_for_migration(connection)
+        connection.execute(delete(DailyTotal).where(DailyTotal.date.between(start, end)))
+        for query in daily_totals_from_raw(start, end):
+            written += connection.execute(insert(DailyTotal).from_select(DAILY_TOTAL_COLUMNS, query)).rowcount
+        connection.commit()
+        start = end + timedelta(days=1)
+    return written
+
+
+def check_daily_totals(connection, tolerance=1e-6):
+    """
+    Compare daily_totals with totals recomputed from the raw rows. Returns a list of
+    (date, category, expected, actual) mismatches, where expected/actual are
+    (revenue, sale_count, expense_total, expense_count) tuples.
+    """
+    watermark = archived_before(connection)
+    expected = {}
+    for query in daily_totals_from_raw(watermark):
+        for day, category, *values in connection.execute(query):
+            expected[(day, category)] = tuple(values)
+    totals = select(*(DailyTotal.__table__.c[name] for name in DAILY_TOTAL_COLUMNS))
+    actual = {
+        (day, category): tuple(values)
+        for day, category, *values in connection.execute(totals.where(*([DailyTotal.date >= watermark] if watermark else [])))
+    }
+    empty = (0.0, 0, 0.0, 0)
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        want, got = expected.get(key, empty), actual.get(key, empty)
+        if want[1] != got[1] or want[3] != got[3] or not all(
+            math.isclose(want[i], got[i], abs_tol=tolerance) for i in (0, 2)
+        ):
+            mismatches.append((*key, want, got))
+    return mismatches
+
+
+# (version, migration) pairs, applied in order. Append new entries; never renumber.
+MIGRATIONS = [
+    (1, backfill_sale_lines),
+    (2, create_report_indexes),
+    (3, rebuild_daily_totals),
+    (4, add_reorder_thresholds),
+    (5, convert_money_to_cents),
+    (6, create_search_indexes),
+]
+
+
+def get_schema_version(connection):
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def lock_for_migration(connection, timeout=MIGRATION_LOCK_TIMEOUT):
+    """begin_immediate, waiting up to `timeout` seconds for another process's migration step to finish."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return begin_immediate(connection)
+        except OperationalError as e:
+            connection.rollback()
+            if "locked" not in str(e) or time.monotonic() > deadline:
+                raise
+
+
+def migrate(connection):
+    """Apply every migration newer than the database's schema version on `connection`. Returns the resulting version."""
+    version = get_schema_version(connection)
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        lock_for_migration(connection)
+        if target > get_schema_version(connection):  # Another process may have applied it while this one waited
+            migration(connection)
+            # The batched steps commit as they go, so re-lock: the version must never move backwards
+            lock_for_migration(connection)
+            if target > get_schema_version(connection):
+                connection.exec_driver_sql(f"PRAGMA user_version = {target}")
+        version = get_schema_version(connection)
+        connection.commit()
+    return version
+
+
+def create_and_migrate(connection):
+    """
+    Create any missing tables and bring the database up to the current schema version on
+    `connection`. Returns the resulting version. Both startup paths run this: models.init_db,
+    and async_dal.init_async_db through AsyncConnection.run_sync.
+    """
+    lock_for_migration(connection)  # Two processes creating the same table at once would fail
+    Base.metadata.create_all(connection)
+    connection.commit()
+    return migrate(connection)
+
+
+def run_migrations(engine):
+    """Bring the database behind `engine` up to the current schema version (see create_and_migrate)."""
+    with engine.connect() as connection:
+        return create_and_migrate(connection)
+
+
+# Representative report queries and the index each one is expected to use
+QUERY_PLAN_CHECKS = [
+    ("expenses by date range",
+     "SELECT date, amount FROM expenses WHERE date BETWEEN '2024-01-01' AND '2024-12-31'",
+     "ix_expenses_date_category"),
+    ("expenses by category and date range",
+     "SELECT SUM(amount) FROM expenses WHERE category = 'Food' AND date >= '2024-01-01'",
+     "ix_expenses_category_date"),
+    ("expense totals per category",
+     "SELECT category, COUNT(*), SUM(amount) FROM expenses WHERE date >= '2024-01-01' GROUP BY category",
+     "ix_expenses_"),
+    ("sales by date range",
+     "SELECT date, amount FROM sales WHERE date BETWEEN '2024-01-01' AND '2024-12-31'",
+     "ix_sales_date"),
+    ("sales per day",
+     "SELECT strftime('%Y-%m-%d', date), COUNT(*), SUM(amount) FROM sales "
+     "WHERE date >= '2024-01-01' GROUP BY 1",
+     "ix_sales_date"),
+    ("daily totals by date range",
+     "SELECT date, SUM(revenue), SUM(expense_total) FROM daily_totals WHERE date BETWEEN '2024-01-01' AND '2024-12-31' "
+     "GROUP BY date",
+     "sqlite_autoindex_daily_totals_1"),
+    ("items at or below their reorder threshold",
+     "SELECT id, item_name, quantity, reorder_threshold FROM inventory WHERE quantity <= reorder_threshold",
+     "ix_inventory_reorder"),
+    ("units sold per item since a date",
+     "SELECT inventory_id, SUM(quantity) FROM sale_lines "
+     "WHERE sale_id IN (SELECT id FROM sales WHERE date >= '2024-01-01') GROUP BY inventory_id",
+     "ix_sales_date"),
+    ("inventory items by name prefix",
+     "SELECT id, item_name FROM inventory WHERE item_name LIKE 'esp%'",
+     "ix_inventory_name_nocase"),
+    ("units sold per item",
+     "SELECT inventory_id, SUM(quantity) FROM sale_lines WHERE inventory_id = 1",
+     "ix_sale_lines_inventory"),
+]
+
+
+def explain_query_plan(connection, sql):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement."""
+    return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def check_query_plans(engine):
+    """
+    Run EXPLAIN QUERY PLAN for each report query and return a list of
+    (name, plan) pairs for the ones that don't use the expected index.
+    """
+    failures = []
+    with engine.connect() as connection:
+        for name, sql, index_name in QUERY_PLAN_CHECKS:
+            plan = explain_query_plan(connection, sql)
+            if not any("USING" in line and index_name in line for line in plan):
+                failures.append((name, plan))
+    return failures
+
+
+if __name__ == "__main__":
+    from models import get_db_url, init_db
+
+    parser = argparse.ArgumentParser(description="Migrate the café database and check its report indexes")
+    parser.add_argument("db_url", nargs="?", help="SQLAlchemy database URL")
+    parser.add_argument("--rebuild-daily-totals", action="store_true", help="recompute the daily_totals table")
+    parser.add_argument("--check-daily-totals", action="store_true", help="compare daily_totals with the raw rows")
+    args = parser.parse_args()
+
+    engine = init_db(args.db_url or get_db_url())
+    with engine.connect() as connection:
+        print(f"Schema version: {get_schema_version(connection)}")
+        if args.rebuild_daily_totals:
+            print(f"Rebuilt daily_totals: {rebuild_daily_totals(connection)} row(s).")
+        mismatches = check_daily_totals(connection) if args.check_daily_totals else []
+    for day, category, expected, actual in mismatches[:20]:
+        print(f"daily_totals mismatch on {day} {category or '(sales)'}: expected {expected}, found {actual}")
+    if args.check_daily_totals and not mismatches:
+        print("daily_totals matches the raw sales and expenses.")
+    failures = check_query_plans(engine)
+    for name, plan in failures:
+        print(f"Index not used for {name}: {' / '.join(plan)}")
+    if failures or mismatches:
+        sys.exit(1)
+    print("All report queries use their indexes.")
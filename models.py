@@ -1,9 +1,43 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date
+import os
+import re
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import create_engine, event, func, Column, Integer, String, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.types import TypeDecorator
+
+from metrics import metrics
 
 # Base for all models
 Base = declarative_base()
 
+def to_cents(amount):
+    """An amount of money (Decimal, int, float or numeric string) as integer cents, rounded half up."""
+    if isinstance(amount, float):
+        amount = repr(amount)  # The shortest decimal that round-trips: 0.1, not 0.1000000000000000055...
+    return int((Decimal(amount) * 100).to_integral_value(ROUND_HALF_UP))
+
+def from_cents(cents):
+    """Integer cents as a Decimal amount with two places (a non-integer, e.g. an average, is rounded half up, as in to_cents)."""
+    if not isinstance(cents, int):
+        cents = Decimal(repr(cents) if isinstance(cents, float) else cents).to_integral_value(ROUND_HALF_UP)
+    return Decimal(cents).scaleb(-2)
+
+class Money(TypeDecorator):
+    """
+    Money stored as integer cents, so SQL sums are exact. Python values are Decimal amounts
+    (12.50, not 1250); floats and numeric strings are accepted when writing.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_cents(value)
+
 # User Model
 class User(Base):
     __tablename__ = 'users'
@@ -18,9 +52,14 @@ class Expense(Base):
     __tablename__ = 'expenses'
     id = Column(Integer, primary_key=True, autoincrement=True)
     date = Column(Date, nullable=False)
-    amount = Column(Float, nullable=False)
+    amount = Column(Money, nullable=False)
     category = Column(String, nullable=False)
     description = Column(String, nullable=True)
+    __table_args__ = (
+        # Date-range and per-category reports; amount is included so the rollups are index-only
+        Index('ix_expenses_date_category', 'date', 'category', 'amount'),
+        Index('ix_expenses_category_date', 'category', 'date', 'amount'),
+    )
 
 # Inventory Model
 class Inventory(Base):
@@ -28,26 +67,211 @@ class Inventory(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     item_name = Column(String, nullable=False, unique=True)
     quantity = Column(Integer, nullable=False)
-    cost = Column(Float, nullable=False)
+    cost = Column(Money, nullable=False)
+    reorder_threshold = Column(Integer, nullable=False, default=0, server_default='0')  # Reorder at or below this stock level
+    __table_args__ = (
+        # Partial covering index over just the items at or below their threshold: the low-stock
+        # query reads only those entries, however large the catalogue is
+        Index('ix_inventory_reorder', 'quantity', 'reorder_threshold', 'item_name',
+              sqlite_where=quantity <= reorder_threshold),
+        # Case-insensitive name lookups: SQLite serves `item_name LIKE 'prefix%'` from this index
+        Index('ix_inventory_name_nocase', item_name.collate('NOCASE')),
+    )
 
 # Sales Model
 class Sale(Base):
     __tablename__ = 'sales'
     id = Column(Integer, primary_key=True, autoincrement=True)
     date = Column(Date, nullable=False)
-    amount = Column(Float, nullable=False)
-    items_sold = Column(String, nullable=False)  # Comma-separated list of items
+    amount = Column(Money, nullable=False)
+    items_sold = Column(String, nullable=False)  # Comma-separated "Item x Qty" summary; see SaleLine
+    __table_args__ = (
+        Index('ix_sales_date', 'date', 'amount'),
+    )
+
+# Sale Line Model (one row per item in a sale)
+class SaleLine(Base):
+    __tablename__ = 'sale_lines'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sale_id = Column(Integer, ForeignKey('sales.id'), nullable=False)
+    inventory_id = Column(Integer, ForeignKey('inventory.id'), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Money, nullable=False)
+    __table_args__ = (
+        # Covering indexes: per-sale lookups and per-item rollups never touch the table itself
+        Index('ix_sale_lines_sale', 'sale_id', 'inventory_id', 'quantity', 'unit_price'),
+        Index('ix_sale_lines_inventory', 'inventory_id', 'sale_id', 'quantity', 'unit_price'),
+    )
+
+# Daily Totals Model (one row per day and expense category, kept up to date by every write to sales
+# and expenses so that dashboards and summaries never rescan the raw tables)
+SALES_TOTALS_CATEGORY = ''  # The category of the row holding a day's sales
+
+class DailyTotal(Base):
+    __tablename__ = 'daily_totals'
+    date = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)  # Expense category, or SALES_TOTALS_CATEGORY
+    revenue = Column(Money, nullable=False, default=0)
+    sale_count = Column(Integer, nullable=False, default=0)
+    expense_total = Column(Money, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+# Archive Model (one row per year of sales, sale lines and expenses moved out of the database by
+# archive.py into a file of their own; daily_totals keeps covering the archived days)
+class Archive(Base):
+    __tablename__ = 'archives'
+    year = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)  # Relative to the directory of this database
+    archived_before = Column(Date, nullable=False)  # Rows of the year dated before this have been archived
+
+# Change Model (the change log: one entry per row that the DAL inserts, updates or deletes in
+# CHANGE_LOG_TABLES, written in the same transaction; see changes.py). seq is AUTOINCREMENT, so it is
+# never reused after entries are removed, and SQLite's single writer hands it out in commit order:
+# a reader that has seen every entry up to some seq can't miss a later one by committing late.
+CHANGE_LOG_TABLES = ('sales', 'expenses', 'inventory', 'users')
+
+class Change(Base):
+    __tablename__ = 'changes'
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    changed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())  # UTC
+    entity = Column(String, nullable=False)  # The table changed, one of CHANGE_LOG_TABLES
+    entity_id = Column(Integer, nullable=False)
+    operation = Column(String, nullable=False)  # 'insert', 'update' or 'delete'
+    data = Column(String, nullable=True)  # The row after the change as JSON, amounts in cents; NULL for a delete
+    __table_args__ = {'sqlite_autoincrement': True}
+
+# Change Trim Model (one row per run of changes.trim_changes; readers compare their cursor with the
+# highest pruned_through to tell whether entries they haven't seen were removed)
+class ChangeTrim(Base):
+    __tablename__ = 'change_trims'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    trimmed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())  # UTC
+    pruned_through = Column(Integer, nullable=False)  # Every entry up to this seq has been removed
+    compacted_through = Column(Integer, nullable=False)  # Up to here, only each row's latest entry is kept
+
+# Full-text search indexes: {FTS5 table: (content table, text column)}. The trigram tokenizer makes
+# any case-insensitive substring of three or more characters an index lookup. They are external
+# content tables (the text isn't stored twice): the DAL indexes new rows in the transaction that
+# inserts them, and triggers handle updates and deletes; see migrations.create_search_indexes.
+SEARCH_INDEXES = {
+    'expenses_fts': ('expenses', 'description'),
+    'sales_fts': ('sales', 'items_sold'),
+}
+
+ITEMS_SOLD_PATTERN = re.compile(r"^\s*(.+?)\s+x\s+(\d+)\s*$")
+
+def parse_items_sold(items_sold):
+    """
+    Split an items_sold string such as "Espresso x 2, Cake x 1" into (item_name, quantity) pairs.
+    Entries that don't follow the "Item x Qty" format are skipped.
+    """
+    lines = []
+    for entry in items_sold.split(","):
+        match = ITEMS_SOLD_PATTERN.match(entry)
+        if match:
+            lines.append((match.group(1), int(match.group(2))))
+    return lines
+
+# SQLite tuning presets, applied as PRAGMAs to every new connection.
+# Both use WAL so readers never block the writer (and vice versa).
+ENGINE_PROFILES = {
+    # Every commit is fsynced to the WAL before it returns: nothing acknowledged is lost on power failure.
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,  # Negative values are KiB, i.e. 16 MB of page cache
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,  # Milliseconds to wait for another writer before failing
+    },
+    # Commits skip the fsync and the WAL is synced at checkpoints. The database can't be corrupted,
+    # but a power cut (not an application crash) may roll back the last few commits.
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,  # Read through a 256 MB memory map instead of read() calls
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+DEFAULT_ENGINE_PROFILE = "fast"
+
+def apply_engine_profile(engine, profile):
+    """
+    Register a connect hook that applies a tuning profile (a name from ENGINE_PROFILES
+    or a dict of PRAGMA settings) to every connection the engine opens.
+    """
+    settings = ENGINE_PROFILES[profile] if isinstance(profile, str) else profile
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in settings.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
 
 # Initialize the database
-def init_db(db_path):
+def init_db(db_path, profile=DEFAULT_ENGINE_PROFILE, **engine_options):
     """
-    Creates the SQLite database and all tables if they don't exist.
+    Creates the SQLite database and all tables if they don't exist,
+    then brings an existing database up to the current schema version.
+    `profile` selects the connection tuning, see ENGINE_PROFILES; any other keyword
+    arguments (e.g. pool_size) are passed on to create_engine.
     """
-    engine = create_engine(db_path, echo=False)  # Set echo to True for debugging
-    Base.metadata.create_all(engine)
-    print("Database initialized successfully!")
+    from migrations import run_migrations
+
+    engine = create_engine(db_path, echo=False, **engine_options)  # Set echo to True for debugging
+    apply_engine_profile(engine, profile)
+    metrics.instrument_engine(engine)
+    run_migrations(engine)  # Also creates the tables
     return engine
 
+# Used when neither a URL nor the CAFE_DB_URL environment variable is given
+DEFAULT_DB_URL = 'sqlite:///cafe_management.db'
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_db_url():
+    """The database URL: $CAFE_DB_URL if set, otherwise cafe_management.db in the working directory."""
+    return os.environ.get("CAFE_DB_URL") or DEFAULT_DB_URL
+
+# One database file per café branch, in this directory unless $CAFE_BRANCH_DIR says otherwise; see branches.py
+DEFAULT_BRANCH_DIR = 'branches'
+BRANCH_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*$")  # Also the file name, so no path separators
+
+def get_branch_dir():
+    """The branch database directory: $CAFE_BRANCH_DIR if set, otherwise ./branches."""
+    return os.environ.get("CAFE_BRANCH_DIR") or DEFAULT_BRANCH_DIR
+
+def branch_db_url(branch, branch_dir=None, create=False):
+    """
+    The database URL of `branch`: <branch_dir>/<branch>.db (default directory: get_branch_dir()).
+    Raises NotFoundError if the branch has no database yet, unless `create` is set.
+    """
+    from errors import NotFoundError, ValidationError
+
+    if not BRANCH_NAME_PATTERN.match(branch or ""):
+        raise ValidationError("Branch names may only contain letters, digits, '-' and '_'.")
+    branch_dir = branch_dir or get_branch_dir()
+    path = os.path.join(branch_dir, branch + '.db')
+    if create:
+        os.makedirs(branch_dir, exist_ok=True)
+    elif not os.path.exists(path):
+        raise NotFoundError(f"Branch '{branch}' not found in {branch_dir}.")
+    return f"sqlite:///{path}"
+
+def get_engine(db_url=None):
+    """
+    Return the process-wide engine for `db_url` (default: get_db_url()). It is created,
+    and the schema created or migrated, by the first call for that URL, not at import time.
+    """
+    db_url = db_url or get_db_url()
+    with _engines_lock:
+        if db_url not in _engines:
+            _engines[db_url] = init_db(db_url)
+        return _engines[db_url]
+
 # For creating sessions (to be used in DAL)
 def get_session(engine):
     """
@@ -0,0 +1,95 @@
+"""
+Password hashing for user accounts.
+
+Passwords are stored as salted KDF hashes in a self-describing format, so the cost
+parameters can be raised later without invalidating existing rows:
+
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+(salt and hash are base64). Rows written before hashing was salted hold a bare sha256
+hex digest; they still verify, and `needs_rehash` reports them so the caller can store
+a KDF hash the next time the user logs in.
+
+The KDFs are deliberately slow and scrypt needs 16 MB per call, so hashing runs on a small
+worker pool (`HASH_POOL`). It bounds how many hashes run at once, and hashlib releases
+the GIL while hashing, so other threads and the event loop keep running.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Scheme used for new hashes: "scrypt" or "pbkdf2_sha256"
+DEFAULT_SCHEME = "scrypt"
+# scrypt cost: memory is 128 * n * r bytes (16 MB here)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+
+HASH_POOL = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="password-hash")
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode()
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p)
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+
+def hash_password(password, scheme=DEFAULT_SCHEME):
+    """Return the salted hash of `password` in the stored format."""
+    salt = os.urandom(SALT_BYTES)
+    if scheme == "scrypt":
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+    if scheme == "pbkdf2_sha256":
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64encode(salt)}${_b64encode(digest)}"
+    raise ValueError(f"Unknown password scheme '{scheme}'.")
+
+
+def verify_password(password, stored):
+    """Check `password` against a stored hash (any supported format), in constant time."""
+    if not stored:
+        return False
+    scheme, _, params = stored.partition("$")
+    try:
+        if scheme == "scrypt":
+            n, r, p, salt, digest = params.split("$")
+            computed = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+        elif scheme == "pbkdf2_sha256":
+            iterations, salt, digest = params.split("$")
+            computed = _pbkdf2(password, base64.b64decode(salt), int(iterations))
+        else:
+            # Legacy unsalted sha256 hex digest
+            return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+        return hmac.compare_digest(computed, base64.b64decode(digest))
+    except ValueError:
+        return False
+
+
+def needs_rehash(stored, scheme=DEFAULT_SCHEME):
+    """True if `stored` is a legacy hash or was made with other than the current scheme and cost."""
+    if scheme == "scrypt":
+        return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+    return not stored.startswith(f"pbkdf2_sha256${PBKDF2_ITERATIONS}$")
+
+
+def run_in_pool(func, *args):
+    """Run a hashing function on HASH_POOL and wait for the result."""
+    return HASH_POOL.submit(func, *args).result()
+
+
+async def run_in_pool_async(func, *args):
+    """Run a hashing function on HASH_POOL without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(HASH_POOL, func, *args)
@@ -1,21 +1,73 @@
-import hashlib
-from bll import BusinessLogic
+import argparse
+from errors import AuthenticationError, CafeError
+from metrics import metrics
+from tables import Column, render_table, terminal_page_size
+
+INVENTORY_COLUMNS = [
+    Column("id", "ID", align=">"),
+    Column("item_name", "Item Name"),
+    Column("quantity", "Available Quantity", align=">"),
+    Column("cost", "Cost", align=">"),
+]
+
+# (filter, prompt) pairs asked by input_filters; see BusinessLogic.view_expense_history and friends
+DATE_RANGE_PROMPTS = [("start_date", "Start date (YYYY-MM-DD)"), ("end_date", "End date (YYYY-MM-DD)")]
+AMOUNT_RANGE_PROMPTS = [("min_amount", "Minimum amount"), ("max_amount", "Maximum amount")]
+PAGING_PROMPTS = [("descending", "Largest/latest first? (y/n)"), ("limit", "Show at most N rows"),
+                  ("offset", "Skip the first N rows")]
+ARCHIVE_PROMPT = ("include_archive", "Include archived history? (y/n)")
+EXPENSE_FILTER_PROMPTS = (DATE_RANGE_PROMPTS + [("category", "Category")] + AMOUNT_RANGE_PROMPTS
+                          + [("search", "Description contains"), ("sort", "Sort by (id/date/amount/category)")]
+                          + PAGING_PROMPTS + [ARCHIVE_PROMPT])
+SALES_FILTER_PROMPTS = (DATE_RANGE_PROMPTS + AMOUNT_RANGE_PROMPTS
+                        + [("search", "Items sold contain"), ("sort", "Sort by (id/date/amount)")] + PAGING_PROMPTS
+                        + [ARCHIVE_PROMPT])
+INVENTORY_FILTER_PROMPTS = [("name_prefix", "Item name starts with"), ("name_contains", "Item name contains"),
+                            ("sort", "Sort by (id/item_name/quantity/cost)")] + PAGING_PROMPTS
 
 class PresentationLayer:
-    def __init__(self):
-        self.bll = BusinessLogic()
+    def __init__(self, db_url=None, branch=None):
+        # Imported here so that `--help` and argument errors don't pay for loading SQLAlchemy
+        from bll import BusinessLogic
+        from dal import DataAccessLayer
+
+        self.bll = BusinessLogic(DataAccessLayer(db_url=db_url, branch=branch))
         self.current_user = None
+        self.page_size = terminal_page_size()  # None when output isn't a terminal: no pager prompts
 
     def login(self):
         print("\n--- Login ---")
         username = input("Username: ")
         password = input("Password: ")
-        user = self.bll.authenticate_user(username, password)
-        if user:
-            self.current_user = user
-            print(f"Welcome, {self.current_user.username}!")
-        else:
+        try:
+            user = self.bll.authenticate_user(username, password)
+        except AuthenticationError as e:
+            print(f"Error: {e}")
             print("Login failed.")
+            return
+        print("Authentication successful.")
+        self.current_user = user
+        print(f"Welcome, {self.current_user.username}!")
+
+    @staticmethod
+    def attempt(action, *args, success=None):
+        """
+        Run a business operation and report its outcome: the error message if it
+        raised a CafeError, otherwise `success` (if given). Returns the operation's
+        result, or None if it failed.
+        """
+        try:
+            result = action(*args)
+        except CafeError as e:
+            print(f"Error: {e}")
+            return None
+        if success:
+            print(success)
+        return result
+
+    def show_table(self, rows, columns=None, empty="No data available."):
+        """Print rows as a table, a screenful at a time on a terminal; see tables.render_table."""
+        return render_table(rows, columns, page_size=self.page_size, empty=empty)
 
     def admin_menu(self):
         while True:
@@ -24,70 +76,53 @@ class PresentationLayer:
             print("2. Generate Reports")
             print("3. Manage Expenses")
             print("4. Manage Inventory")
-            print("5. Record Sales (Manual)")
-            print("6. Logout")
+            print("5. Manage Sales")
+            print("6. Performance Metrics")
+            print("7. Logout")
             choice = input("Enter your choice: ")
             if choice == "1":
                 self.manage_users()
             elif choice == "2":
-                self.generate_reports()
+                self.reports_menu()
             elif choice == "3":
                 self.manage_expenses()
             elif choice == "4":
                 self.manage_inventory()
             elif choice == "5":
-                self.record_sales()
+                self.manage_sales()
             elif choice == "6":
+                self.show_metrics()
+            elif choice == "7":
                 self.current_user = None
                 break
             else:
                 print("Invalid choice. Try again.")
 
+    def show_metrics(self):
+        """Print per-method call counts, latencies, rows and SQL statements, plus cache counters."""
+        print("\n--- Performance Metrics ---")
+        print(metrics.render())
+        cache = self.bll.inventory_cache_stats()
+        print(f"Inventory cache: {cache['hits']} hits, {cache['misses']} misses "
+              f"({cache['hit_rate']:.0%} hit rate), {cache['size']} items, version {cache['version']}")
+
     def user_menu(self):
         while True:
             print("\n--- User Menu ---")
             print("1. View Available items")
             print("2. Purchase Items")
-            print("3. Logout")
+            print("3. Cart")
+            print("4. Logout")
             choice = input("Enter your choice: ")
             if choice == "1":
-                inventory = self.bll.view_inventory()
-                if not inventory:
-                    print("\n--- Available Items ---\n")
-                    print("No items available at the moment.")
-                else:
-                    print("\n\n--- Available Items ---\n")
-
-                    # Define column headers
-                    headers = ["ID", "Item Name", "Available Quantity", "Cost"]
-
-                    # Calculate column widths dynamically
-                    column_widths = {
-                        "ID": max(len("ID"), max(len(str(item['id'])) for item in inventory)),
-                        "Item Name": max(len("Item Name"), max(len(item['item_name']) for item in inventory)),
-                        "Available Quantity": max(len("Available Quantity"),
-                                                  max(len(str(item['quantity'])) for item in inventory)),
-                        "Cost": max(len("Cost"), max(len(f"{item['cost']:.2f}") for item in inventory))
-                    }
-
-                    # Create a formatted header row
-                    header_row = " | ".join(f"{header:<{column_widths[header]}}" for header in headers)
-                    separator = "-+-".join("-" * column_widths[header] for header in headers)
-
-                    # Print the header and separator
-                    print(header_row)
-                    print(separator)
-
-                    # Print each inventory item
-                    for item in inventory:
-                        row = f"{item['id']:<{column_widths['ID']}} | " \
-                              f"{item['item_name']:<{column_widths['Item Name']}} | " \
-                              f"{item['quantity']:<{column_widths['Available Quantity']}} | " \
-                              f"{item['cost']:<{column_widths['Cost']}.2f}"
-                        print(row)
+                print("\n--- Available Items ---\n")
+                self.show_table(self.bll.view_inventory(), INVENTORY_COLUMNS, empty="No items available at the moment.")
             elif choice == "2":
                 self.purchase_item()
             elif choice == "3":
+                self.manage_cart()
+            elif choice == "4":
+                self.bll.cart.clear()
                 self.current_user = None
                 break
             else:
@@ -104,15 +139,16 @@ class PresentationLayer:
             choice = input("Enter your choice: ")
             if choice == "1":
                 username = input("Username: ")
-                password = hashlib.sha256(input("Password: ").encode()).hexdigest()
+                password = input("Password: ")
                 email = self.input_email()
                 role = input("Role (admin/user): ")
-                self.bll.register_user(username, password, email, role)
+                self.attempt(self.bll.register_user, username, password, email, role,
+                             success=f"User '{username}' added successfully.")
             elif choice == "2":
-                users = self.bll.view_all_users()
                 print("\n--- Registered Users ---")
-                for user in users:
-                    print(f"ID: {user['id']} | Username: {user['username']} | Email: {user['email']} | Role: {user['role']}")
+                self.show_table(self.bll.view_all_users(), [
+                    Column("id", "ID", align=">"), Column("username", "Username"), Column("email", "Email"), Column("role", "Role"),
+                ])
             elif choice == "3":
                 user_id = int(input("User ID: "))
                 updates = {}
@@ -122,13 +158,14 @@ class PresentationLayer:
                 email = self.input_email()
                 if email:
                     updates["email"] = email
-                password = hashlib.sha256(input("\nNote: Must provide new password otherwise it will be a null value (Just press enter while logging in)\n\nNew Password: ").encode()).hexdigest()
+                password = input("New Password (leave blank to skip): ")
                 if password:
                     updates["password"] = password
-                self.bll.update_user_info(user_id, updates)
+                self.attempt(self.bll.update_user_info, user_id, updates,
+                             success=f"User ID {user_id} updated successfully.")
             elif choice == "4":
                 user_id = int(input("User ID: "))
-                self.bll.delete_user(user_id)
+                self.attempt(self.bll.delete_user, user_id, success=f"User ID {user_id} deleted successfully.")
             elif choice == "5":
                 break
             else:
@@ -143,15 +180,21 @@ class PresentationLayer:
             choice = input("Enter your choice: ")
             if choice == "1":
                 date = input("Date (YYYY-MM-DD): ")
-                amount = float(input("Amount: "))
+                amount = input("Amount: ")
                 category = input("Category: ")
                 description = input("Description (optional): ")
-                self.bll.record_expense(date, amount, category, description)
+                self.attempt(self.bll.record_expense, date, amount, category, description,
+                             success="Expense added successfully.")
             elif choice == "2":
-                expenses = self.bll.view_expense_history()
+                filters = self.input_filters(EXPENSE_FILTER_PROMPTS)
+                expenses = self.attempt(lambda: self.bll.view_expense_history(**filters))
+                if expenses is None:
+                    continue
                 print("\n--- Expense History ---")
-                for expense in expenses:
-                    print(f"Date: {expense['date']} | Amount: {expense['amount']} | Category: {expense['category']} | Description: {expense['description']}")
+                self.show_table(expenses, [
+                    Column("date", "Date", 10), Column("amount", "Amount", align=">"), Column("category", "Category"),
+                    Column("description", "Description"),
+                ])
             elif choice == "3":
                 break
             else:
@@ -164,13 +207,16 @@ class PresentationLayer:
             print("2. Update Inventory Item")
             print("3. Delete Inventory Item")
             print("4. View Inventory")
-            print("5. Back")
+            print("5. Reorder List")
+            print("6. Back")
             choice = input("Enter your choice: ")
             if choice == "1":
                 item_name = input("Item Name: ")
                 quantity = int(input("Quantity: "))
-                cost = float(input("Cost: "))
-                self.bll.add_inventory_item(item_name, quantity, cost)
+                cost = input("Cost: ")
+                reorder_threshold = input("Reorder Threshold (leave blank for 0): ")
+                self.attempt(self.bll.add_inventory_item, item_name, quantity, cost, reorder_threshold,
+                             success=f"Inventory item '{item_name}' added successfully.")
             elif choice == "2":
                 item_id = int(input("Item ID: "))
                 updates = {}
@@ -183,26 +229,127 @@ class PresentationLayer:
                 cost = input("New Cost (leave blank to skip): ")
                 if cost:
                     updates["cost"] = float(cost)
-                self.bll.update_inventory_item(item_id, updates)
+                reorder_threshold = input("New Reorder Threshold (leave blank to skip): ")
+                if reorder_threshold:
+                    updates["reorder_threshold"] = int(reorder_threshold)
+                self.attempt(self.bll.update_inventory_item, item_id, updates,
+                             success=f"Inventory item ID {item_id} updated successfully.")
             elif choice == "3":
                 item_id = int(input("Item ID: "))
-                self.bll.delete_inventory_item(item_id)
+                self.attempt(self.bll.delete_inventory_item, item_id,
+                             success=f"Inventory item ID {item_id} deleted successfully.")
             elif choice == "4":
-                inventory = self.bll.view_inventory()
+                filters = self.input_filters(INVENTORY_FILTER_PROMPTS)
+                inventory = self.attempt(lambda: self.bll.view_inventory(**filters))
+                if inventory is None:
+                    continue
                 print("\n--- Inventory ---")
-                for item in inventory:
-                    print(f"ID: {item['id']} | Item Name: {item['item_name']} | Available Quantity: {item['quantity']} | Cost: {item['cost']}")
+                self.show_table(inventory, INVENTORY_COLUMNS + [Column("reorder_threshold", "Reorder At", align=">")])
             elif choice == "5":
+                self.show_reorder_list()
+            elif choice == "6":
                 break
             else:
                 print("Invalid choice. Try again.")
 
+    def show_reorder_list(self):
+        window_days = input("Days of sales to measure velocity over (leave blank for 28): ") or 28
+        suggestions = self.attempt(self.bll.reorder_suggestions, window_days)
+        if suggestions is None:
+            return
+        print("\n--- Reorder List (most urgent first) ---")
+        self.show_table(
+            (
+                (entry["id"], entry["item_name"], entry["quantity"], entry["reorder_threshold"], entry["units_per_day"],
+                 "no recent sales" if entry["days_left"] is None else f"{entry['days_left']:.1f}", entry["suggested_order"])
+                for entry in suggestions
+            ),
+            [Column(0, "ID", align=">"), Column(1, "Item Name"), Column(2, "Stock", align=">"),
+             Column(3, "Reorder At", align=">"), Column(4, "Units/Day", align=">"), Column(5, "Days Left", align=">"),
+             Column(6, "Order", align=">")],
+            empty="Nothing needs reordering.",
+        )
+
     def purchase_item(self):
         """Handle the purchase process for the user."""
         print("\n--- Purchase Item ---")
         item_id = int(input("Enter the ID of the item to purchase (Check ID from Available Items): "))
         quantity = int(input("Enter the quantity to purchase: "))
-        self.bll.purchase_item(item_id, quantity)
+        self.report_purchase(self.bll.purchase_item, item_id, quantity, self.confirm_payment)
+
+    @staticmethod
+    def confirm_payment(total_amount):
+        print(f"Total amount to pay: {total_amount:.2f}")
+        return input("Is payment done? (yes/no): ").strip().lower() == "yes"
+
+    def report_purchase(self, checkout, *args):
+        """Run a checkout operation and tell the user how it ended."""
+        try:
+            sale = checkout(*args)
+        except CafeError as e:
+            print(f"Error: {e}")
+            return
+        if sale:
+            print("Sale recorded successfully.")
+            print("Purchase complete.")
+        else:
+            print("Purchase not done.")
+
+    def manage_cart(self):
+        while True:
+            print("\n--- Cart ---")
+            print("1. Add Item")
+            print("2. Remove Item")
+            print("3. View Cart")
+            print("4. Checkout")
+            print("5. Back")
+            choice = input("Enter your choice: ")
+            if choice == "1":
+                item_id = int(input("Enter the ID of the item to add (Check ID from Available Items): "))
+                quantity = int(input("Enter the quantity: "))
+                item = self.attempt(self.bll.add_to_cart, item_id, quantity)
+                if item:
+                    print(f"Added {item.item_name} x {quantity} to cart.")
+            elif choice == "2":
+                item_id = int(input("Enter the ID of the item to remove: "))
+                quantity = input("Quantity to remove (leave blank to remove all): ")
+                self.attempt(self.bll.remove_from_cart, item_id, int(quantity) if quantity else None,
+                             success="Cart updated.")
+            elif choice == "3":
+                lines = self.bll.view_cart()
+                print("\n--- Cart ---")
+                self.show_table(lines, [
+                    Column("id", "ID", align=">"), Column("item_name", "Item Name"), Column("quantity", "Quantity", align=">"),
+                    Column("cost", "Cost", align=">"), Column("total", "Total", align=">"),
+                ], empty="Your cart is empty.")
+                if lines:
+                    print(f"Cart Total: {sum(line['total'] for line in lines):.2f}")
+            elif choice == "4":
+                self.report_purchase(self.bll.checkout_cart, self.confirm_payment)
+                if not self.bll.cart:
+                    break
+            elif choice == "5":
+                break
+            else:
+                print("Invalid choice. Try again.")
+
+    @staticmethod
+    def input_filters(prompts):
+        """
+        Offer to filter a list; if accepted, ask each (filter, prompt) question in turn.
+        Returns the answered filters (blank answers are left out) as view_* keyword arguments.
+        """
+        if input("Filter, sort or limit the list? (y/N): ").strip().lower() != "y":
+            return {}
+        filters = {}
+        for name, prompt in prompts:
+            answer = input(f"{prompt} (leave blank to skip): ").strip()
+            if answer:
+                filters[name] = answer
+        for flag in ("descending", "include_archive"):
+            if flag in filters:
+                filters[flag] = filters[flag].lower().startswith("y")
+        return filters
 
     @staticmethod
     def input_email():
@@ -223,38 +370,93 @@ class PresentationLayer:
             else:
                 print("❌ Invalid email format. Please enter a valid email (e.g., user@example.com).")
 
+    def manage_sales(self):
+        while True:
+            print("\n--- Manage Sales ---")
+            print("1. Record Sale (Manual)")
+            print("2. View Sales History")
+            print("3. Back")
+            choice = input("Enter your choice: ")
+            if choice == "1":
+                self.record_sales()
+            elif choice == "2":
+                filters = self.input_filters(SALES_FILTER_PROMPTS)
+                sales = self.attempt(lambda: self.bll.view_sales_history(**filters))
+                if sales is None:
+                    continue
+                print("\n--- Sales History ---")
+                self.show_table(sales, [
+                    Column("date", "Date", 10), Column("amount", "Amount", align=">"), Column("items_sold", "Items Sold"),
+                ])
+            elif choice == "3":
+                break
+            else:
+                print("Invalid choice. Try again.")
+
     def record_sales(self):
         print("\n--- Record Sales ---")
         date = input("Date (YYYY-MM-DD): ")
-        amount = float(input("Amount: "))
+        amount = input("Amount: ")
         items_sold = input("Items Sold: ")
-        self.bll.record_sale(date, amount, items_sold)
+        self.attempt(self.bll.record_sale, date, amount, items_sold, success="Sale recorded successfully.")
+
+    def reports_menu(self):
+        while True:
+            print("\n--- Generate Reports ---")
+            print("1. Detailed Reports")
+            print("2. Summary Report")
+            print("3. Back")
+            choice = input("Enter your choice: ")
+            if choice == "1":
+                self.generate_reports()
+            elif choice == "2":
+                self.generate_summary()
+            elif choice == "3":
+                break
+            else:
+                print("Invalid choice. Try again.")
 
     def generate_reports(self):
-        """Display structured reports in a readable format."""
+        """Display structured reports in a readable format, printing rows as they are fetched."""
         print("\n=== Reports ===")
-        reports = self.bll.generate_reports()
+        start_date = input("Start date (YYYY-MM-DD, leave blank for all): ").strip()
+        end_date = input("End date (YYYY-MM-DD, leave blank for all): ").strip()
+        include_archive = input("Include archived history? (y/N): ").strip().lower().startswith("y")
+        reports = self.attempt(
+            lambda: self.bll.generate_reports(start_date or None, end_date or None, include_archive=include_archive)
+        )
+        if reports is None:
+            return
 
-        for report_type, data in reports.items():
+        for report_type, rows in reports.items():
             print(f"\n--- {report_type} Report ---")
-            if not data:
-                print("No data available.")
-                continue
-
-            # Extract headers from the first record
-            headers = data[0].keys()
-            column_widths = {header: max(len(header), max(len(str(row[header])) for row in data)) for header in headers}
+            self.show_table(rows)
 
-            # Print the header row
-            header_row = " | ".join(f"{header:<{column_widths[header]}}" for header in headers)
-            separator = "-+-".join("-" * column_widths[header] for header in headers)
-            print(header_row)
-            print(separator)
+    def generate_summary(self):
+        """Display totals per period and per category, aggregated by the database."""
+        print("\n=== Summary Report ===")
+        period = input("Group by (day/week/month) [month]: ").strip().lower() or "month"
+        start_date = input("Start date (YYYY-MM-DD, leave blank for all): ").strip()
+        end_date = input("End date (YYYY-MM-DD, leave blank for all): ").strip()
+        summary = self.attempt(self.bll.generate_summary, period, start_date or None, end_date or None)
+        if summary is None:
+            return
 
-            # Print each row of the report
-            for row in data:
-                row_data = " | ".join(f"{str(value):<{column_widths[key]}}" for key, value in row.items())
-                print(row_data)
+        period_header = period.capitalize()
+        headers = {
+            "Sales": (period_header, "Sales", "Revenue", "Average Sale"),
+            "Expenses by Category": ("Category", "Expenses", "Total", "Average Expense"),
+            "Expenses": (period_header, "Expenses", "Total", "Average Expense"),
+            "Net Profit": (period_header, "Revenue", "Expenses", "Net Profit"),
+        }
+        # Archives are only attached when the range reaches them; the totals above cover them too
+        best_sellers = self.attempt(lambda: self.bll.best_sellers(start_date or None, end_date or None, include_archive=True))
+        if best_sellers is not None:
+            summary["Best Sellers"] = best_sellers
+            headers["Best Sellers"] = ("Item Name", "Units Sold", "Revenue", "Units per Day")
+        for summary_type, rows in summary.items():
+            print(f"\n--- {summary_type} ---")
+            self.show_table(rows, [Column(i, header) for i, header in enumerate(headers[summary_type])])
 
     def start(self):
         print("\nWelcome to Brew and Bite Café Management System!")
@@ -271,6 +473,19 @@ class PresentationLayer:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Brew and Bite Café Management System")
+    parser.add_argument("--db", help="SQLAlchemy database URL (default: $CAFE_DB_URL or sqlite:///cafe_management.db)")
+    parser.add_argument("--branch", help="use this café branch's database in $CAFE_BRANCH_DIR (default: ./branches)")
+    parser.add_argument("--metrics", action="store_true", help="print data access metrics on exit")
+    args = parser.parse_args()
 
-    app = PresentationLayer()
-    app.start()
+    try:
+        app = PresentationLayer(args.db, args.branch)
+    except CafeError as e:
+        parser.error(str(e))
+    try:
+        app.start()
+    finally:
+        if args.metrics:
+            print("\n--- Performance Metrics ---")
+            print(metrics.render())
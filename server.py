@@ -0,0 +1,386 @@
+"""
+Local HTTP/JSON API over BusinessLogic, for tills and dashboards that share one database.
+
+    python server.py [--host 127.0.0.1] [--port 8000] [--db URL | --branch NAME] [--pool-size 8] [--group-commit]
+
+The database is --db, branches/NAME.db for --branch (see branches.py), $CAFE_DB_URL
+or sqlite:///cafe_management.db.
+
+Every request is authenticated with HTTP Basic credentials and handled in its own thread
+with its own SQLAlchemy session (a scoped_session removed when the request ends), drawn
+from a bounded connection pool, so concurrent clients never share a Session. With
+--group-commit, checkouts are queued to a single writer thread that commits them in
+batches (see ingest.py).
+
+Endpoints (admin = admin role required, user = any logged-in user):
+
+    GET    /health                      no auth
+    GET    /inventory                   user   ?prefix=&contains=&sort=&desc=1&limit=&offset=
+    GET    /inventory/<id>              user
+    POST   /checkout                    user   {"items": [{"item_id": 1, "quantity": 2}, ...]}
+    GET    /inventory/reorder           admin  ?window=28&lead=7&cover=14  (most urgent first)
+    POST   /inventory                   admin  {"item_name", "quantity", "cost", "reorder_threshold"?}
+    PATCH  /inventory/<id>              admin  {"item_name"?, "quantity"?, "cost"?, "reorder_threshold"?}
+    DELETE /inventory/<id>              admin
+    GET    /expenses                    admin  ?start=&end=&category=&min=&max=&q=&sort=&desc=1&limit=&offset=&archive=1
+    POST   /expenses                    admin  {"date", "amount", "category", "description"?}
+    GET    /sales                       admin  ?start=&end=&min=&max=&q=&sort=&desc=1&limit=&offset=&archive=1
+    POST   /sales                       admin  {"date", "amount", "items_sold"}
+    GET    /users                       admin
+    POST   /users                       admin  {"username", "password", "email", "role"}
+    GET    /reports/summary             admin  ?period=month&start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET    /reports/<expenses|inventory|sales>  admin  ?start=&end=&archive=1  (streamed as JSON Lines)
+    GET    /changes                     admin  ?since=SEQ&limit=1000&entity=  {"changes": [...], "next": SEQ}
+    GET    /metrics                     admin
+
+The list endpoints take optional filters (see BusinessLogic.view_expense_history and friends):
+q searches the description or items sold, prefix/contains match item names, sort names a
+column, desc=1 reverses the order and archive=1 includes archived rows (see archive.py).
+/changes returns the change log entries after `since` (see changes.py); pass `next` back as
+`since` to get the following ones.
+
+Errors are returned as {"error": message} with 400 (validation), 401 (authentication),
+403 (role), 404 (not found), 409 (duplicate / out of stock) or 410 (change log cursor
+older than the retained entries: reload the full state and follow from the latest seq).
+"""
+import argparse
+import base64
+import binascii
+import json
+import re
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from errors import (AuthenticationError, CafeError, CursorExpiredError, DuplicateError, InsufficientStockError,
+                    NotFoundError, PermissionDeniedError, ValidationError)
+from metrics import metrics
+
+ERROR_STATUS = {
+    ValidationError: 400,
+    AuthenticationError: 401,
+    PermissionDeniedError: 403,
+    NotFoundError: 404,
+    DuplicateError: 409,
+    InsufficientStockError: 409,
+    CursorExpiredError: 410,
+}
+
+
+def to_json(value):
+    """json.dumps default= hook for dates, Decimal amounts and ORM rows."""
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "__table__"):
+        return {column.name: getattr(value, column.name) for column in value.__table__.columns if column.name != "password"}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+# Query parameters of the list endpoints and the BusinessLogic filters they set
+LIST_FILTERS = {
+    "start": "start_date", "end": "end_date", "category": "category", "min": "min_amount", "max": "max_amount",
+    "q": "search", "prefix": "name_prefix", "contains": "name_contains", "sort": "sort", "desc": "descending",
+    "limit": "limit", "offset": "offset", "archive": "include_archive",
+}
+
+
+def query_flag(value):
+    return value.lower() in ("1", "true", "yes")
+
+
+def list_filters(query, names):
+    """The BusinessLogic filters given in `query`, for the parameters in `names`."""
+    filters = {LIST_FILTERS[name]: query[name] for name in names if name in query}
+    for flag in ("descending", "include_archive"):
+        if flag in filters:
+            filters[flag] = query_flag(filters[flag])
+    return filters
+
+
+# Route handlers: (bll, user, body, query, **path_params) -> JSON-serializable result
+def list_inventory(bll, user, body, query):
+    return bll.view_inventory(**list_filters(query, ("prefix", "contains", "sort", "desc", "limit", "offset")))
+
+
+def list_expenses(bll, user, body, query):
+    names = ("start", "end", "category", "min", "max", "q", "sort", "desc", "limit", "offset", "archive")
+    return bll.view_expense_history(**list_filters(query, names))
+
+
+def list_sales(bll, user, body, query):
+    names = ("start", "end", "min", "max", "q", "sort", "desc", "limit", "offset", "archive")
+    return bll.view_sales_history(**list_filters(query, names))
+
+
+def get_inventory_item(bll, user, body, query, item_id):
+    item = bll.dal.get_inventory_item(int(item_id))
+    if not item:
+        raise NotFoundError("Item not found.")
+    return item._asdict()
+
+
+def checkout(bll, user, body, query):
+    try:
+        quantities = {}
+        for line in body["items"]:
+            quantities[int(line["item_id"])] = quantities.get(int(line["item_id"]), 0) + int(line["quantity"])
+    except (KeyError, TypeError, ValueError):
+        raise ValidationError('Body must be {"items": [{"item_id": ..., "quantity": ...}]}.') from None
+    return bll.checkout_lines(quantities)
+
+
+def register_user(bll, user, body, query):
+    new_user = bll.register_user(body.get("username"), body.get("password"), body.get("email"), body.get("role"))
+    return {"id": new_user.id, "username": new_user.username, "email": new_user.email, "role": new_user.role}
+
+
+def update_inventory_item(bll, user, body, query, item_id):
+    return bll.update_inventory_item(int(item_id), body)
+
+
+def delete_inventory_item(bll, user, body, query, item_id):
+    bll.delete_inventory_item(int(item_id))
+    return {"deleted": int(item_id)}
+
+
+def reorder_list(bll, user, body, query):
+    return bll.reorder_suggestions(query.get("window", 28), query.get("lead", 7), query.get("cover", 14))
+
+
+def summary_report(bll, user, body, query):
+    return bll.generate_summary(query.get("period", "month"), query.get("start"), query.get("end"))
+
+
+def stream_report(bll, user, body, query, name):
+    reports = bll.generate_reports(query.get("start"), query.get("end"),
+                                   include_archive=query_flag(query.get("archive", "")))
+    key = name.capitalize()
+    if key not in reports:
+        raise NotFoundError(f"Unknown report '{name}'.")
+    return reports[key]
+
+
+def list_changes(bll, user, body, query):
+    changes = bll.changes_since(query.get("since"), query.get("limit"), query.get("entity"))
+    # A validated `since` is a whole number; with nothing new, the client asks from the same place again
+    next_seq = changes[-1].seq if changes else int(query.get("since") or 0)
+    return {"changes": [change._asdict() for change in changes], "next": next_seq}
+
+
+ROUTES = [
+    # (method, path pattern, role, handler)
+    ("GET", r"/inventory", "user", list_inventory),
+    ("GET", r"/inventory/(?P<item_id>\d+)", "user", get_inventory_item),
+    ("GET", r"/inventory/reorder", "admin", reorder_list),
+    ("POST", r"/checkout", "user", checkout),
+    ("POST", r"/inventory", "admin",
+     lambda bll, user, body, query: bll.add_inventory_item(
+         body.get("item_name"), body.get("quantity"), body.get("cost"), body.get("reorder_threshold"))),
+    ("PATCH", r"/inventory/(?P<item_id>\d+)", "admin", update_inventory_item),
+    ("DELETE", r"/inventory/(?P<item_id>\d+)", "admin", delete_inventory_item),
+    ("GET", r"/expenses", "admin", list_expenses),
+    ("POST", r"/expenses", "admin",
+     lambda bll, user, body, query: bll.record_expense(
+         body.get("date"), body.get("amount"), body.get("category"), body.get("description"))),
+    ("GET", r"/sales", "admin", list_sales),
+    ("POST", r"/sales", "admin",
+     lambda bll, user, body, query: bll.record_sale(body.get("date"), body.get("amount"), body.get("items_sold"))),
+    ("GET", r"/users", "admin", lambda bll, user, body, query: bll.view_all_users()),
+    ("POST", r"/users", "admin", register_user),
+    ("GET", r"/reports/summary", "admin", summary_report),
+    ("GET", r"/reports/(?P<name>expenses|inventory|sales)", "admin", stream_report),
+    ("GET", r"/changes", "admin", list_changes),
+    ("GET", r"/metrics", "admin", lambda bll, user, body, query: metrics.snapshot()),
+    ("GET", r"/health", None, lambda bll, user, body, query: {"status": "ok"}),
+]
+COMPILED_ROUTES = [(method, re.compile(pattern + r"/?"), role, handler) for method, pattern, role, handler in ROUTES]
+
+
+class CafeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so a till reuses one connection
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes; don't let them wait on delayed ACKs
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def log_error(self, format, *args):
+        super().log_message(format, *args)  # Logged even when quiet
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.read_body()
+        route = self.match(method, url.path)
+        if route is None:
+            return
+        role, handler, params = route
+
+        bll = self.server.open_business_logic()
+        try:
+            if body is None:
+                raise ValidationError("Request body must be valid JSON.")
+            user = self.authenticate(bll) if role else None
+            if role == "admin" and user.role != "admin":
+                raise PermissionDeniedError("Admin role required.")
+            result = handler(bll, user, body, query, **params)
+            if hasattr(result, "__next__"):
+                self.send_stream(result)
+            else:
+                self.send_json(201 if method == "POST" else 200, result)
+        except CafeError as e:
+            self.send_json(ERROR_STATUS.get(type(e), 400), {"error": str(e)})
+        except Exception as e:
+            self.send_json(500, {"error": f"Internal error: {e}"})
+        finally:
+            self.server.Session.remove()
+
+    def match(self, method, path):
+        allowed = False
+        for route_method, pattern, role, handler in COMPILED_ROUTES:
+            found = pattern.fullmatch(path)
+            if found:
+                if route_method == method:
+                    return role, handler, found.groupdict()
+                allowed = True
+        self.send_json(405 if allowed else 404, {"error": "Method not allowed." if allowed else "Not found."})
+        return None
+
+    def read_body(self):
+        """Return the parsed JSON body ({} if empty), or None if it isn't valid JSON."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) else None
+
+    def authenticate(self, bll):
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            raise AuthenticationError("Basic authentication required.")
+        try:
+            username, _, password = base64.b64decode(header[6:]).decode().partition(":")
+        except (binascii.Error, UnicodeDecodeError):
+            raise AuthenticationError("Malformed credentials.") from None
+        return bll.authenticate_user(username, password)
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload, default=to_json).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 401:
+            self.send_header("WWW-Authenticate", 'Basic realm="cafe"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_stream(self, rows, batch_size=500):
+        """
+        Send rows as JSON Lines with chunked transfer encoding, one chunk per batch of rows.
+        An error once the 200 is out is only logged: the connection is closed without the
+        final chunk, so the client sees a truncated response rather than a second one.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            batch = []
+            for row in rows:
+                batch.append(json.dumps(row, default=to_json))
+                if len(batch) >= batch_size:
+                    self.write_chunk(batch)
+                    batch = []
+            if batch:
+                self.write_chunk(batch)
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            self.log_error("Stream of %s aborted: %r", self.path, e)
+            self.close_connection = True
+
+    def write_chunk(self, lines):
+        data = ("\n".join(lines) + "\n").encode()
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+
+class CafeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, engine, quiet=False, group_commit=False):
+        # The data layers are imported once a server is built, so `--help` starts instantly
+        from sqlalchemy.orm import scoped_session, sessionmaker
+
+        from bll import BusinessLogic
+        from dal import DataAccessLayer
+        from ingest import SaleWriter
+
+        super().__init__(address, CafeRequestHandler)
+        self.engine = engine
+        self.quiet = quiet
+        # One session per request thread; removed (and its connection returned to the pool) after each request
+        self.Session = scoped_session(sessionmaker(bind=engine))
+        # With group commit, checkouts from every request thread are committed together by one writer thread
+        self.sale_writer = SaleWriter(engine).start() if group_commit else None
+        self.open_business_logic = lambda: BusinessLogic(DataAccessLayer(session=self.Session()), self.sale_writer)
+
+    def server_close(self):
+        super().server_close()
+        if self.sale_writer is not None:
+            self.sale_writer.close()
+
+
+def create_server(host="127.0.0.1", port=8000, db_url=None, pool_size=8, quiet=False, group_commit=False, branch=None):
+    """Build a server whose engine pool holds at most `pool_size` connections, on `branch`'s database if given."""
+    from models import branch_db_url, get_db_url, init_db
+
+    if branch is not None and db_url is None:
+        db_url = branch_db_url(branch)
+    engine = init_db(db_url or get_db_url(), pool_size=pool_size, max_overflow=0, pool_timeout=30)
+    return CafeHTTPServer((host, port), engine, quiet, group_commit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Brew and Bite HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--db", help="SQLAlchemy database URL")
+    parser.add_argument("--branch", help="serve this café branch's database in $CAFE_BRANCH_DIR (default: ./branches)")
+    parser.add_argument("--pool-size", type=int, default=8, help="maximum concurrent database connections")
+    parser.add_argument("--quiet", action="store_true", help="don't log each request")
+    parser.add_argument("--group-commit", action="store_true", help="commit concurrent checkouts together")
+    args = parser.parse_args()
+
+    try:
+        server = create_server(args.host, args.port, args.db, args.pool_size, args.quiet, args.group_commit, args.branch)
+    except CafeError as e:
+        parser.error(str(e))
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
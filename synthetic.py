@@ -0,0 +1,119 @@
+"""
+Deterministic synthetic café data for benchmarks and load tests.
+
+    python synthetic.py bench.db --scale medium [--seed 0]
+
+    engine = generate("sqlite:///bench.db", SCALES["small"])
+
+The same scale and seed always produce the same rows (apart from password salts). Every
+user's password is SYNTHETIC_PASSWORD, so a single KDF hash is shared by all of them.
+Sales run up to `end_date`: each has one to four lines, and item popularity is skewed
+so that a few SKUs sell far more than the rest. Expenses are spread over a fixed set of
+categories. Rows go in through DataAccessLayer.bulk_add, so daily_totals stays consistent.
+"""
+import argparse
+import os
+import random
+from collections import namedtuple
+from datetime import date, timedelta
+
+# users: accounts (the first is an admin); skus: inventory items; years: history length
+Scale = namedtuple("Scale", "users skus years sales_per_day expenses_per_day")
+
+SCALES = {
+    "small": Scale(users=20, skus=100, years=1, sales_per_day=40, expenses_per_day=4),
+    "medium": Scale(users=200, skus=1000, years=2, sales_per_day=150, expenses_per_day=10),
+    "large": Scale(users=1000, skus=5000, years=3, sales_per_day=400, expenses_per_day=25),
+}
+
+SYNTHETIC_PASSWORD = "synthetic"
+EXPENSE_CATEGORIES = ("Ingredients", "Rent", "Utilities", "Wages", "Equipment", "Marketing", "Cleaning", "Repairs")
+CHUNK_SIZE = 10000
+
+
+def generate(db_url, scale, seed=0, end_date=date(2025, 12, 31)):
+    """Create a database at `db_url` filled for `scale` (a Scale or a SCALES name). Returns its engine."""
+    from sqlalchemy import insert
+
+    from dal import DataAccessLayer
+    from models import User, init_db
+    from passwords import hash_password
+
+    scale = SCALES[scale] if isinstance(scale, str) else scale
+    rng = random.Random(seed)
+    engine = init_db(db_url)
+    dal = DataAccessLayer(engine)
+    try:
+        password = hash_password(SYNTHETIC_PASSWORD)
+        with engine.begin() as connection:
+            connection.execute(insert(User), [
+                {"username": f"user{i}", "password": password, "email": f"user{i}@example.com",
+                 "role": "admin" if i == 0 else "user"}
+                for i in range(scale.users)
+            ])
+
+        items = [
+            {"item_name": f"SKU {i:05d}", "quantity": rng.randrange(50, 5000), "cost": round(rng.uniform(0.5, 25), 2),
+             "reorder_threshold": rng.randrange(0, 50)}
+            for i in range(scale.skus)
+        ]
+        dal.bulk_add("inventory", items)
+
+        days = scale.years * 365
+        first_day = end_date - timedelta(days=days - 1)
+        popularity = [1 / (rank + 1) for rank in range(scale.skus)]  # Zipf-like
+        for rows in _chunks(_sales(rng, items, popularity, first_day, days, scale.sales_per_day)):
+            dal.bulk_add("sales", rows)
+        for rows in _chunks(_expenses(rng, first_day, days, scale.expenses_per_day)):
+            dal.bulk_add("expenses", rows)
+    finally:
+        dal.close()
+    return engine
+
+
+def _sales(rng, items, popularity, first_day, days, per_day):
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for _ in range(rng.randrange(per_day // 2, per_day * 3 // 2 + 1)):
+            picked = {}
+            for item_id in rng.choices(range(1, len(items) + 1), popularity, k=rng.randrange(1, 5)):
+                picked[item_id] = picked.get(item_id, 0) + rng.randrange(1, 4)
+            lines = [(item_id, quantity, items[item_id - 1]["cost"]) for item_id, quantity in picked.items()]
+            yield {
+                "date": day,
+                "amount": round(sum(quantity * price for _, quantity, price in lines), 2),
+                "items_sold": ", ".join(f"{items[item_id - 1]['item_name']} x {quantity}" for item_id, quantity, _ in lines),
+                "lines": lines,
+            }
+
+
+def _expenses(rng, first_day, days, per_day):
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        for _ in range(rng.randrange(per_day // 2, per_day * 3 // 2 + 1)):
+            yield {"date": day, "amount": round(rng.uniform(5, 500), 2), "category": rng.choice(EXPENSE_CATEGORIES),
+                   "description": None}
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic café database")
+    parser.add_argument("path", help="SQLite file to create (must not exist)")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    generate(f"sqlite:///{args.path}", args.scale, args.seed).dispose()
+    print(f"Wrote the {args.scale} dataset to {args.path}.")
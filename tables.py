@@ -0,0 +1,115 @@
+"""
+Plain-text tables for the terminal menus.
+
+    render_table(rows)                                # Headers from the first row's keys
+    render_table(rows, [Column("id", "ID", 6), Column("item_name", "Item Name")], page_size=20)
+
+Rows are dicts or sequences and may be a generator; they are read once. A column's width
+is taken from its Column metadata when given, otherwise from the first `sample_size` rows,
+so long reports are neither held in memory nor scanned twice. Values wider than their
+column are cut short and end in "…". Output is built up in a list and written to the
+stream with one write() per page (or per FLUSH_ROWS rows when not paging), rather than a
+print() per row.
+"""
+import itertools
+import operator
+import shutil
+import sys
+from collections import namedtuple
+
+# key: dict key or sequence index of the value; header defaults to the key;
+# width: fixed column width (None: measured from the sampled rows); align: "<" or ">"
+Column = namedtuple("Column", "key header width align", defaults=(None, None, "<"))
+
+FLUSH_ROWS = 1000
+ELLIPSIS = "…"
+
+
+# Cell text by value type; str() for every other type (ISO dates, Decimals with two places)
+FORMATTERS = {type(None): lambda value: "", float: "{:.2f}".format}
+
+
+def format_value(value):
+    """A cell's text: blank for None, floats with two places, str() of anything else."""
+    return FORMATTERS.get(value.__class__, str)(value)
+
+
+def fit(text, width):
+    """`text` cut to at most `width` characters."""
+    return text if len(text) <= width else text[:width - 1] + ELLIPSIS
+
+
+def ask_more():
+    """Pager prompt between pages: true to show the next one."""
+    return input("-- More -- (Enter for the next page, q to stop) ").strip().lower() != "q"
+
+
+def terminal_page_size(stream=None):
+    """Rows per page that fit the terminal behind `stream` (default stdout), or None if it isn't a terminal."""
+    stream = stream or sys.stdout
+    if not stream.isatty():
+        return None
+    return max(shutil.get_terminal_size().lines - 4, 5)
+
+
+def _getter(keys):
+    """Like operator.itemgetter(*keys), but returning a tuple even for a single key."""
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda row: (row[key],)
+    return operator.itemgetter(*keys)
+
+
+def render_table(rows, columns=None, stream=None, page_size=None, more=ask_more, sample_size=100, max_width=40,
+                 empty="No data available."):
+    """
+    Write `rows` to `stream` (default stdout) as a table and return the number of rows written.
+    `columns` lists Columns or bare keys; by default every key of the first dict row (or every
+    index of a sequence row). Measured columns are at most `max_width` wide. With `page_size`,
+    more() is called after each full page and the output stops when it returns false.
+    """
+    stream = stream or sys.stdout
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        stream.write(f"{empty}\n")
+        return 0
+    if columns is None:
+        columns = list(first) if isinstance(first, dict) else list(range(len(first)))
+    columns = [column if isinstance(column, Column) else Column(column) for column in columns]
+
+    get = _getter([column.key for column in columns])
+    formatter = FORMATTERS.get
+
+    def cells(row):
+        return [formatter(value.__class__, str)(value) for value in get(row)]
+
+    rows = itertools.chain([first], rows)
+    sampled = []
+    if any(column.width is None for column in columns):
+        sampled = [cells(row) for row in itertools.islice(rows, sample_size)]
+    headers = [format_value(column.key if column.header is None else column.header) for column in columns]
+    widths = [
+        column.width or min(max([len(header)] + [len(row[i]) for row in sampled]), max_width)
+        for i, (column, header) in enumerate(zip(columns, headers))
+    ]
+
+    template = (" | ".join(f"{{:{column.align}{width}}}" for column, width in zip(columns, widths)) + "\n").format
+    buffer = [
+        template(*map(fit, headers, widths)),
+        "-+-".join("-" * width for width in widths) + "\n",
+    ]
+    chunk = page_size or FLUSH_ROWS
+    written = 0
+    for row in itertools.chain(sampled, map(cells, rows)):
+        if written and written % chunk == 0:
+            stream.write("".join(buffer))
+            buffer = []
+            if page_size and not more():
+                break
+        if any(map(operator.gt, map(len, row), widths)):
+            row = map(fit, row, widths)
+        buffer.append(template(*row))
+        written += 1
+    stream.write("".join(buffer))
+    return written
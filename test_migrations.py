@@ -0,0 +1,20 @@
+"""
+The report queries must keep using their indexes: migrate a new database and run the
+EXPLAIN QUERY PLAN checks of migrations.QUERY_PLAN_CHECKS on it.
+
+    python -m pytest test_migrations.py
+"""
+from migrations import MIGRATIONS, QUERY_PLAN_CHECKS, check_query_plans, get_schema_version
+from models import init_db
+
+
+def test_report_queries_use_their_indexes(tmp_path):
+    engine = init_db(f"sqlite:///{tmp_path / 'cafe.db'}")
+    try:
+        with engine.connect() as connection:
+            assert get_schema_version(connection) == MIGRATIONS[-1][0]
+        assert QUERY_PLAN_CHECKS
+        failures = check_query_plans(engine)
+        assert not failures, "\n".join(f"{name}: {' / '.join(plan)}" for name, plan in failures)
+    finally:
+        engine.dispose()